@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Columnar analytics mirror of profile_metadata and measurements.
+
+When ANALYTICS_MIRROR_DIRECTORY is set, process_netcdf also writes every
+committed slice to Parquet files under that directory, partitioned Hive-style
+by profile year and platform:
+
+    <dir>/profile_metadata/year=2021/platform_number=1901234/<batch>-0.parquet
+    <dir>/measurements/year=2021/platform_number=1901234/<batch>-0.parquet
+
+Every write carries a mirror_batch stamp. When a profile is reingested with a
+better data mode, the new rows are simply added, and the DuckDB views only
+expose the rows of each profile's latest batch. Postgres stays the source of
+truth: a slice is mirrored only after it is committed, and the mirror can be
+rebuilt from the database at any time:
+
+    python analytics_mirror.py --rebuild
+
+run_query() runs a SELECT in an embedded DuckDB over the Parquet files, with
+profile_metadata and measurements views laid out like the Postgres tables.
+supabaseserver.execute_sql routes heavy aggregates over measurements here
+(see should_route). pyarrow and duckdb are optional dependencies
+(`pip install backend[analytics]`).
+"""
+
+import argparse
+import os
+import re
+import shutil
+import time
+import uuid
+
+from sqlalchemy import ARRAY, BigInteger, Boolean, DateTime, Float, Integer
+
+from models import Measurement, ProfileMetadata
+
+MIRRORED_MODELS = {
+    "profile_metadata": ProfileMetadata,
+    "measurements": Measurement,
+}
+
+PARTITION_COLUMNS = ["year", "platform_number"]
+
+# Aggregates and GROUP BY make a query worth running on the columnar mirror
+AGGREGATE_PATTERN = re.compile(
+    r"\b(count|sum|avg|min|max|stddev\w*|variance|var_pop|var_samp|median|percentile_\w+|corr|regr_\w+)\s*\("
+    r"|\bgroup\s+by\b",
+    re.IGNORECASE,
+)
+# Not followed by "." so EXTRACT(YEAR FROM p.juld) is not taken for a table
+TABLE_PATTERN = re.compile(r"\b(?:from|join)\s+(?:public\.)?\"?([a-z_]\w*)\"?(?![.\w])", re.IGNORECASE)
+CTE_PATTERN = re.compile(r"\b(\w+)\s+as\s*(?:materialized\s*)?\(", re.IGNORECASE)
+# A bare NUMERIC is DECIMAL(18, 3) in DuckDB but unbounded in Postgres. The usual
+# ROUND(x::numeric, n) is run with a wide DECIMAL instead; other bare casts stay on Postgres.
+ROUND_NUMERIC_PATTERN = re.compile(r"::\s*numeric(?=\s*,\s*\d+\s*\))", re.IGNORECASE)
+BARE_NUMERIC_PATTERN = re.compile(r"\b(?:numeric|decimal)\b(?!\s*\()", re.IGNORECASE)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as e:
+        raise ImportError("The analytics mirror needs pyarrow: pip install 'backend[analytics]'") from e
+    return pyarrow
+
+
+def _arrow_type(pa, column):
+    column_type = column.type
+    if isinstance(column_type, ARRAY):
+        return pa.list_(pa.string())
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, BigInteger):
+        return pa.int64()
+    if isinstance(column_type, Integer):
+        return pa.int32()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    return pa.string()
+
+
+def arrow_schema(table_name):
+    """Arrow schema of a mirrored table: the model's columns without id, plus year and mirror_batch"""
+    pa = _require_pyarrow()
+    fields = [
+        pa.field(column.name, _arrow_type(pa, column))
+        for column in MIRRORED_MODELS[table_name].__table__.columns
+        if column.name != "id"
+    ]
+    fields.append(pa.field("year", pa.int32()))
+    fields.append(pa.field("mirror_batch", pa.int64()))
+    return pa.schema(fields)
+
+
+class AnalyticsMirror:
+    """Collect the rows of a slice and write them to the Parquet mirror once the slice is committed"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._pending = []
+        self.rows_written = 0
+
+    def add(self, profile_rows, measurement_rows):
+        """Queue a slice's new profile rows and its measurements (row dicts or a columnar batch)"""
+        if profile_rows:
+            self._pending.append((profile_rows, measurement_rows))
+
+    def discard(self):
+        self._pending = []
+
+    def flush(self):
+        """Write the queued rows as one mirror batch; returns the number of rows written"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        batch = time.time_ns()
+        written = 0
+        for profile_rows, measurement_rows in pending:
+            written += write_batch(self.directory, profile_rows, measurement_rows, batch=batch)
+        self.rows_written += written
+        return written
+
+
+def _as_columns(rows, names):
+    """Row dicts to {column: list}; a columnar batch is returned as it is"""
+    if isinstance(rows, dict):
+        return rows
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def profile_years(profile_rows):
+    """{(platform_number, cycle_number): year of juld} for profile row dicts"""
+    return {
+        (row["platform_number"], row["cycle_number"]): row["juld"].year if row.get("juld") is not None else None
+        for row in profile_rows
+    }
+
+
+def write_table(directory, table_name, rows, years, batch):
+    """Write rows of one mirrored table, partitioned by year and platform; returns the row count"""
+    pa = _require_pyarrow()
+    schema = arrow_schema(table_name)
+    columns = _as_columns(rows, schema.names)
+    n_rows = len(columns["platform_number"])
+    if n_rows == 0:
+        return 0
+
+    arrays = []
+    for field in schema:
+        if field.name == "year":
+            keys = zip(columns["platform_number"], columns["cycle_number"])
+            arrays.append(pa.array([years.get(key) for key in keys], type=field.type))
+        elif field.name == "mirror_batch":
+            arrays.append(pa.array([batch] * n_rows, type=field.type))
+        elif field.name in columns:
+            # from_pandas maps NaN to null, as NULL in Postgres
+            arrays.append(pa.array(columns[field.name], type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.nulls(n_rows, type=field.type))
+
+    pa.dataset.write_dataset(
+        pa.Table.from_arrays(arrays, schema=schema),
+        os.path.join(directory, table_name),
+        format="parquet",
+        partitioning=PARTITION_COLUMNS,
+        partitioning_flavor="hive",
+        basename_template=f"{batch}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_partitions=100000,
+    )
+    return n_rows
+
+
+def write_batch(directory, profile_rows, measurement_rows, batch=None):
+    """Write profile rows and their measurements to the mirror under one mirror_batch stamp"""
+    batch = batch or time.time_ns()
+    years = profile_years(profile_rows)
+    written = write_table(directory, "profile_metadata", profile_rows, years, batch)
+    written += write_table(directory, "measurements", measurement_rows, years, batch)
+    return written
+
+
+def has_mirror(directory):
+    """Whether measurements have been mirrored to directory"""
+    return bool(directory) and os.path.isdir(os.path.join(directory, "measurements"))
+
+
+def should_route(sql_query):
+    """Whether a SELECT is an aggregate that only reads mirrored tables, including measurements"""
+    if not AGGREGATE_PATTERN.search(sql_query):
+        return False
+    if BARE_NUMERIC_PATTERN.search(ROUND_NUMERIC_PATTERN.sub("", sql_query)):
+        return False
+    tables = {name.lower() for name in TABLE_PATTERN.findall(sql_query)}
+    tables -= {name.lower() for name in CTE_PATTERN.findall(sql_query)}
+    return "measurements" in tables and tables <= set(MIRRORED_MODELS)
+
+
+def _parquet_source(directory, table_name):
+    path = os.path.join(directory, table_name, "**", "*.parquet").replace("'", "''")
+    return (
+        f"read_parquet('{path}', hive_partitioning = true, union_by_name = true, "
+        "hive_types = {'year': INTEGER, 'platform_number': VARCHAR})"
+    )
+
+
+def connect(directory):
+    """DuckDB connection with profile_metadata and measurements views over the mirror"""
+    import duckdb
+
+    connection = duckdb.connect()
+    profile_columns = ", ".join(field.name for field in arrow_schema("profile_metadata") if field.name not in ("year", "mirror_batch"))
+    measurement_columns = ", ".join(f"m.{field.name}" for field in arrow_schema("measurements") if field.name not in ("year", "mirror_batch"))
+    connection.execute(f"""
+        CREATE VIEW mirror_profiles AS
+        SELECT * FROM {_parquet_source(directory, "profile_metadata")}
+        QUALIFY row_number() OVER (PARTITION BY platform_number, cycle_number ORDER BY mirror_batch DESC) = 1
+    """)
+    connection.execute(f"CREATE VIEW profile_metadata AS SELECT {profile_columns} FROM mirror_profiles")
+    # Only the rows written together with each profile's latest version
+    connection.execute(f"""
+        CREATE VIEW measurements AS
+        SELECT {measurement_columns}
+        FROM {_parquet_source(directory, "measurements")} m
+        SEMI JOIN mirror_profiles p
+          ON m.platform_number = p.platform_number
+         AND m.cycle_number = p.cycle_number
+         AND m.mirror_batch = p.mirror_batch
+    """)
+    return connection
+
+
+def run_query(sql_query, directory):
+    """Run a SELECT on the mirror; returns (column names, rows)"""
+    connection = connect(directory)
+    try:
+        cursor = connection.execute(ROUND_NUMERIC_PATTERN.sub("::DECIMAL(38, 10)", sql_query))
+        headers = [column[0] for column in cursor.description]
+        return headers, cursor.fetchall()
+    finally:
+        connection.close()
+
+
+def rebuild(engine, directory, chunk_rows=500000):
+    """Replace the mirror with a fresh copy of profile_metadata and measurements from the database"""
+    from sqlalchemy import select
+    from sqlalchemy.orm import sessionmaker
+
+    for table_name in MIRRORED_MODELS:
+        shutil.rmtree(os.path.join(directory, table_name), ignore_errors=True)
+
+    # One stamp for the whole copy, so every measurement matches its profile's batch
+    batch = time.time_ns()
+    session = sessionmaker(bind=engine)()
+    try:
+        profile_columns = [c for c in ProfileMetadata.__table__.columns if c.name != "id"]
+        profiles = [dict(row._mapping) for row in session.execute(select(*profile_columns))]
+        years = profile_years(profiles)
+        write_table(directory, "profile_metadata", profiles, years, batch)
+        print(f"Mirrored {len(profiles)} profiles")
+
+        measurement_columns = [c for c in Measurement.__table__.columns if c.name != "id"]
+        result = session.execute(select(*measurement_columns).execution_options(yield_per=chunk_rows))
+        total = 0
+        for partition in result.partitions():
+            total += write_table(directory, "measurements", [dict(row._mapping) for row in partition], years, batch)
+            print(f"Mirrored {total} measurements")
+    finally:
+        session.close()
+    print(f"✅ Analytics mirror rebuilt in {directory}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parquet analytics mirror of profile_metadata and measurements")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the mirror from the database")
+    parser.add_argument("--directory", help="mirror directory (default ANALYTICS_MIRROR_DIRECTORY)")
+    parser.add_argument("--query", help="run a SELECT on the mirror and print the result")
+    args = parser.parse_args(argv)
+
+    from config import ANALYTICS_MIRROR_DIRECTORY, engine
+    directory = args.directory or ANALYTICS_MIRROR_DIRECTORY
+    if not directory:
+        parser.error("set ANALYTICS_MIRROR_DIRECTORY or pass --directory")
+    if args.rebuild:
+        rebuild(engine, directory)
+    if args.query:
+        headers, rows = run_query(args.query, directory)
+        print("\t".join(headers))
+        for row in rows:
+            print("\t".join(str(value) for value in row))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Pass/fail checks of process_netcdf behaviour on synthetic ARGO files.
+
+    python -m benchmarks.check_ingest memory resume
+    python -m benchmarks.check_ingest memory --chunk-size 200 --factor 10 --db-url postgresql+psycopg2://localhost/argo_bench
+
+memory: ingests a file of one slice (--chunk-size profiles) and a file
+--factor times larger with the same slice size, each in a fresh process, and
+fails when the larger ingest's memory growth (IngestMetrics peak RSS over the
+RSS it started at) exceeds the one-slice growth by more than --tolerance.
+With chunking, peak memory depends on the slice, not the file.
+
+resume: runs ingest_cli.py on a file of --factor slices, kills it (workers,
+ChromaDB writer and all) once the first slice checkpoint is committed, runs
+it again to completion, and fails unless every profile is stored once and has
+its ChromaDB embedding. The CLI runs in --work-dir/resume_check, where its
+chroma_db_storage directory is created.
+
+Run it from the backend directory. As with run_ingest, the database at
+--db-url is dropped and recreated before every run (default: SQLite in
+--work-dir). Exits 1 when a check fails.
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.run_ingest import run_case
+
+INGEST_CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingest_cli.py")
+from benchmarks.synthetic_argo import write_synthetic_argo
+
+
+def _synthetic_file(work_dir, params, seed=0):
+    file_path = os.path.join(work_dir, "check_" + "_".join(f"{v}" for v in params.values()) + ".nc")
+    if not os.path.exists(file_path):
+        print(f"🧪 Generating {params}")
+        write_synthetic_argo(file_path, seed=seed, **params)
+    return file_path
+
+
+def check_memory(args):
+    """Memory growth of an ingest --factor slices long stays within --tolerance of a one-slice ingest"""
+    growth = {}
+    for label, n_prof in [("one slice", args.chunk_size), (f"{args.factor} slices", args.chunk_size * args.factor)]:
+        params = dict(n_prof=n_prof, n_levels=args.n_levels, n_calib=1, n_param=3, n_history=5)
+        file_path = _synthetic_file(args.work_dir, params)
+        run = {
+            "case": "memory_check", "params": params, "file": file_path, "mode": args.mode, "writer": args.writer,
+            "chunk_size": args.chunk_size, "db_url": args.db_url, "chroma_dir": os.path.join(args.work_dir, "chroma"),
+        }
+        print(f"⏱️ {label}: {n_prof} profiles x {args.n_levels} levels in slices of {args.chunk_size}")
+        record = run_case(run)
+        # Peak RSS of the ingest over the RSS it started at, so imports and model loading do not count
+        growth[label] = record["ingest_peak_rss_mb"] - record["ingest_start_rss_mb"]
+        print(
+            f"💾 {label}: +{growth[label]:.0f} MB during ingest, peak {record['ingest_peak_rss_mb']:.0f} MB "
+            f"({record['file_mb']:.1f} MB file, {record['seconds']:.1f}s)"
+        )
+
+    baseline, large = growth.values()
+    limit = baseline * (1 + args.tolerance)
+    if large > limit:
+        print(f"❌ Ingest memory grew with the file: +{large:.0f} MB > +{limit:.0f} MB (one slice +{baseline:.0f} MB, {args.tolerance:.0%} allowed)")
+        return False
+    print(f"✅ Ingest memory bounded by the slice: +{large:.0f} MB <= +{limit:.0f} MB")
+    return True
+
+
+def _fresh_database(db_url):
+    """Engine of an emptied scratch database with every table created"""
+    from sqlalchemy import create_engine
+    from models import Base
+
+    engine = create_engine(db_url)
+    if engine.dialect.name == "sqlite":
+        if os.path.exists(engine.url.database):
+            os.remove(engine.url.database)
+    else:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _wait_for_checkpoint(engine, process, timeout=600):
+    """Wait until the ingest has committed its first slice; returns the manifest's next_profile"""
+    from sqlalchemy import text
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"ingest_cli.py exited ({process.returncode}) before it could be killed; use a larger --factor")
+        try:
+            with engine.connect() as connection:
+                row = connection.execute(text("SELECT next_profile, status FROM ingest_manifest")).first()
+        except Exception:
+            row = None  # a locked SQLite file or a table still being created
+        if row is not None and row.next_profile > 0:
+            if row.status == "completed":
+                raise RuntimeError("The ingest completed before it could be killed; use a larger --factor")
+            return row.next_profile
+        time.sleep(0.05)
+    raise RuntimeError("No slice was committed in time")
+
+
+def check_resume(args):
+    """Every profile has its embedding after an ingest killed mid-file is run again"""
+    import chromadb
+    from chromadb.config import Settings
+    from sqlalchemy import text
+
+    params = dict(n_prof=args.chunk_size * args.factor, n_levels=args.n_levels, n_calib=1, n_param=3, n_history=5)
+    file_path = _synthetic_file(args.work_dir, params)
+    run_dir = os.path.join(args.work_dir, "resume_check")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    engine = _fresh_database(args.db_url)
+    env = dict(os.environ, SUPABASE_DB_URL=args.db_url, SQL_ECHO="false", NETCDF_CHUNK_PROFILES=str(args.chunk_size))
+    command = [sys.executable, INGEST_CLI, file_path, "--workers", "1", "--mode", args.mode, "--writer", args.writer]
+
+    print(f"⏱️ Ingesting {params['n_prof']} profiles in slices of {args.chunk_size}, killed after the first checkpoint")
+    with open(os.path.join(run_dir, "killed_run.log"), "w") as log:
+        # Own process group, so the workers and the ChromaDB writer are killed along with the CLI
+        process = subprocess.Popen(command, cwd=run_dir, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            checkpoint = _wait_for_checkpoint(engine, process)
+        finally:
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    print(f"💥 Killed at checkpoint {checkpoint}/{params['n_prof']}")
+
+    print("⏱️ Running the ingest again")
+    with open(os.path.join(run_dir, "resumed_run.log"), "w") as log:
+        returncode = subprocess.run(command, cwd=run_dir, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+    if returncode != 0:
+        print(f"❌ The resumed ingest failed (exit {returncode}); see {run_dir}/resumed_run.log")
+        return False
+
+    with engine.connect() as connection:
+        keys = connection.execute(text("SELECT platform_number, cycle_number FROM profile_metadata")).all()
+        status = connection.execute(text("SELECT status FROM ingest_manifest")).scalar()
+    ids = [f"{platform}_cycle_{cycle}" for platform, cycle in keys]
+    client = chromadb.PersistentClient(
+        path=os.path.join(run_dir, "chroma_db_storage"), settings=Settings(anonymized_telemetry=False)
+    )
+    embedded = set(client.get_or_create_collection(name="argo_profiles").get(ids=ids, include=[])["ids"])
+    missing = [profile_id for profile_id in ids if profile_id not in embedded]
+
+    print(f"💾 {len(keys)}/{params['n_prof']} profiles stored, {len(ids) - len(missing)} embedded, manifest {status}")
+    if len(keys) != params["n_prof"] or missing or status != "completed":
+        print(f"❌ Resumed ingest left profiles out (without embeddings: {missing[:5]}{'...' if len(missing) > 5 else ''})")
+        return False
+    print("✅ Every profile was stored and embedded after the resume")
+    return True
+
+
+CHECKS = {
+    "memory": check_memory,
+    "resume": check_resume,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check NetCDF ingestion behaviour on synthetic ARGO files")
+    parser.add_argument("check", nargs="*", choices=sorted(CHECKS), help="checks to run (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=100, help="profiles per slice")
+    parser.add_argument("--factor", type=int, default=8, help="slices in the larger file")
+    parser.add_argument("--n-levels", type=int, default=400)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed extra memory growth over a one-slice ingest")
+    parser.add_argument("--mode", choices=["vectorized", "legacy"], default="vectorized")
+    parser.add_argument("--writer", choices=["bulk", "orm"], default="bulk")
+    parser.add_argument("--db-url", help="scratch database, dropped before every run (default: SQLite in --work-dir)")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "argo_benchmark"))
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    args.db_url = args.db_url or f"sqlite:///{os.path.join(args.work_dir, 'check.sqlite')}"
+
+    failed = [name for name in args.check or sorted(CHECKS) if not CHECKS[name](args)]
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Ingestion benchmark for process_netcdf.
+
+Generates synthetic ARGO files, ingests each one into a fresh scratch database
+and a local ChromaDB directory, and appends the timings to a JSONL results file:
+
+    python -m benchmarks.run_ingest --case small --case history --mode vectorized --mode legacy
+    python -m benchmarks.run_ingest --n-prof 5000 --n-levels 800 --db-url postgresql+psycopg2://localhost/argo_bench
+
+Run it from the backend directory. The database at --db-url is dropped and
+recreated before every run, so never point it at real data; by default a SQLite
+file in the work directory stands in for Postgres. Each run happens in its own
+process so its peak memory can be measured, and every result is compared with
+the previous run of the same configuration in the results file.
+
+When a case runs in both modes, a history comparison record (legacy vs
+vectorized seconds of the history phase, and both row counts) is appended too:
+
+    python -m benchmarks.run_ingest --case history --mode legacy --mode vectorized
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_argo import write_synthetic_argo
+
+# Named file shapes; --n-prof etc. override individual sizes
+CASES = {
+    "small": dict(n_prof=200, n_levels=100, n_calib=1, n_param=3, n_history=5),
+    "medium": dict(n_prof=2000, n_levels=500, n_calib=1, n_param=3, n_history=5),
+    "large": dict(n_prof=10000, n_levels=1000, n_calib=1, n_param=3, n_history=5),
+    "history": dict(n_prof=500, n_levels=50, n_calib=1, n_param=3, n_history=50, history_filled=8),
+    "calibration": dict(n_prof=1000, n_levels=50, n_calib=5, n_param=6, n_history=2),
+}
+
+# A run this much slower than the previous run of the same configuration is flagged
+REGRESSION_THRESHOLD = 0.10
+
+DEFAULT_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+TABLES = ["float_metadata", "profile_metadata", "measurements", "calibrations", "processing_history"]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_one(run):
+    """Ingest one file into a fresh database; runs in a child process"""
+    os.environ["SUPABASE_DB_URL"] = run["db_url"]
+    os.environ["SQL_ECHO"] = "false"
+
+    import chromadb
+    from chromadb.config import Settings
+    from sqlalchemy import text
+    import config
+    from models import Base
+    from netcdf_processor import process_netcdf
+
+    engine = config.engine
+    if engine.dialect.name == "sqlite":
+        engine.dispose()
+        if os.path.exists(engine.url.database):
+            os.remove(engine.url.database)
+    else:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    client = chromadb.PersistentClient(path=run["chroma_dir"], settings=Settings(anonymized_telemetry=False))
+    collection_name = "argo_profiles_benchmark"
+    try:
+        client.delete_collection(collection_name)
+    except Exception:
+        pass
+    collection = client.get_or_create_collection(name=collection_name)
+
+    start = time.perf_counter()
+    result = process_netcdf(
+        run["file"],
+        mode=run["mode"],
+        writer=run["writer"],
+        chunk_size=run["chunk_size"],
+        engine=engine,
+        chroma_collection=collection,
+    )
+    seconds = time.perf_counter() - start
+
+    with engine.connect() as connection:
+        table_rows = {
+            table: connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in TABLES
+        }
+    rows_total = sum(table_rows.values())
+
+    return {
+        "seconds": round(seconds, 3),
+        "profiles": result["profiles_ingested"],
+        "profiles_per_sec": round(result["profiles_ingested"] / seconds, 1) if seconds > 0 else None,
+        "rows_total": rows_total,
+        "rows_per_sec": round(rows_total / seconds, 1) if seconds > 0 else None,
+        "table_rows": table_rows,
+        "writer_report": result.get("rows"),
+        "embeddings": result.get("embeddings"),
+        "phases": result.get("metrics", {}).get("phases"),
+        "peak_rss_mb": _peak_rss_mb(),
+        # Memory sampled by IngestMetrics around process_netcdf alone (imports and setup excluded)
+        "ingest_start_rss_mb": result.get("metrics", {}).get("start_rss_mb"),
+        "ingest_peak_rss_mb": result.get("metrics", {}).get("peak_rss_mb"),
+        "database": engine.dialect.name,
+    }
+
+
+def run_case(run):
+    """Run one benchmark configuration in a fresh process and return its result record"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        measured = pool.apply(_run_one, (run,))
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "case": run["case"],
+        "params": run["params"],
+        "mode": run["mode"],
+        "writer": run["writer"],
+        "chunk_size": run["chunk_size"],
+        "file_mb": round(os.path.getsize(run["file"]) / (1024 * 1024), 2),
+        **measured,
+    }
+
+
+def _config_key(record):
+    return (
+        record["case"], json.dumps(record["params"], sort_keys=True),
+        record["mode"], record["writer"], record["chunk_size"], record["database"],
+    )
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_result(history, record):
+    key = _config_key(record)
+    matches = [r for r in history if "comparison" not in r and _config_key(r) == key]
+    return matches[-1] if matches else None
+
+
+def history_comparisons(records):
+    """Legacy vs vectorized history phase of every case and writer that ran in both modes"""
+    runs = {}
+    for record in records:
+        runs.setdefault((record["case"], record["writer"]), {})[record["mode"]] = record
+    comparisons = []
+    for (case, writer), by_mode in runs.items():
+        if "legacy" not in by_mode or "vectorized" not in by_mode:
+            continue
+        legacy, vectorized = by_mode["legacy"], by_mode["vectorized"]
+        legacy_seconds = (legacy.get("phases") or {}).get("history", 0.0)
+        vectorized_seconds = (vectorized.get("phases") or {}).get("history", 0.0)
+        comparisons.append({
+            "timestamp": vectorized["timestamp"],
+            "git_commit": vectorized["git_commit"],
+            "comparison": "history",
+            "case": case,
+            "params": vectorized["params"],
+            "writer": writer,
+            "chunk_size": vectorized["chunk_size"],
+            "database": vectorized["database"],
+            "legacy_seconds": legacy_seconds,
+            "vectorized_seconds": vectorized_seconds,
+            "speedup": round(legacy_seconds / vectorized_seconds, 1) if vectorized_seconds > 0 else None,
+            "legacy_rows": legacy["table_rows"]["processing_history"],
+            "vectorized_rows": vectorized["table_rows"]["processing_history"],
+        })
+    return comparisons
+
+
+def print_history_comparison(comparison):
+    label = f"{comparison['case']} / {comparison['writer']}"
+    speedup = f"{comparison['speedup']:,.1f}x faster" if comparison["speedup"] is not None else "n/a"
+    rows = (
+        f"{comparison['vectorized_rows']} rows in both" if comparison["legacy_rows"] == comparison["vectorized_rows"]
+        else f"⚠️ rows differ: legacy {comparison['legacy_rows']}, vectorized {comparison['vectorized_rows']}"
+    )
+    print(
+        f"{label:<36} history: legacy {comparison['legacy_seconds']:.2f}s -> vectorized "
+        f"{comparison['vectorized_seconds']:.2f}s ({speedup}), {rows}"
+    )
+
+
+def print_comparison(record, previous):
+    label = f"{record['case']} / {record['mode']} / {record['writer']}"
+    line = (
+        f"{label:<36} {record['seconds']:>8.2f}s {record['profiles_per_sec'] or 0:>10,.1f} prof/s "
+        f"{record['rows_per_sec'] or 0:>12,.0f} rows/s {record['peak_rss_mb'] or 0:>8.0f} MB"
+    )
+    if previous:
+        change = (record["seconds"] - previous["seconds"]) / previous["seconds"] if previous["seconds"] else 0.0
+        flag = "  ⚠️ REGRESSION" if change > REGRESSION_THRESHOLD else ""
+        line += f"  ({change:+.0%} vs {previous.get('git_commit') or previous['timestamp']}){flag}"
+    print(line)
+    if record.get("phases"):
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in record["phases"].items())
+        print(f"{'':<36} phases: {phases}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark NetCDF ingestion on synthetic ARGO files")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="file shape (repeatable, default small)")
+    parser.add_argument("--n-prof", type=int)
+    parser.add_argument("--n-levels", type=int)
+    parser.add_argument("--n-calib", type=int)
+    parser.add_argument("--n-param", type=int)
+    parser.add_argument("--n-history", type=int)
+    parser.add_argument("--mode", action="append", choices=["vectorized", "legacy"], help="repeatable")
+    parser.add_argument("--writer", action="append", choices=["bulk", "orm"], help="repeatable")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="profiles per slice (0 = whole file)")
+    parser.add_argument("--db-url", help="scratch database, dropped before every run (default: SQLite in --work-dir)")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "argo_benchmark"))
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSONL file results are appended to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    db_url = args.db_url or f"sqlite:///{os.path.join(args.work_dir, 'benchmark.sqlite')}"
+    chroma_dir = os.path.join(args.work_dir, "chroma")
+    overrides = {
+        name: value for name, value in [
+            ("n_prof", args.n_prof), ("n_levels", args.n_levels), ("n_calib", args.n_calib),
+            ("n_param", args.n_param), ("n_history", args.n_history),
+        ] if value is not None
+    }
+    cases = args.case or (["custom"] if overrides else ["small"])
+
+    history = load_results(args.results)
+    records = []
+    for case in cases:
+        params = {**CASES.get(case, CASES["small"]), **overrides}
+        file_path = os.path.join(args.work_dir, f"{case}_{args.seed}_" + "_".join(f"{v}" for v in params.values()) + ".nc")
+        if not os.path.exists(file_path):
+            print(f"🧪 Generating {case} file {params}")
+            write_synthetic_argo(file_path, seed=args.seed, **params)
+
+        for mode in args.mode or ["vectorized"]:
+            for writer in args.writer or ["bulk"]:
+                run = {
+                    "case": case, "params": params, "file": file_path, "mode": mode, "writer": writer,
+                    "chunk_size": args.chunk_size, "db_url": db_url, "chroma_dir": chroma_dir,
+                }
+                print(f"⏱️ {case} / {mode} / {writer}")
+                records.append(run_case(run))
+
+    comparisons = history_comparisons(records)
+    with open(args.results, "a") as f:
+        for record in records + comparisons:
+            f.write(json.dumps(record) + "\n")
+
+    print("\n" + "=" * 100)
+    for record in records:
+        print_comparison(record, previous_result(history, record))
+    for comparison in comparisons:
+        print_history_comparison(comparison)
+    print(f"\n📊 Results appended to {args.results}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
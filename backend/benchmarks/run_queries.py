@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Query benchmark for the measurements table layout.
+
+Loads one synthetic ARGO file into a scratch Postgres database once per
+layout, then times representative queries with EXPLAIN ANALYZE and appends
+the results to a JSONL file:
+
+    python -m benchmarks.run_queries --db-url postgresql+psycopg2://localhost/argo_bench --case medium
+
+Layouts:
+    baseline     the single-column indexes from before migrations/001, no partitioning
+    indexed      create_all: composite and BRIN indexes, measurements unpartitioned
+    partitioned  create_all plus migrations/ (measurements partitioned by year)
+
+Run it from the backend directory. The database at --db-url is dropped and
+recreated for every layout, so never point it at real data. Every query is run
+with the same parameters in every layout, picked from the loaded data.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks.run_ingest import CASES, _git_commit
+from benchmarks.synthetic_argo import write_synthetic_argo
+from climatology import CUBE_REFERENCES
+
+LAYOUTS = ["baseline", "indexed", "partitioned"]
+
+# Back to the indexes the models had before composite/BRIN indexing
+BASELINE_SQL = """
+DROP INDEX ix_measurements_platform_cycle_pres;
+DROP INDEX ix_measurements_juld_brin;
+DROP INDEX ix_profile_metadata_latitude_longitude;
+CREATE INDEX ix_measurements_platform_number ON measurements (platform_number);
+CREATE INDEX ix_measurements_cycle_number ON measurements (cycle_number);
+CREATE INDEX ix_profile_metadata_latitude ON profile_metadata (latitude);
+"""
+
+QUERIES = {
+    # One profile's levels, as the chat and the profile views fetch them
+    "one_profile": """
+        SELECT pres, temp, psal FROM measurements
+        WHERE platform_number = %(platform)s AND cycle_number = %(cycle)s
+        ORDER BY pres
+    """,
+    # "Temperature at depth X in region Y during month Z"
+    "depth_region_month": """
+        SELECT p.platform_number, p.cycle_number, p.latitude, p.longitude, m.pres, m.temp
+        FROM profile_metadata p
+        JOIN measurements m ON m.platform_number = p.platform_number AND m.cycle_number = p.cycle_number
+        WHERE p.latitude BETWEEN %(lat_min)s AND %(lat_max)s
+          AND p.longitude BETWEEN %(lon_min)s AND %(lon_max)s
+          AND p.juld >= %(month_start)s AND p.juld < %(month_stop)s
+          AND m.juld >= %(month_start)s AND m.juld < %(month_stop)s
+          AND m.pres BETWEEN %(pres_min)s AND %(pres_max)s
+    """,
+    # Monthly means over one year near the surface
+    "monthly_surface_temp": """
+        SELECT date_trunc('month', juld) AS month, avg(temp) AS mean_temp, count(*) AS n
+        FROM measurements
+        WHERE juld >= %(year_start)s AND juld < %(year_stop)s AND pres < 10
+        GROUP BY 1 ORDER BY 1
+    """,
+    # The same monthly means from the climatology cube (surface depth bin)
+    "monthly_surface_temp_cube": """
+        SELECT month, %(temp_reference)s + sum(temp_anomaly_sum) / nullif(sum(temp_count), 0) AS mean_temp, sum(temp_count) AS n
+        FROM climatology_cube
+        WHERE month >= %(year_start)s AND month < %(year_stop)s AND depth_bin < 10
+        GROUP BY 1 ORDER BY 1
+    """,
+    # Good temperatures in a narrow range, QC-resolved per row as generated SQL has to without *_best
+    "temp_range_qc_case": """
+        SELECT count(*) FROM measurements m
+        JOIN profile_metadata p ON p.platform_number = m.platform_number AND p.cycle_number = m.cycle_number
+        WHERE CASE WHEN p.data_mode IN ('A', 'D') THEN m.temp_adjusted ELSE m.temp END
+              BETWEEN %(temp_min)s AND %(temp_max)s
+          AND CASE WHEN p.data_mode IN ('A', 'D') THEN m.temp_adjusted_qc ELSE m.temp_qc END IN ('1', '2', '5', '8')
+          AND m.pres_qc IN ('1', '2', '5', '8')
+    """,
+    # The same count from the QC-resolved column
+    "temp_range_best": """
+        SELECT count(*) FROM measurements WHERE temp_best BETWEEN %(temp_min)s AND %(temp_max)s
+    """,
+    "profiles_in_region_month": """
+        SELECT count(*) FROM profile_metadata
+        WHERE latitude BETWEEN %(lat_min)s AND %(lat_max)s
+          AND longitude BETWEEN %(lon_min)s AND %(lon_max)s
+          AND juld >= %(month_start)s AND juld < %(month_stop)s
+    """,
+}
+
+DEFAULT_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_results.jsonl")
+
+
+def _execute_script(engine, sql):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(sql)
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def query_parameters(cursor):
+    """Parameters for QUERIES taken from the loaded data: the median profile's month, year and depth"""
+    cursor.execute("""
+        SELECT platform_number, cycle_number, juld FROM profile_metadata
+        WHERE juld IS NOT NULL ORDER BY juld OFFSET (SELECT count(juld) / 2 FROM profile_metadata) LIMIT 1
+    """)
+    platform, cycle, juld = cursor.fetchone()
+    cursor.execute("SELECT percentile_disc(0.5) WITHIN GROUP (ORDER BY pres) FROM measurements")
+    depth = cursor.fetchone()[0]
+    # A 1% slice of the temperatures
+    cursor.execute("SELECT percentile_disc(ARRAY[0.5, 0.51]) WITHIN GROUP (ORDER BY temp_best) FROM measurements")
+    temp_min, temp_max = cursor.fetchone()[0]
+    month_start = datetime.datetime(juld.year, juld.month, 1)
+    month_stop = datetime.datetime(juld.year + juld.month // 12, juld.month % 12 + 1, 1)
+    return {
+        "platform": platform, "cycle": cycle,
+        "lat_min": -20.0, "lat_max": 20.0, "lon_min": 0.0, "lon_max": 90.0,
+        "month_start": month_start, "month_stop": month_stop,
+        "year_start": datetime.datetime(juld.year, 1, 1), "year_stop": datetime.datetime(juld.year + 1, 1, 1),
+        "pres_min": depth - 25.0, "pres_max": depth + 25.0,
+        "temp_min": temp_min, "temp_max": temp_max,
+        "temp_reference": CUBE_REFERENCES["temp"],
+    }
+
+
+def _scanned_relations(plan, relations=None):
+    """Relations (tables and partitions) a plan reads, with the index used for each"""
+    relations = set() if relations is None else relations
+    if "Relation Name" in plan:
+        index = plan.get("Index Name")
+        relations.add(f"{plan['Relation Name']} ({plan['Node Type']}{' ' + index if index else ''})")
+    for child in plan.get("Plans", []):
+        _scanned_relations(child, relations)
+    return relations
+
+
+def time_query(cursor, sql, parameters, repeat):
+    """Median planning + execution milliseconds of a query over repeat runs, after one warm-up run"""
+    timings = []
+    plan = None
+    for _ in range(repeat + 1):
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, parameters)
+        plan = cursor.fetchone()[0][0]
+        timings.append(plan["Planning Time"] + plan["Execution Time"])
+    return {
+        "ms": round(statistics.median(timings[1:]), 3),
+        "rows": plan["Plan"].get("Actual Rows"),
+        "scans": sorted(_scanned_relations(plan["Plan"])),
+    }
+
+
+def _run_layout(run):
+    """Load the file in one layout and time every query; runs in a child process"""
+    os.environ["SUPABASE_DB_URL"] = run["db_url"]
+    os.environ["SQL_ECHO"] = "false"
+
+    import chromadb
+    from chromadb.config import Settings
+    import config
+    from init_db import apply_migrations
+    from models import Base
+    from netcdf_processor import process_netcdf
+
+    engine = config.engine
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    if run["layout"] == "baseline":
+        _execute_script(engine, BASELINE_SQL)
+    elif run["layout"] == "partitioned":
+        apply_migrations(engine)
+
+    client = chromadb.PersistentClient(path=run["chroma_dir"], settings=Settings(anonymized_telemetry=False))
+    collection_name = "argo_profiles_query_benchmark"
+    try:
+        client.delete_collection(collection_name)
+    except Exception:
+        pass
+    process_netcdf(run["file"], engine=engine, chroma_collection=client.get_or_create_collection(name=collection_name))
+
+    connection = engine.raw_connection()
+    try:
+        connection.dbapi_connection.autocommit = True
+        cursor = connection.cursor()
+        # Fresh statistics and BRIN summaries, as autovacuum would leave them
+        cursor.execute("VACUUM ANALYZE")
+        parameters = query_parameters(cursor)
+        results = {name: time_query(cursor, sql, parameters, run["repeat"]) for name, sql in QUERIES.items()}
+        cursor.execute("SELECT count(*) FROM measurements")
+        measurement_rows = cursor.fetchone()[0]
+    finally:
+        connection.close()
+    return {"measurement_rows": measurement_rows, "queries": results}
+
+
+def run_layout(run):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        measured = pool.apply(_run_layout, (run,))
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "case": run["case"],
+        "params": run["params"],
+        "layout": run["layout"],
+        "repeat": run["repeat"],
+        **measured,
+    }
+
+
+def print_comparison(records):
+    layouts = [record["layout"] for record in records]
+    print(f"{'query':<28}" + "".join(f"{layout:>16}" for layout in layouts))
+    for name in QUERIES:
+        timings = [record["queries"][name]["ms"] for record in records]
+        line = f"{name:<28}" + "".join(f"{ms:>14.2f}ms" for ms in timings)
+        if timings[0] and len(timings) > 1:
+            line += "   " + ", ".join(f"{timings[0] / ms:.1f}x" if ms else "n/a" for ms in timings[1:])
+        print(line)
+    for record in records:
+        print(f"\n{record['layout']} ({record['measurement_rows']:,} measurements):")
+        for name, result in record["queries"].items():
+            scans = result["scans"]
+            more = f" and {len(scans) - 4} more" if len(scans) > 4 else ""
+            print(f"  {name}: {result['rows']} rows, reads {', '.join(scans[:4])}{more}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark representative queries on each measurements layout")
+    parser.add_argument("--db-url", required=True, help="scratch Postgres database, dropped before every layout")
+    parser.add_argument("--case", default="medium", choices=sorted(CASES), help="synthetic file shape")
+    parser.add_argument("--layout", action="append", choices=LAYOUTS, help="repeatable (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "argo_benchmark"))
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSONL file results are appended to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if not args.db_url.startswith("postgresql"):
+        parser.error("the query benchmark needs a Postgres --db-url (BRIN indexes and partitioning)")
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    params = CASES[args.case]
+    file_path = os.path.join(args.work_dir, f"{args.case}_{args.seed}_" + "_".join(f"{v}" for v in params.values()) + ".nc")
+    if not os.path.exists(file_path):
+        print(f"🧪 Generating {args.case} file {params}")
+        write_synthetic_argo(file_path, seed=args.seed, **params)
+
+    records = []
+    for layout in args.layout or LAYOUTS:
+        print(f"⏱️ {args.case} / {layout}")
+        records.append(run_layout({
+            "case": args.case, "params": params, "file": file_path, "layout": layout, "repeat": args.repeat,
+            "db_url": args.db_url, "chroma_dir": os.path.join(args.work_dir, "chroma"),
+        }))
+
+    with open(args.results, "a") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    print("\n" + "=" * 100)
+    print_comparison(records)
+    print(f"\n📊 Results appended to {args.results}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Synthetic ARGO profile files for ingestion benchmarks.
+
+write_synthetic_argo() writes a NetCDF file laid out like a GDAC *_prof.nc file:
+the same dimensions, char variables and fill values, and every variable that
+process_netcdf reads. Values are random but reproducible from the seed.
+"""
+
+import numpy as np
+import netCDF4
+
+FLOAT_FILL = 99999.0
+JULD_FILL = 999999.0
+
+STRING_DIMENSIONS = {
+    'STRING2': 2, 'STRING4': 4, 'STRING8': 8, 'STRING16': 16,
+    'STRING32': 32, 'STRING64': 64, 'STRING256': 256, 'DATE_TIME': 14,
+}
+
+PARAMETERS = ['PRES', 'TEMP', 'PSAL', 'DOXY', 'CHLA', 'BBP700']
+
+
+def _char_variable(ds, name, dims, values):
+    """Write an array of Python strings as an ARGO char variable (last dim = string length)"""
+    width = ds.dimensions[dims[-1]].size
+    variable = ds.createVariable(name, 'S1', dims, fill_value=b' ')
+    strings = np.array(values, dtype=f'S{width}')
+    variable[:] = strings.reshape(strings.shape + (1,)).view('S1')
+
+
+def _float_variable(ds, name, dims, values, fill_value=FLOAT_FILL, dtype='f4'):
+    variable = ds.createVariable(name, dtype, dims, fill_value=fill_value)
+    variable[:] = np.ma.masked_invalid(values)
+    return variable
+
+
+def _qc_variable(ds, name, dims, rng, missing):
+    """QC flags: mostly '1', some '4', blank where the value is missing"""
+    flags = np.where(rng.random(missing.shape) < 0.9, b'1', b'4')
+    flags[missing] = b' '
+    variable = ds.createVariable(name, 'S1', dims, fill_value=b' ')
+    variable[:] = flags
+
+
+def write_synthetic_argo(path, n_prof=100, n_levels=100, n_calib=1, n_param=3, n_history=5,
+                         n_platforms=5, history_filled=None, data_mode='R', seed=0):
+    """Write a synthetic ARGO profile file and return its path.
+
+    Profiles are spread over n_platforms floats with consecutive cycle numbers.
+    Deeper levels are partly missing, as in real profiles. Only the first
+    history_filled N_HISTORY slots (default: all) carry history records; the
+    rest are blank, as in real files.
+    """
+    rng = np.random.default_rng(seed)
+    history_filled = n_history if history_filled is None else min(history_filled, n_history)
+    parameters = PARAMETERS[:n_param]
+
+    ds = netCDF4.Dataset(path, 'w', format='NETCDF4')
+    try:
+        for name, size in STRING_DIMENSIONS.items():
+            ds.createDimension(name, size)
+        ds.createDimension('N_PROF', n_prof)
+        ds.createDimension('N_PARAM', n_param)
+        ds.createDimension('N_LEVELS', n_levels)
+        ds.createDimension('N_CALIB', n_calib)
+        ds.createDimension('N_HISTORY', None)
+
+        _char_variable(ds, 'DATA_TYPE', ('STRING16',), 'Argo profile')
+        _char_variable(ds, 'REFERENCE_DATE_TIME', ('DATE_TIME',), '19500101000000')
+
+        # Floats and cycles
+        platform_ids = np.array([str(1900000 + i) for i in range(n_platforms)])
+        platform_of_profile = np.sort(rng.integers(0, n_platforms, n_prof))
+        cycles = np.zeros(n_prof, dtype=np.int32)
+        for platform in np.unique(platform_of_profile):
+            members = platform_of_profile == platform
+            cycles[members] = np.arange(1, members.sum() + 1)
+        _char_variable(ds, 'PLATFORM_NUMBER', ('N_PROF', 'STRING8'), platform_ids[platform_of_profile])
+        cycle = ds.createVariable('CYCLE_NUMBER', 'i4', ('N_PROF',), fill_value=99999)
+        cycle[:] = cycles
+
+        per_profile = lambda value: [value] * n_prof
+        _char_variable(ds, 'PROJECT_NAME', ('N_PROF', 'STRING64'), per_profile('SYNTHETIC ARGO'))
+        _char_variable(ds, 'PI_NAME', ('N_PROF', 'STRING64'), per_profile('BENCHMARK'))
+        _char_variable(ds, 'STATION_PARAMETERS', ('N_PROF', 'N_PARAM', 'STRING16'), [parameters] * n_prof)
+        _char_variable(ds, 'DATA_CENTRE', ('N_PROF', 'STRING2'), per_profile('IN'))
+        _char_variable(ds, 'DC_REFERENCE', ('N_PROF', 'STRING32'), [f'REF{i}' for i in range(n_prof)])
+        _char_variable(ds, 'DATA_STATE_INDICATOR', ('N_PROF', 'STRING4'), per_profile('2B'))
+        _char_variable(ds, 'PLATFORM_TYPE', ('N_PROF', 'STRING32'), per_profile('ARVOR'))
+        _char_variable(ds, 'FLOAT_SERIAL_NO', ('N_PROF', 'STRING32'), [f'SN{p}' for p in platform_of_profile])
+        _char_variable(ds, 'FIRMWARE_VERSION', ('N_PROF', 'STRING32'), per_profile('5900A04'))
+        _char_variable(ds, 'WMO_INST_TYPE', ('N_PROF', 'STRING4'), per_profile('844'))
+        _char_variable(ds, 'POSITIONING_SYSTEM', ('N_PROF', 'STRING8'), per_profile('GPS'))
+        _char_variable(ds, 'VERTICAL_SAMPLING_SCHEME', ('N_PROF', 'STRING256'),
+                       per_profile('Primary sampling: averaged'))
+        for name, value in [('DIRECTION', b'A'), ('DATA_MODE', data_mode.encode()), ('JULD_QC', b'1'),
+                            ('POSITION_QC', b'1'), ('PROFILE_PRES_QC', b'A'), ('PROFILE_TEMP_QC', b'A'),
+                            ('PROFILE_PSAL_QC', b'A')]:
+            variable = ds.createVariable(name, 'S1', ('N_PROF',), fill_value=b' ')
+            variable[:] = np.array([value] * n_prof)
+        mission = ds.createVariable('CONFIG_MISSION_NUMBER', 'i4', ('N_PROF',), fill_value=99999)
+        mission[:] = np.ones(n_prof, dtype=np.int32)
+
+        # Time and position: ten days between cycles
+        juld_days = 25000.0 + cycles * 10.0 + rng.random(n_prof)
+        for name in ('JULD', 'JULD_LOCATION'):
+            juld = _float_variable(ds, name, ('N_PROF',), juld_days, fill_value=JULD_FILL, dtype='f8')
+            juld.units = 'days since 1950-01-01 00:00:00 UTC'
+        _float_variable(ds, 'LATITUDE', ('N_PROF',), rng.uniform(-60, 60, n_prof), dtype='f8')
+        _float_variable(ds, 'LONGITUDE', ('N_PROF',), rng.uniform(-180, 180, n_prof), dtype='f8')
+
+        # Per-level data; the last levels of each profile are missing
+        depth_levels = rng.integers(n_levels // 2, n_levels + 1, n_prof)
+        missing = np.arange(n_levels)[None, :] >= depth_levels[:, None]
+        pres = np.cumsum(rng.uniform(1, 10, (n_prof, n_levels)), axis=1)
+        temp = 28.0 * np.exp(-pres / 700.0) + rng.normal(0, 0.1, pres.shape) + 2.0
+        psal = 34.5 + 0.5 * np.tanh(pres / 500.0) + rng.normal(0, 0.02, pres.shape)
+        level_values = {
+            'PRES': pres, 'PRES_ADJUSTED': pres,
+            'TEMP': temp, 'TEMP_ADJUSTED': temp, 'TEMP_ADJUSTED_ERROR': np.full(pres.shape, 0.002),
+            'PSAL': psal, 'PSAL_ADJUSTED': psal, 'PSAL_ADJUSTED_ERROR': np.full(pres.shape, 0.01),
+        }
+        for name, values in level_values.items():
+            _float_variable(ds, name, ('N_PROF', 'N_LEVELS'), np.where(missing, np.nan, values))
+        for name in ('PRES_QC', 'TEMP_QC', 'TEMP_ADJUSTED_QC', 'PSAL_QC', 'PSAL_ADJUSTED_QC'):
+            _qc_variable(ds, name, ('N_PROF', 'N_LEVELS'), rng, missing)
+
+        # Calibration
+        calib_dims = ('N_PROF', 'N_CALIB', 'N_PARAM')
+        calib_shape = (n_prof, n_calib, n_param)
+        _char_variable(ds, 'PARAMETER', calib_dims + ('STRING16',),
+                       np.broadcast_to(np.array(parameters), calib_shape))
+        _char_variable(ds, 'SCIENTIFIC_CALIB_EQUATION', calib_dims + ('STRING256',),
+                       np.full(calib_shape, 'PRES_ADJUSTED = PRES - dP'))
+        _char_variable(ds, 'SCIENTIFIC_CALIB_COEFFICIENT', calib_dims + ('STRING256',),
+                       np.full(calib_shape, 'dP = 0.1 dbar'))
+        _char_variable(ds, 'SCIENTIFIC_CALIB_COMMENT', calib_dims + ('STRING256',),
+                       np.full(calib_shape, 'Synthetic calibration'))
+        _char_variable(ds, 'SCIENTIFIC_CALIB_DATE', calib_dims + ('DATE_TIME',),
+                       np.full(calib_shape, '20200101000000'))
+
+        # Processing history (N_HISTORY x N_PROF); unfilled slots stay blank
+        history_dims = ('N_HISTORY', 'N_PROF')
+        filled = np.arange(n_history)[:, None] < history_filled
+        history_text = {
+            'HISTORY_INSTITUTION': ('STRING4', 'IF'),
+            'HISTORY_STEP': ('STRING4', 'ARGQ'),
+            'HISTORY_SOFTWARE': ('STRING4', 'COQC'),
+            'HISTORY_SOFTWARE_RELEASE': ('STRING4', '1.0'),
+            'HISTORY_REFERENCE': ('STRING64', 'WOD2001'),
+            'HISTORY_DATE': ('DATE_TIME', '20210101120000'),
+            'HISTORY_ACTION': ('STRING4', 'QCP$'),
+            'HISTORY_PARAMETER': ('STRING16', 'TEMP'),
+            'HISTORY_QCTEST': ('STRING16', '0x0400'),
+        }
+        for name, (string_dim, value) in history_text.items():
+            values = np.broadcast_to(np.where(filled, value, ''), (n_history, n_prof))
+            _char_variable(ds, name, history_dims + (string_dim,), values)
+        for name in ('HISTORY_START_PRES', 'HISTORY_STOP_PRES', 'HISTORY_PREVIOUS_VALUE'):
+            values = np.where(filled, rng.uniform(0, 2000, (n_history, n_prof)), np.nan)
+            _float_variable(ds, name, history_dims, values)
+    finally:
+        ds.close()
+    return path
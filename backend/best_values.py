@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+QC-resolved "best" values of every measurement level.
+
+Picking between raw and adjusted values and checking QC flags on every
+scanned row is what generated SQL most often gets wrong, so ingest stores the
+answer in four measurements columns:
+
+- pres_best, temp_best, psal_best: the adjusted temp and psal of profiles in
+  data mode A or D, the raw ones otherwise; NULL unless the value and the
+  level's pressure have good QC flags (1, 2, 5 or 8). Adjusted pressure is not
+  ingested, so pres_best is the pressure wherever its QC flag is good.
+- good_mask: GOOD_PRES | GOOD_TEMP | GOOD_PSAL bits of the best values present
+
+Measurements stored before these columns existed are filled in with:
+
+    python best_values.py --backfill
+"""
+
+import argparse
+
+import numpy as np
+from sqlalchemy import select, tuple_
+
+from bulk_loader import update_rows
+from climatology import ADJUSTED_DATA_MODES
+from models import Measurement, ProfileMetadata
+from standard_levels import good_masks
+
+GOOD_PRES = 1
+GOOD_TEMP = 2
+GOOD_PSAL = 4
+
+BEST_COLUMNS = ['pres_best', 'temp_best', 'psal_best', 'good_mask']
+
+# Measurement columns the best values are chosen from
+SOURCE_COLUMNS = ['pres', 'pres_qc'] + [
+    f'{name}{suffix}' for name in ['temp', 'psal'] for suffix in ['', '_qc', '_adjusted', '_adjusted_qc']
+]
+
+
+def adjusted_profiles(data_modes):
+    """Where the data modes (one per profile) call for adjusted values"""
+    return np.isin(np.asarray(data_modes, dtype=object), ADJUSTED_DATA_MODES)
+
+
+def best_level_arrays(level_arrays, adjusted, good=None):
+    """Best pres, temp and psal of N_PROF x N_LEVELS level arrays, NaN where missing or not good.
+
+    adjusted marks the profiles (data mode A or D) whose adjusted values are used,
+    and good is the good_masks of level_arrays (computed here when not given).
+    """
+    pres = level_arrays['pres']
+    good = good or good_masks(level_arrays)
+    good_pres = good['pres_qc']
+    best = {'pres': np.where(good_pres, pres, np.nan) if good_pres is not None else np.full(pres.shape, np.nan)}
+    adjusted = np.asarray(adjusted, dtype=bool)[:, None]
+    for name in ['temp', 'psal']:
+        choices = []
+        for column in [name, f'{name}_adjusted']:
+            values = level_arrays.get(column)
+            good_values = good[f'{column}_qc']
+            if values is None or good_values is None:
+                choices.append(np.full(pres.shape, np.nan))
+            else:
+                choices.append(np.where(good_values, values, np.nan))
+        best[name] = np.where(np.isnan(best['pres']), np.nan, np.where(adjusted, choices[1], choices[0]))
+    return best
+
+
+def best_columns(best):
+    """BEST_COLUMNS arrays of best_level_arrays output"""
+    good_mask = np.zeros(best['pres'].shape, dtype=np.int16)
+    for name, bit in [('pres', GOOD_PRES), ('temp', GOOD_TEMP), ('psal', GOOD_PSAL)]:
+        good_mask |= np.where(np.isnan(best[name]), 0, bit).astype(np.int16)
+    return {'pres_best': best['pres'], 'temp_best': best['temp'], 'psal_best': best['psal'], 'good_mask': good_mask}
+
+
+def level_best_columns(levels, adjusted):
+    """BEST_COLUMNS values of a flat list of levels (columns of equally long lists), as lists with None for NaN.
+
+    adjusted holds one flag per level.
+    """
+    level_arrays = {}
+    for column in SOURCE_COLUMNS:
+        values = levels.get(column)
+        if column.endswith('_qc'):
+            level_arrays[column] = None if values is None else np.array(values, dtype=object)[:, None]
+        else:
+            level_arrays[column] = None if values is None else np.array(
+                [np.nan if value is None else value for value in values], dtype=np.float64
+            )[:, None]
+    columns = best_columns(best_level_arrays(level_arrays, adjusted))
+    result = {}
+    for column, values in columns.items():
+        values = values[:, 0]
+        if values.dtype.kind == 'f':
+            result[column] = [None if np.isnan(value) else value for value in values.tolist()]
+        else:
+            result[column] = values.tolist()
+    return result
+
+
+def add_best_values(measurements, data_mode):
+    """Set BEST_COLUMNS on one profile's measurement row dicts"""
+    if not measurements:
+        return
+    levels = {column: [m.get(column) for m in measurements] for column in SOURCE_COLUMNS}
+    columns = level_best_columns(levels, np.full(len(measurements), data_mode in ADJUSTED_DATA_MODES))
+    for i, measurement in enumerate(measurements):
+        for column, values in columns.items():
+            measurement[column] = values[i]
+
+
+def backfill(engine, batch_size=500):
+    """Compute BEST_COLUMNS of stored measurements that have none yet, batch_size profiles at a time"""
+    from sqlalchemy.orm import sessionmaker
+
+    session = sessionmaker(bind=engine)()
+    total = 0
+    last_id = 0
+    key_columns = ['platform_number', 'cycle_number', 'id']
+    try:
+        while True:
+            profiles = session.execute(
+                select(ProfileMetadata.id, ProfileMetadata.platform_number, ProfileMetadata.cycle_number, ProfileMetadata.data_mode)
+                .where(ProfileMetadata.id > last_id)
+                .order_by(ProfileMetadata.id)
+                .limit(batch_size)
+            ).all()
+            if not profiles:
+                break
+            last_id = profiles[-1].id
+            data_modes = {(p.platform_number, p.cycle_number): p.data_mode for p in profiles}
+            rows = [
+                dict(row._mapping)
+                for row in session.execute(
+                    select(*[Measurement.__table__.c[column] for column in key_columns + SOURCE_COLUMNS])
+                    .where(tuple_(Measurement.platform_number, Measurement.cycle_number).in_(list(data_modes)))
+                    .where(Measurement.good_mask.is_(None))
+                )
+            ]
+            if rows:
+                levels = {column: [row[column] for row in rows] for column in SOURCE_COLUMNS}
+                adjusted = adjusted_profiles([data_modes[(row['platform_number'], row['cycle_number'])] for row in rows])
+                columns = level_best_columns(levels, adjusted)
+                update_rows(session, Measurement, [
+                    dict({column: row[column] for column in key_columns}, **{column: columns[column][i] for column in BEST_COLUMNS})
+                    for i, row in enumerate(rows)
+                ], key_columns)
+                session.commit()
+            total += len(rows)
+            print(f"  - resolved {total} measurements")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    print(f"✅ Best values computed for {total} measurements")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="QC-resolved best values of ARGO measurements")
+    parser.add_argument("--backfill", action="store_true", help="fill in the best value columns of stored measurements")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        from config import engine
+        backfill(engine)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
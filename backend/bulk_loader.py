@@ -0,0 +1,240 @@
+"""
+Row writers used by the NetCDF ingester.
+
+The "orm" writer adds one mapped object per row to the session, which is the
+original behaviour. The "bulk" writer streams rows straight into Postgres with
+COPY FROM STDIN (psycopg2), or with batched executemany INSERTs on any other
+database, and reports rows/sec per table.
+"""
+
+import csv
+import io
+import time
+from sqlalchemy import ARRAY, Column, MetaData, Table, bindparam, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Rows per COPY buffer, so large tables are streamed instead of built in memory at once
+COPY_CHUNK_ROWS = 50000
+
+
+def _array_literal(values):
+    """A Python list as a Postgres array literal for COPY ('{1.5,NULL,"text"}')"""
+    if values is None:
+        return None
+    items = []
+    for item in values:
+        if item is None:
+            items.append("NULL")
+        elif isinstance(item, str):
+            items.append('"' + item.replace("\\", "\\\\").replace('"', '\\"') + '"')
+        else:
+            items.append(repr(item))
+    return "{" + ",".join(items) + "}"
+
+
+def copy_rows(connection, table, columns, rows):
+    """COPY row dicts into a table through the psycopg2 connection, COPY_CHUNK_ROWS at a time"""
+    column_list = ", ".join(columns)
+    statement = f"COPY {table.name} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+    array_columns = [i for i, column in enumerate(columns) if isinstance(table.c[column].type, ARRAY)]
+    cursor = connection.connection.cursor()
+    try:
+        for start in range(0, len(rows), COPY_CHUNK_ROWS):
+            buffer = io.StringIO()
+            # Quote every non-NULL field so empty strings and NULLs stay distinct
+            writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL)
+            for row in rows[start:start + COPY_CHUNK_ROWS]:
+                values = [row[column] for column in columns]
+                for i in array_columns:
+                    values[i] = _array_literal(values[i])
+                writer.writerow(values)
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+class OrmRowWriter:
+    """Add rows through the ORM unit of work (session.add per row)"""
+
+    name = "orm"
+
+    def __init__(self):
+        self.rows_written = 0
+
+    def write(self, session, model, rows):
+        session.add_all(model(**row) for row in rows)
+        self.rows_written += len(rows)
+
+    def report(self):
+        return {}
+
+
+class BulkRowWriter:
+    """Stream rows into their table with COPY, or executemany INSERT where COPY is unavailable"""
+
+    name = "bulk"
+
+    def __init__(self):
+        self.stats = {}
+        self.rows_written = 0
+
+    def write(self, session, model, rows):
+        if not rows:
+            return
+        # Pending ORM objects (profiles, floats) must reach the database first,
+        # since the bulk rows reference them through foreign keys
+        session.flush()
+        connection = session.connection()
+        table = model.__table__
+        columns = list(rows[0])
+
+        start = time.perf_counter()
+        if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+            self._copy(connection, table, columns, rows)
+        else:
+            self._insert(connection, table, columns, rows)
+        elapsed = time.perf_counter() - start
+
+        table_stats = self.stats.setdefault(table.name, {"rows": 0, "seconds": 0.0})
+        table_stats["rows"] += len(rows)
+        table_stats["seconds"] += elapsed
+        self.rows_written += len(rows)
+
+    def _copy(self, connection, table, columns, rows):
+        copy_rows(connection, table, columns, rows)
+
+    def _insert(self, connection, table, columns, rows):
+        # executemany: one compiled statement, batched by the driver (or SQLAlchemy's
+        # insertmanyvalues), instead of compiling a huge multi-row VALUES list
+        for start in range(0, len(rows), COPY_CHUNK_ROWS):
+            connection.execute(insert(table), rows[start:start + COPY_CHUNK_ROWS])
+
+    def report(self):
+        """Print and return rows/sec for every table written so far"""
+        report = {}
+        for table_name, table_stats in self.stats.items():
+            seconds = table_stats["seconds"]
+            rate = table_stats["rows"] / seconds if seconds > 0 else None
+            report[table_name] = {
+                "rows": table_stats["rows"],
+                "seconds": round(seconds, 3),
+                "rows_per_sec": round(rate, 1) if rate is not None else None,
+            }
+            rate_str = f"{rate:,.0f} rows/sec" if rate is not None else "n/a"
+            print(f"⚡ Bulk loaded {table_stats['rows']} rows into {table_name} in {seconds:.2f}s ({rate_str})")
+        return report
+
+
+def dialect_insert(session, model):
+    """INSERT construct for the session's database, with ON CONFLICT support"""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        return postgresql.insert(model)
+    if dialect_name == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect_name}")
+
+
+def upsert_rows(session, model, rows, index_elements):
+    """INSERT ... ON CONFLICT (index_elements) DO UPDATE every other column, as one executemany"""
+    if not rows:
+        return
+    columns = list(rows[0])
+    statement = dialect_insert(session, model)
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: statement.excluded[column] for column in columns if column not in index_elements},
+    )
+    session.execute(statement, rows)
+
+
+def increment_rows(session, model, rows, index_elements):
+    """INSERT ... ON CONFLICT (index_elements) DO UPDATE adding every other column to the stored value.
+
+    On psycopg2 the rows are COPYed into a temporary table and merged with one
+    INSERT ... SELECT in key order (executemany runs one statement per row);
+    elsewhere they go as one executemany. No two rows may share a key.
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    table = model.__table__
+    connection = session.connection()
+    statement = dialect_insert(session, model)
+    staging = None
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        staging = Table(
+            f"{table.name}_increments", MetaData(),
+            *[Column(column, table.c[column].type) for column in columns],
+            prefixes=["TEMPORARY"],
+        )
+        staging.create(connection)
+        copy_rows(connection, staging, columns, rows)
+        statement = statement.from_select(
+            columns, select(*staging.c).order_by(*[staging.c[column] for column in index_elements])
+        )
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            column: table.c[column] + statement.excluded[column]
+            for column in columns if column not in index_elements
+        },
+    )
+    if staging is None:
+        session.execute(statement, rows)
+    else:
+        session.execute(statement)
+        staging.drop(connection)
+
+
+def update_rows(session, model, rows, key_columns):
+    """UPDATE every non-key column of the rows matching each row's key_columns.
+
+    On psycopg2 the rows are COPYed into a temporary table and applied with one
+    UPDATE ... FROM; elsewhere they go as one executemany.
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    table = model.__table__
+    connection = session.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        staging = Table(
+            f"{table.name}_updates", MetaData(),
+            *[Column(column, table.c[column].type) for column in columns],
+            prefixes=["TEMPORARY"],
+        )
+        staging.create(connection)
+        copy_rows(connection, staging, columns, rows)
+        statement = (
+            update(table)
+            .where(*[table.c[column] == staging.c[column] for column in key_columns])
+            .values({column: staging.c[column] for column in columns if column not in key_columns})
+        )
+        session.execute(statement)
+        staging.drop(connection)
+    else:
+        statement = (
+            update(table)
+            .where(*[table.c[column] == bindparam(f"key_{column}") for column in key_columns])
+            .values({column: bindparam(f"value_{column}") for column in columns if column not in key_columns})
+        )
+        connection.execute(statement, [
+            {(f"key_{column}" if column in key_columns else f"value_{column}"): value for column, value in row.items()}
+            for row in rows
+        ])
+
+
+WRITERS = {
+    OrmRowWriter.name: OrmRowWriter,
+    BulkRowWriter.name: BulkRowWriter,
+}
+
+
+def get_row_writer(name):
+    """Create the row writer registered under name ("orm" or "bulk")"""
+    try:
+        return WRITERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown ingestion writer: {name}")
@@ -9,7 +9,44 @@ load_dotenv()
 DB_URL = os.getenv("SUPABASE_DB_URL")
 
 
-engine = create_engine(DB_URL, echo=True)
+# SQL statement logging; turn off for large ingests where it dominates runtime
+SQL_ECHO = os.getenv("SQL_ECHO", "true").lower() in ("1", "true", "yes")
+
+engine = create_engine(DB_URL, echo=SQL_ECHO)
+
+# NetCDF ingestion mode: "vectorized" decodes whole N_PROF x N_LEVELS arrays,
+# "legacy" keeps the original per-cell loop
+NETCDF_INGEST_MODE = os.getenv("NETCDF_INGEST_MODE", "vectorized")
+
+# How ingested rows reach the database: "orm" adds one object per row,
+# "bulk" streams them with COPY FROM STDIN (batched INSERTs elsewhere)
+NETCDF_INGEST_WRITER = os.getenv("NETCDF_INGEST_WRITER", "bulk")
+
+# Where measurements are stored: "rows" (one measurements row per level),
+# "packed" (one profile_levels row of float4 arrays per profile) or "both"
+MEASUREMENT_STORAGE = os.getenv("MEASUREMENT_STORAGE", "rows")
+
+# Pressures (dbar) every profile's temp/psal are interpolated onto at ingest (profile_standard_levels)
+STANDARD_PRESSURE_LEVELS = sorted(float(level) for level in os.getenv(
+    "STANDARD_PRESSURE_LEVELS",
+    "5,10,20,30,50,75,100,125,150,200,250,300,400,500,600,700,800,900,1000,1200,1400,1500,1750,2000",
+).split(","))
+
+# Profiles read, written and committed per slice of a NetCDF file (0 = whole file)
+NETCDF_CHUNK_PROFILES = int(os.getenv("NETCDF_CHUNK_PROFILES", "1000"))
+
+# Uploaded files ingested concurrently by the background job queue
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Profile summaries encoded per sentence-transformers call during ingest
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Largest accepted NetCDF upload in MB, compressed request body and decompressed .nc.gz alike
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "10240"))
+
+# Directory of the Parquet analytics mirror of profiles and measurements, queried
+# with DuckDB by the MCP server ("" = no mirror; needs the analytics extra)
+ANALYTICS_MIRROR_DIRECTORY = os.getenv("ANALYTICS_MIRROR_DIRECTORY", "")
 
 # Chroma config
 CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "chroma_db_storage")  # Local folder
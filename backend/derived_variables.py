@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Derived oceanographic variables of every profile, computed in bulk at ingest.
+
+Four profile_summary columns come out of a profile's best values (adjusted
+ones for data modes A and D) at levels whose value and pressure QC flags are
+good (1, 2, 5 or 8):
+
+- sigma_theta_surface: potential density anomaly (kg/m^3, EOS-80, referenced
+  to the surface) at the shallowest level with good temperature and salinity
+- mixed_layer_depth: pressure (dbar) where sigma-theta first exceeds its
+  value at 10 dbar by 0.03 kg/m^3 (de Boyer Montegut et al. 2004)
+- thermocline_depth: pressure (dbar) of the steepest temperature decrease
+  between adjacent standard pressure levels, down to 1000 dbar
+- heat_content_0_700: rho0 * cp * integral of temperature over 0-700 dbar
+  (J/m^2), with the shallowest value held up to the surface. Needs a first
+  level within 20 dbar of the surface, data down to 700 dbar and no gap
+  wider than max_interpolation_gap()
+
+Pressure stands in for depth (1 dbar is about 1 m). Everything works on whole
+N_PROF x N_LEVELS arrays. Profiles ingested before these columns existed are
+filled in with:
+
+    python derived_variables.py --backfill
+"""
+
+import argparse
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from best_values import adjusted_profiles, best_level_arrays
+from climatology import stored_levels
+from models import ProfileMetadata, ProfileSummary
+from standard_levels import interpolate_to_levels, max_interpolation_gap, standard_levels_from_rows
+
+DERIVED_COLUMNS = ['sigma_theta_surface', 'mixed_layer_depth', 'thermocline_depth', 'heat_content_0_700']
+
+# Mixed layer: density threshold (kg/m^3) above the value at the reference pressure (dbar)
+MLD_REFERENCE_PRESSURE = 10.0
+MLD_DENSITY_THRESHOLD = 0.03
+
+THERMOCLINE_MAX_PRESSURE = 1000.0
+
+# Heat content: integration depth and deepest allowed first level (dbar), reference density and heat capacity
+HEAT_CONTENT_PRESSURE = 700.0
+HEAT_CONTENT_MAX_SURFACE_GAP = 20.0
+RHO0 = 1025.0
+CP = 3985.0
+
+
+def adiabatic_lapse_rate(s, t, p):
+    """Adiabatic temperature gradient (deg C/dbar) of seawater, UNESCO 1983 (t in IPTS-68)"""
+    ds = s - 35.0
+    return (
+        (((-2.1687e-16 * t + 1.8676e-14) * t - 4.6206e-13) * p
+         + ((2.7759e-12 * t - 1.1351e-10) * ds + ((-5.4481e-14 * t + 8.733e-12) * t - 6.7795e-10) * t + 1.8741e-8)) * p
+        + (-4.2393e-8 * t + 1.8932e-6) * ds
+        + ((6.6228e-10 * t - 6.836e-8) * t + 8.5258e-6) * t + 3.5803e-5
+    )
+
+
+def potential_temperature(s, t, p, pr=0.0):
+    """Potential temperature (IPTS-68) at reference pressure pr, UNESCO 1983 Runge-Kutta integration"""
+    h = pr - p
+    xk = h * adiabatic_lapse_rate(s, t, p)
+    t = t + 0.5 * xk
+    q = xk
+    p = p + 0.5 * h
+    xk = h * adiabatic_lapse_rate(s, t, p)
+    t = t + 0.29289322 * (xk - q)
+    q = 0.58578644 * xk + 0.121320344 * q
+    xk = h * adiabatic_lapse_rate(s, t, p)
+    t = t + 1.707106781 * (xk - q)
+    q = 3.414213562 * xk - 4.121320344 * q
+    p = p + 0.5 * h
+    xk = h * adiabatic_lapse_rate(s, t, p)
+    return t + (xk - 2.0 * q) / 6.0
+
+
+def surface_density(s, t):
+    """Density (kg/m^3) of seawater at zero pressure, EOS-80 (t in IPTS-68)"""
+    water = (
+        999.842594 + 6.793952e-2 * t - 9.095290e-3 * t ** 2 + 1.001685e-4 * t ** 3
+        - 1.120083e-6 * t ** 4 + 6.536332e-9 * t ** 5
+    )
+    with np.errstate(invalid='ignore'):
+        return (
+            water
+            + s * (0.824493 - 4.0899e-3 * t + 7.6438e-5 * t ** 2 - 8.2467e-7 * t ** 3 + 5.3875e-9 * t ** 4)
+            + s ** 1.5 * (-5.72466e-3 + 1.0227e-4 * t - 1.6546e-6 * t ** 2)
+            + 4.8314e-4 * s ** 2
+        )
+
+
+def sigma_theta(s, t, p):
+    """Potential density anomaly (kg/m^3) referenced to the surface; t in ITS-90 as stored by ARGO"""
+    t68 = 1.00024 * t
+    return surface_density(s, potential_temperature(s, t68, p)) - 1000.0
+
+
+def _sorted_good(pres, values):
+    """Pressures and values of every profile's good levels sorted shallow to deep, +inf/NaN after them"""
+    good = ~np.isnan(pres) & ~np.isnan(values)
+    order = np.argsort(np.where(good, pres, np.inf), axis=1, kind='stable')
+    sorted_pres = np.take_along_axis(np.where(good, pres, np.inf), order, axis=1)
+    sorted_values = np.take_along_axis(np.where(good, values, np.nan), order, axis=1)
+    return sorted_pres, sorted_values, good.sum(axis=1)
+
+
+def mixed_layer_depth(pres, sigma):
+    """Density-threshold mixed layer depth of every profile, NaN where it cannot be found"""
+    n_prof = pres.shape[0]
+    reference = interpolate_to_levels(pres, sigma, ~np.isnan(sigma), [MLD_REFERENCE_PRESSURE])[:, 0]
+    sorted_pres, sorted_sigma, _ = _sorted_good(pres, sigma)
+    with np.errstate(invalid='ignore'):
+        exceeds = (sorted_pres > MLD_REFERENCE_PRESSURE) & (sorted_sigma > (reference + MLD_DENSITY_THRESHOLD)[:, None])
+    found = exceeds.any(axis=1) & ~np.isnan(reference)
+    rows = np.arange(n_prof)
+    deeper = exceeds.argmax(axis=1)
+    shallower = np.maximum(deeper - 1, 0)
+    p0, p1 = sorted_pres[rows, shallower], sorted_pres[rows, deeper]
+    s0, s1 = sorted_sigma[rows, shallower], sorted_sigma[rows, deeper]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        crossing = p0 + (reference + MLD_DENSITY_THRESHOLD - s0) / (s1 - s0) * (p1 - p0)
+        bridged = p1 - p0 <= max_interpolation_gap(p0)
+    depth = np.where(bridged & (deeper > 0), np.maximum(crossing, MLD_REFERENCE_PRESSURE), np.nan)
+    return np.where(found, depth, np.nan)
+
+
+def thermocline_depth(standard_temp, levels):
+    """Mid-pressure of the steepest temperature decrease between adjacent standard levels"""
+    levels = np.asarray(levels, dtype=np.float64)
+    upper = levels <= THERMOCLINE_MAX_PRESSURE
+    temp = standard_temp[:, upper]
+    levels = levels[upper]
+    if len(levels) < 2:
+        return np.full(standard_temp.shape[0], np.nan)
+    gradient = (temp[:, :-1] - temp[:, 1:]) / np.diff(levels)
+    gradient = np.where(np.isnan(gradient), -np.inf, gradient)
+    steepest = gradient.argmax(axis=1)
+    middles = (levels[:-1] + levels[1:]) / 2
+    return np.where(gradient.max(axis=1) > 0, middles[steepest], np.nan)
+
+
+def heat_content(pres, temp):
+    """Heat content (J/m^2) of the top HEAT_CONTENT_PRESSURE dbar of every profile, NaN without full coverage"""
+    sorted_pres, sorted_temp, n_good = _sorted_good(pres, temp)
+    if sorted_pres.shape[1] < 2:
+        return np.full(pres.shape[0], np.nan)
+    p0, p1 = sorted_pres[:, :-1], sorted_pres[:, 1:]
+    t0, t1 = sorted_temp[:, :-1], sorted_temp[:, 1:]
+    top = np.clip(p0, 0.0, HEAT_CONTENT_PRESSURE)
+    bottom = np.clip(p1, 0.0, HEAT_CONTENT_PRESSURE)
+    inside = np.isfinite(p1) & (bottom > top)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (t1 - t0) / (p1 - p0)
+        area = (bottom - top) * (t0 + slope * ((top + bottom) / 2 - p0))
+        too_wide = inside & (p1 - p0 > max_interpolation_gap(p0))
+    first_pres, first_temp = sorted_pres[:, 0], sorted_temp[:, 0]
+    deepest = np.where(n_good > 0, sorted_pres[np.arange(len(n_good)), np.maximum(n_good - 1, 0)], np.nan)
+    total = np.where(inside, area, 0.0).sum(axis=1) + np.minimum(first_pres, HEAT_CONTENT_PRESSURE) * first_temp
+    covered = (first_pres <= HEAT_CONTENT_MAX_SURFACE_GAP) & (deepest >= HEAT_CONTENT_PRESSURE) & ~too_wide.any(axis=1)
+    # Celsius to Kelvin adds a constant, so heat content is relative to 0 deg C
+    return np.where(covered, RHO0 * CP * total, np.nan)
+
+
+def derived_variables(best, adjusted, standard_arrays, levels):
+    """DERIVED_COLUMNS of all profiles at once: {column: array of N_PROF values}, NaN where unknown.
+
+    best is the best_level_arrays of the profiles, adjusted marks the ones in
+    data mode A or D and standard_arrays is their standard_level_arrays on levels.
+    """
+    pres = best['pres']
+    if pres.shape[1] == 0:
+        return {column: np.full(pres.shape[0], np.nan) for column in DERIVED_COLUMNS}
+    with np.errstate(invalid='ignore'):
+        sigma = sigma_theta(best['psal'], best['temp'], np.where(np.isnan(pres), 0.0, pres))
+    sigma = np.where(np.isnan(pres), np.nan, sigma)
+
+    rows = np.arange(pres.shape[0])
+    has_sigma = ~np.isnan(sigma)
+    shallowest = np.where(has_sigma, pres, np.inf).argmin(axis=1)
+    standard_temp = np.where(adjusted[:, None], standard_arrays['temp_adjusted'], standard_arrays['temp'])
+    return {
+        'sigma_theta_surface': np.where(has_sigma.any(axis=1), sigma[rows, shallowest], np.nan),
+        'mixed_layer_depth': mixed_layer_depth(pres, sigma),
+        'thermocline_depth': thermocline_depth(standard_temp, levels),
+        'heat_content_0_700': heat_content(pres, best['temp']),
+    }
+
+
+def derived_at(derived, index):
+    """One profile's DERIVED_COLUMNS out of derived_variables, None for NaN"""
+    values = {}
+    for column in DERIVED_COLUMNS:
+        value = float(derived[column][index])
+        values[column] = value if np.isfinite(value) else None
+    return values
+
+
+def _row_array(values):
+    return np.array([[np.nan if value is None else value for value in values]], dtype=np.float64)
+
+
+def derived_from_rows(measurements, data_mode, standard_values, levels):
+    """derived_at of one profile given as measurement row dicts and its standard_levels_at values"""
+    level_arrays = {}
+    for name in ['pres', 'temp', 'temp_adjusted', 'psal', 'psal_adjusted']:
+        level_arrays[name] = _row_array([m.get(name) for m in measurements])
+    for name in ['pres_qc', 'temp_qc', 'temp_adjusted_qc', 'psal_qc', 'psal_adjusted_qc']:
+        level_arrays[name] = np.array([[m.get(name) for m in measurements]], dtype=object)
+    standard_arrays = {name: _row_array(standard_values[name]) for name in ['temp', 'temp_adjusted']}
+    adjusted = adjusted_profiles([data_mode])
+    return derived_at(derived_variables(best_level_arrays(level_arrays, adjusted), adjusted, standard_arrays, levels), 0)
+
+
+def backfill(engine, batch_size=1000):
+    """Compute DERIVED_COLUMNS of stored profiles whose summary has none yet"""
+    from sqlalchemy.orm import sessionmaker
+    from config import STANDARD_PRESSURE_LEVELS
+
+    session = sessionmaker(bind=engine)()
+    total = 0
+    last_id = 0
+    statement = (
+        update(ProfileSummary)
+        .where(ProfileSummary.id == bindparam('summary_id'))
+        .values({column: bindparam(column) for column in DERIVED_COLUMNS})
+    )
+    try:
+        while True:
+            batch = session.execute(
+                select(ProfileSummary.id, ProfileSummary.platform_number, ProfileSummary.cycle_number, ProfileMetadata.data_mode)
+                .join(ProfileMetadata, (ProfileMetadata.platform_number == ProfileSummary.platform_number)
+                      & (ProfileMetadata.cycle_number == ProfileSummary.cycle_number))
+                .where(ProfileSummary.id > last_id, *[ProfileSummary.__table__.c[column].is_(None) for column in DERIVED_COLUMNS])
+                .order_by(ProfileSummary.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            levels = stored_levels(session, [(row.platform_number, row.cycle_number) for row in batch])
+            by_profile = {}
+            for i, key in enumerate(zip(levels['platform_number'], levels['cycle_number'])):
+                by_profile.setdefault(key, []).append({column: values[i] for column, values in levels.items()})
+            values = []
+            for row in batch:
+                measurements = by_profile.get((row.platform_number, row.cycle_number), [])
+                standard_values = standard_levels_from_rows(measurements, STANDARD_PRESSURE_LEVELS)
+                values.append(dict(summary_id=row.id, **derived_from_rows(
+                    measurements, row.data_mode, standard_values, STANDARD_PRESSURE_LEVELS
+                )))
+            session.connection().execute(statement, values)
+            session.commit()
+            total += len(batch)
+            print(f"  - derived {total} profiles")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    print(f"✅ Derived variables computed for {total} profiles")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Derived oceanographic variables of ARGO profiles")
+    parser.add_argument("--backfill", action="store_true", help="fill in the derived profile_summary columns of stored profiles")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        from config import engine
+        backfill(engine)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+"""
+Background embedding of profile summaries during NetCDF ingestion.
+
+Summaries are collected into batches and encoded by the sentence-transformers
+model on a worker thread, so encoding overlaps with the database writes done by
+the ingesting thread. Encoded batches are added to ChromaDB from the same worker.
+Encoding and ChromaDB time are charged to the embed and chroma phases of the
+ingest's IngestMetrics, if one is given.
+"""
+
+import queue
+import threading
+import time
+
+# Sentinel that tells the worker thread there are no more batches
+_DONE = object()
+
+
+class EmbeddingPipeline:
+    """Encode summaries in batches on a worker thread and add them to a ChromaDB collection"""
+
+    def __init__(self, get_model, get_collection, batch_size=64, chroma_batch_size=100, max_pending_batches=4,
+                 upsert=False, metrics=None):
+        self.get_model = get_model
+        self.get_collection = get_collection
+        self.batch_size = batch_size
+        self.chroma_batch_size = chroma_batch_size
+        # upsert replaces existing entries with the same id (used when reingesting)
+        self.upsert = upsert
+        self.metrics = metrics
+
+        self._pending = []
+        # Bounded so the ingester cannot run arbitrarily far ahead of the encoder
+        self._queue = queue.Queue(maxsize=max_pending_batches)
+        self._thread = None
+        self._error = None
+        self._aborted = False
+
+        self.profiles_encoded = 0
+        self.encode_seconds = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="embedding-pipeline", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, profile_id, summary_text, metadata):
+        """Queue one profile summary; a batch is handed to the worker once it is full"""
+        if self._error is not None:
+            raise self._error
+        self._pending.append((profile_id, summary_text, metadata))
+        if len(self._pending) >= self.batch_size:
+            self._queue.put(self._pending)
+            self._pending = []
+
+    def flush(self):
+        """Block until every summary submitted so far is encoded and stored.
+
+        Re-raises the first encoding error seen by the worker.
+        """
+        if self._pending:
+            self._queue.put(self._pending)
+            self._pending = []
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Encode whatever is left, wait for the worker and return throughput stats.
+
+        Re-raises the first encoding error seen by the worker.
+        """
+        if self._pending:
+            self._queue.put(self._pending)
+            self._pending = []
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.report()
+
+    def abort(self):
+        """Stop the worker without encoding the remaining batches (used when ingestion fails)"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._aborted = True
+        self._pending = []
+        self._queue.put(_DONE)
+        self._thread.join()
+
+    def report(self):
+        rate = self.profiles_encoded / self.encode_seconds if self.encode_seconds > 0 else None
+        rate_str = f"{rate:,.1f} profiles/sec" if rate is not None else "n/a"
+        print(f"🧠 Encoded {self.profiles_encoded} profile summaries in {self.encode_seconds:.2f}s ({rate_str})")
+        return {
+            "profiles": self.profiles_encoded,
+            "seconds": round(self.encode_seconds, 3),
+            "profiles_per_sec": round(rate, 1) if rate is not None else None,
+        }
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is _DONE:
+                    return
+                if self._aborted or self._error is not None:
+                    continue
+                self._encode_and_store(batch)
+            except Exception as e:
+                print(f"❌ Error encoding profile summaries: {e}")
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _encode_and_store(self, batch):
+        ids = [item[0] for item in batch]
+        documents = [item[1] for item in batch]
+        metadatas = [item[2] for item in batch]
+
+        start = time.perf_counter()
+        embeddings = self.get_model().encode(documents, batch_size=self.batch_size, show_progress_bar=False).tolist()
+        encode_seconds = time.perf_counter() - start
+        self.encode_seconds += encode_seconds
+        self.profiles_encoded += len(batch)
+        if self.metrics is not None:
+            self.metrics.add_time("embed", encode_seconds)
+            self.metrics.count("embeddings", len(batch))
+
+        for offset in range(0, len(ids), self.chroma_batch_size):
+            chunk = slice(offset, offset + self.chroma_batch_size)
+            start = time.perf_counter()
+            try:
+                collection = self.get_collection()
+                store = collection.upsert if self.upsert else collection.add
+                store(
+                    ids=ids[chunk],
+                    embeddings=embeddings[chunk],
+                    metadatas=metadatas[chunk],
+                    documents=documents[chunk]
+                )
+                print(f"✓ Added batch of {len(ids[chunk])} profiles to ChromaDB")
+            except Exception as e:
+                # Same policy as before: a failed ChromaDB batch does not fail the ingest
+                print(f"⚠️ Warning: Failed to add batch to ChromaDB: {e}")
+                if self.metrics is not None:
+                    self.metrics.count("chroma_failed_batches")
+            finally:
+                if self.metrics is not None:
+                    self.metrics.add_time("chroma", time.perf_counter() - start)
@@ -2,17 +2,22 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from services.crewai_service import run_crewai_pipeline
 from socket_manager import socket_manager
-from netcdf_processor import process_netcdf
+from ingest_jobs import IngestJobQueue
+from ingest_metrics import metrics_summary
+from upload_stream import StreamingUploadRequest, UPLOAD_FOLDER, MAX_UPLOAD_BYTES, claim_upload, strip_gzip_suffix, upload_sha256
 from models import FloatMetadata, ProfileMetadata
 from sqlalchemy.orm import sessionmaker
 from config import engine
 from sqlalchemy import desc, func  # Added func import
 import os
 from datetime import datetime
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import traceback
 
 app = Flask(__name__)
+# Uploaded files are streamed straight into UPLOAD_FOLDER instead of a spooled copy
+app.request_class = StreamingUploadRequest
 SessionLocal = sessionmaker(bind=engine)
 
 # Simplified CORS configuration
@@ -21,13 +26,17 @@ CORS(app)  # This allows all origins for development
 # Initialize Socket.IO
 socket_manager.init_app(app)
 
+# Uploaded files are ingested in the background by a bounded worker pool
+ingest_jobs = IngestJobQueue(SessionLocal)
+
 # Configure upload settings
-UPLOAD_FOLDER = 'temp'
 ALLOWED_EXTENSIONS = {'nc', 'netcdf'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES  # MAX_UPLOAD_MB, default 10 GB
 
 def allowed_file(filename):
+    # Gzip-compressed files (.nc.gz) are decompressed while they are uploaded
+    filename = strip_gzip_suffix(filename)
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -48,7 +57,15 @@ def analyze_with_crewai():
 @app.route("/upload-netcdf/", methods=['POST'])
 def upload_netcdf():
     """
-    Upload and process a NetCDF file containing ARGO float data.
+    Upload a NetCDF file containing ARGO float data and queue it for ingestion.
+    The file may be gzip-compressed (.nc.gz); it is decompressed as it streams in.
+
+    Returns 202 with the job id straight away. Progress is available from
+    /api/ingest-jobs/<job_id>, and is pushed as ingest_progress / ingest_complete /
+    ingest_error events to the Socket.IO session given in the optional "sid" form field.
+    Set the "reingest" form field to "true" to replace existing profiles with
+    higher-quality (delayed-mode) data from this file. A finished job's result
+    includes the ingest's per-phase timings and peak memory under "metrics".
     """
     file_location = None
     try:
@@ -64,26 +81,39 @@ def upload_netcdf():
         
         if file and allowed_file(file.filename):
             # Create temp directory if it doesn't exist
-            os.makedirs("temp", exist_ok=True)
+            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
             
             # Secure the filename and create file path
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = secure_filename(file.filename)
+            filename = secure_filename(strip_gzip_suffix(file.filename))
             file_location = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{filename}")
             
-            # Save uploaded file
-            file.save(file_location)
+            # The upload was already streamed to disk while the request was parsed; rename it into place
+            claim_upload(file, file_location)
             
-            # Process the NetCDF file
-            process_netcdf(file_location)
+            # Queue the NetCDF file; the job removes it once ingestion completes
+            reingest = request.form.get("reingest", "false").lower() in ("1", "true", "yes")
+            job = ingest_jobs.submit(
+                file_location, filename, client_sid=request.form.get("sid"), reingest=reingest,
+                file_hash=upload_sha256(file),
+            )
+            file_location = None
             
             return jsonify({
-                "message": "NetCDF file processed successfully.",
-                "filename": filename
-            }), 200
+                "message": "NetCDF file queued for processing.",
+                "filename": filename,
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "status_url": f"/api/ingest-jobs/{job['job_id']}"
+            }), 202
         else:
-            return jsonify({"error": "Invalid file type. Only .nc or .netcdf files are allowed."}), 400
+            return jsonify({"error": "Invalid file type. Only .nc or .netcdf files (optionally .gz) are allowed."}), 400
         
+    except HTTPException as e:
+        # Oversized uploads (413) and corrupt gzip data (400)
+        if file_location and os.path.exists(file_location):
+            os.remove(file_location)
+        return jsonify({"error": e.description}), e.code
     except Exception as e:
         # Clean up on error
         if file_location and os.path.exists(file_location):
@@ -91,13 +121,36 @@ def upload_netcdf():
         app.logger.error(f"Error processing file: {str(e)}")
         app.logger.error(traceback.format_exc())
         return jsonify({"error": f"Error processing file: {str(e)}"}), 500
-    finally:
-        # Clean up temporary file
-        if file_location and os.path.exists(file_location):
-            try:
-                os.remove(file_location)
-            except Exception as e:
-                app.logger.error(f"Error cleaning up file: {str(e)}")
+
+@app.route("/api/ingest-jobs/<job_id>")
+def get_ingest_job(job_id):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Ingest job not found"}), 404
+    return jsonify(job)
+
+@app.route("/api/ingest-jobs/<job_id>/retry", methods=['POST'])
+def retry_ingest_job(job_id):
+    """Queue a failed ingest job again; it resumes from the last committed slice"""
+    try:
+        job = ingest_jobs.retry(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if job is None:
+        return jsonify({"error": "Ingest job not found"}), 404
+    return jsonify(job), 202
+
+@app.route("/api/ingest-jobs")
+def list_ingest_jobs():
+    limit = request.args.get("limit", default=50, type=int)
+    return jsonify({"jobs": ingest_jobs.list(limit=limit)})
+
+@app.route("/api/metrics")
+def get_ingest_metrics():
+    """Per-phase timings, counters and peak memory of the recent ingests in this process"""
+    metrics = metrics_summary()
+    metrics["jobs"] = ingest_jobs.status_counts()
+    return jsonify(metrics)
 
 @app.route('/api/argo-positions')
 def get_argo_positions():
@@ -157,6 +210,10 @@ def health_check():
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
 
 if __name__ == "__main__":
+    debug = True
+    # With the debug reloader the server runs in a child process; only that one resumes jobs
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        ingest_jobs.resume_pending_jobs()
     print("Starting Flask server on http://localhost:9000")
     print("Test the server by visiting: http://localhost:9000/health")
-    socket_manager.run_app(app, host="0.0.0.0", port=9000, debug=True)
\ No newline at end of file
+    socket_manager.run_app(app, host="0.0.0.0", port=9000, debug=debug)
\ No newline at end of file
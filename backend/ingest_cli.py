@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Command-line ingester for batches of ARGO NetCDF files.
+
+Runs process_netcdf over many files with a pool of worker processes:
+
+    python ingest_cli.py data/2025/ "incoming/*_prof.nc" --workers 4
+
+Every worker opens its own database engine and dataset handle. Float metadata
+for all files is registered up front from the parent process, so workers never
+race on the float_metadata.platform_number unique constraint. The same
+up-front pass hashes each file, so the ingest manifest does not read it again. Embeddings are
+computed in the workers and added to the local ChromaDB collection by a single
+ChromaWriter process, since the persistent ChromaDB store is not safe for
+concurrent writers. A worker's store call returns once the batch is in
+ChromaDB, and every slice's embeddings are stored before its checkpoint is
+committed, so a worker killed mid-file leaves no committed profile without its
+embedding, and a rerun resumes from the checkpoint.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from multiprocessing.managers import BaseManager
+
+import xarray as xr
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from config import DB_URL, SQL_ECHO
+
+# Per-process engine and ChromaWriter proxy, set by the pool initializer
+_worker_engine = None
+_worker_chroma = None
+
+# Times a file that lost a unique-constraint race with another worker is retried
+CONFLICT_RETRIES = 2
+
+
+class ChromaWriter:
+    """The local ChromaDB collection, served to the workers from one manager process.
+
+    Workers call add / upsert through a proxy; the call returns once the batch
+    is stored, so EmbeddingPipeline.flush() still guarantees a slice's
+    embeddings are in ChromaDB before its checkpoint is committed.
+    """
+
+    def __init__(self):
+        # The manager serves every worker connection on its own thread
+        self._lock = threading.Lock()
+
+    def _store(self, method, ids, embeddings, metadatas, documents):
+        from netcdf_processor import get_collection
+        with self._lock:
+            getattr(get_collection(), method)(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def add(self, ids, embeddings, metadatas, documents):
+        self._store("add", ids, embeddings, metadatas, documents)
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self._store("upsert", ids, embeddings, metadatas, documents)
+
+
+class ChromaManager(BaseManager):
+    pass
+
+
+ChromaManager.register("ChromaWriter", ChromaWriter)
+
+
+def expand_paths(patterns):
+    """Resolve directories, globs and plain paths to a sorted list of unique .nc files"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.nc"))
+        else:
+            matches = glob.glob(pattern)
+        files.extend(os.path.abspath(path) for path in matches if os.path.isfile(path))
+    return sorted(set(files))
+
+
+def _init_worker(chroma_writer):
+    global _worker_engine, _worker_chroma
+    _worker_engine = create_engine(DB_URL, echo=SQL_ECHO)
+    _worker_chroma = chroma_writer
+
+
+def _scan_file(file_path):
+    """Content hash and float metadata rows of one file"""
+    from netcdf_processor import extract_float_metadata, file_sha256
+    file_hash = file_sha256(file_path)
+    with xr.open_dataset(file_path) as ds:
+        return file_hash, extract_float_metadata(ds)
+
+
+def _ingest_file(file_path, mode, writer, embedding_batch_size, reingest=False, file_hash=None):
+    from netcdf_processor import process_netcdf
+    start = time.perf_counter()
+    try:
+        result = process_netcdf(
+            file_path,
+            mode=mode,
+            writer=writer,
+            embedding_batch_size=embedding_batch_size,
+            engine=_worker_engine,
+            chroma_collection=_worker_chroma,
+            reingest=reingest,
+            file_hash=file_hash,
+        )
+        return {
+            "file": file_path,
+            "status": "ok",
+            "seconds": time.perf_counter() - start,
+            "profiles_ingested": result["profiles_ingested"],
+            "profiles_total": result["profiles_total"],
+        }
+    except Exception as e:
+        return {
+            "file": file_path,
+            "status": "failed",
+            "seconds": time.perf_counter() - start,
+            "error": f"{type(e).__name__}: {e}",
+            "retryable": type(e).__name__ == "IntegrityError",
+            "traceback": traceback.format_exc(),
+        }
+
+
+def register_floats(executor, files, reingest=False):
+    """Read float metadata from every file, insert all new floats in one statement
+    and return {file_path: file_hash}.
+
+    With reingest, known floats are updated when a file's data mode ranks higher.
+    """
+    from config import engine
+    from netcdf_processor import data_mode_rank, register_float_metadata
+
+    float_rows = {}
+    file_hashes = {}
+    for file_path, (file_hash, rows) in zip(files, executor.map(_scan_file, files)):
+        file_hashes[file_path] = file_hash
+        for row in rows:
+            known = float_rows.get(row["platform_number"])
+            if known is None or (reingest and data_mode_rank(row["data_mode"]) > data_mode_rank(known["data_mode"])):
+                float_rows[row["platform_number"]] = row
+
+    session = sessionmaker(bind=engine)()
+    try:
+        register_float_metadata(session, list(float_rows.values()), reingest=reingest)
+        session.commit()
+    finally:
+        session.close()
+    print(f"Registered float metadata for {len(float_rows)} platforms")
+    return file_hashes
+
+
+def run(files, workers, mode=None, writer=None, embedding_batch_size=None, reingest=False):
+    """Ingest files across a process pool and return one result dict per file"""
+    results = {}
+    start = time.perf_counter()
+    # spawn: workers must not inherit the parent's database connections
+    context = multiprocessing.get_context("spawn")
+    with ChromaManager(ctx=context) as manager, ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(manager.ChromaWriter(),)
+    ) as executor:
+        file_hashes = register_floats(executor, files, reingest)
+
+        pending = list(files)
+        for attempt in range(1 + CONFLICT_RETRIES):
+            if attempt:
+                print(f"Retrying {len(pending)} file(s) that hit a unique constraint...")
+            futures = {
+                executor.submit(
+                    _ingest_file, file_path, mode, writer, embedding_batch_size, reingest, file_hashes[file_path]
+                ): file_path
+                for file_path in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # A killed worker breaks the pool; its committed slices resume on the next run
+                    result = {
+                        "file": futures[future],
+                        "status": "failed",
+                        "seconds": time.perf_counter() - start,
+                        "error": f"{type(e).__name__}: {e}",
+                        "retryable": False,
+                        "traceback": traceback.format_exc(),
+                    }
+                results[result["file"]] = result
+                if result["status"] == "ok":
+                    print(f"✅ {os.path.basename(result['file'])}: {result['profiles_ingested']}/{result['profiles_total']} profiles in {result['seconds']:.1f}s")
+                else:
+                    print(f"❌ {os.path.basename(result['file'])}: {result['error']}")
+
+            # Two files can carry the same profile; the loser of that race is retried,
+            # and the duplicate check then skips the profiles the winner stored
+            pending = [path for path, result in results.items() if result["status"] == "failed" and result["retryable"]]
+            if not pending:
+                break
+
+    elapsed = time.perf_counter() - start
+    print_report(files, results, elapsed)
+    return [results[file_path] for file_path in files]
+
+
+def print_report(files, results, elapsed):
+    ok = [results[f] for f in files if results[f]["status"] == "ok"]
+    failed = [results[f] for f in files if results[f]["status"] != "ok"]
+    total_profiles = sum(r["profiles_ingested"] for r in ok)
+    rate = total_profiles / elapsed if elapsed > 0 else 0.0
+
+    print("\n" + "=" * 60)
+    print(f"{'File':<40} {'Status':<8} {'Profiles':>10}")
+    print("-" * 60)
+    for file_path in files:
+        result = results[file_path]
+        profiles = result.get("profiles_ingested", "-")
+        print(f"{os.path.basename(file_path)[:40]:<40} {result['status']:<8} {profiles:>10}")
+    print("-" * 60)
+    print(f"📊 {len(ok)} succeeded, {len(failed)} failed")
+    print(f"📊 {total_profiles} profiles in {elapsed:.1f}s ({rate:,.1f} profiles/sec)")
+    for result in failed:
+        print(f"\n{result['file']}:\n{result['traceback']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest ARGO NetCDF files in parallel")
+    parser.add_argument("paths", nargs="+", help="NetCDF files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="worker processes")
+    parser.add_argument("--mode", choices=["vectorized", "legacy"], help="measurement extraction mode")
+    parser.add_argument("--writer", choices=["orm", "bulk"], help="row writer")
+    parser.add_argument("--embedding-batch-size", type=int, help="summaries per encoder call")
+    parser.add_argument("--reingest", action="store_true",
+                        help="replace existing profiles when the file's data mode ranks higher (R < A < D)")
+    args = parser.parse_args(argv)
+
+    files = expand_paths(args.paths)
+    if not files:
+        print("No .nc files found")
+        return 1
+
+    print(f"🚀 Ingesting {len(files)} file(s) with {args.workers} worker(s)")
+    results = run(files, args.workers, args.mode, args.writer, args.embedding_batch_size, args.reingest)
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Background ingestion of uploaded NetCDF files.
+
+Uploads are recorded as rows in ingest_jobs and processed by a bounded pool of
+worker threads, so the upload request returns as soon as the file is saved.
+Progress (profiles done / total, rows/sec) is stored on the job row and pushed
+to the uploading client with socket_manager.emit_to_client. The result of a
+finished job carries the ingest's per-phase metrics. Jobs that were still
+queued or running when the server stopped are queued again on startup. The
+uploaded file is removed once its job completes; a failed job keeps it, so
+retry() can resume the ingest from its manifest checkpoint.
+"""
+
+import os
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from config import INGEST_WORKERS
+from models import IngestJob, utc_now
+from netcdf_processor import process_netcdf
+from socket_manager import socket_manager
+
+
+def job_to_dict(job):
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "reingest": job.reingest,
+        "profiles_done": job.profiles_done,
+        "profiles_total": job.profiles_total,
+        "rows_per_sec": round(job.rows_per_sec, 1) if job.rows_per_sec is not None else None,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class IngestJobQueue:
+    """Persistent queue of NetCDF ingestion jobs drained by a thread pool"""
+
+    def __init__(self, session_factory, max_workers=INGEST_WORKERS):
+        self.session_factory = session_factory
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+
+    def submit(self, file_path, filename, client_sid=None, reingest=False, file_hash=None):
+        """Record a job for an uploaded file and queue it; returns the job as a dict.
+
+        file_hash is the file's SHA-256 if already known, so the ingest does not re-read it.
+        """
+        session = self.session_factory()
+        try:
+            job = IngestJob(
+                id=str(uuid.uuid4()),
+                filename=filename,
+                file_path=os.path.abspath(file_path),
+                file_hash=file_hash,
+                status="queued",
+                client_sid=client_sid,
+                reingest=reingest,
+                profiles_done=0,
+                created_at=utc_now(),
+            )
+            session.add(job)
+            session.commit()
+            job_dict = job_to_dict(job)
+        finally:
+            session.close()
+
+        self.executor.submit(self._run, job_dict["job_id"])
+        print(f"📥 Queued ingest job {job_dict['job_id']} for {filename}")
+        return job_dict
+
+    def get(self, job_id):
+        session = self.session_factory()
+        try:
+            job = session.get(IngestJob, job_id)
+            return job_to_dict(job) if job else None
+        finally:
+            session.close()
+
+    def list(self, limit=50):
+        session = self.session_factory()
+        try:
+            jobs = session.query(IngestJob).order_by(IngestJob.created_at.desc()).limit(limit).all()
+            return [job_to_dict(job) for job in jobs]
+        finally:
+            session.close()
+
+    def status_counts(self):
+        """Number of jobs per status"""
+        session = self.session_factory()
+        try:
+            rows = session.query(IngestJob.status, func.count(IngestJob.id)).group_by(IngestJob.status).all()
+            return {status: count for status, count in rows}
+        finally:
+            session.close()
+
+    def resume_pending_jobs(self):
+        """Queue again every job left queued or running by a previous server process"""
+        session = self.session_factory()
+        try:
+            jobs = session.query(IngestJob).filter(
+                IngestJob.status.in_(["queued", "running"])
+            ).order_by(IngestJob.created_at).all()
+
+            resumed = []
+            for job in jobs:
+                if os.path.exists(job.file_path):
+                    job.status = "queued"
+                    resumed.append(job.id)
+                else:
+                    job.status = "failed"
+                    job.error = "Uploaded file no longer exists"
+                    job.finished_at = utc_now()
+            session.commit()
+        finally:
+            session.close()
+
+        for job_id in resumed:
+            self.executor.submit(self._run, job_id)
+        if resumed:
+            print(f"🔁 Resumed {len(resumed)} ingest job(s)")
+        return resumed
+
+    def retry(self, job_id):
+        """Queue a failed job again; its ingest resumes at the manifest checkpoint.
+
+        Returns the job as a dict, or None when there is no such job.
+        Raises ValueError when the job has not failed or its file is gone.
+        """
+        session = self.session_factory()
+        try:
+            job = session.get(IngestJob, job_id)
+            if job is None:
+                return None
+            if job.status != "failed":
+                raise ValueError(f"Only failed jobs can be retried (job is {job.status})")
+            if not os.path.exists(job.file_path):
+                raise ValueError("Uploaded file no longer exists")
+            job.status = "queued"
+            job.error = None
+            job.finished_at = None
+            session.commit()
+            job_dict = job_to_dict(job)
+        finally:
+            session.close()
+
+        self.executor.submit(self._run, job_id)
+        print(f"🔁 Retrying ingest job {job_id}")
+        return job_dict
+
+    def _update(self, job_id, **fields):
+        session = self.session_factory()
+        try:
+            job = session.get(IngestJob, job_id)
+            for name, value in fields.items():
+                setattr(job, name, value)
+            session.commit()
+            return job_to_dict(job)
+        finally:
+            session.close()
+
+    def _emit(self, client_sid, event, data):
+        if client_sid:
+            socket_manager.emit_to_client(client_sid, event, data)
+
+    def _run(self, job_id):
+        session = self.session_factory()
+        try:
+            job = session.get(IngestJob, job_id)
+            if job is None or job.status != "queued":
+                return
+            file_path, file_hash, client_sid, reingest = job.file_path, job.file_hash, job.client_sid, job.reingest
+        finally:
+            session.close()
+
+        job_dict = self._update(job_id, status="running", started_at=utc_now())
+        self._emit(client_sid, "ingest_progress", job_dict)
+
+        def on_progress(profiles_done, profiles_total, rows_per_sec):
+            progress = self._update(
+                job_id,
+                profiles_done=profiles_done,
+                profiles_total=profiles_total,
+                rows_per_sec=rows_per_sec,
+            )
+            self._emit(client_sid, "ingest_progress", progress)
+
+        try:
+            result = process_netcdf(file_path, progress_callback=on_progress, reingest=reingest, file_hash=file_hash)
+            job_dict = self._update(
+                job_id,
+                status="completed",
+                result=result,
+                profiles_total=result["profiles_total"],
+                finished_at=utc_now(),
+            )
+            print(f"✅ Ingest job {job_id} completed")
+            self._emit(client_sid, "ingest_complete", job_dict)
+            # A failed job keeps its file, so a retry can resume from the manifest checkpoint
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    print(f"⚠️ Warning: Could not remove {file_path}: {e}")
+        except Exception as e:
+            print(f"❌ Ingest job {job_id} failed: {e}")
+            traceback.print_exc()
+            job_dict = self._update(
+                job_id,
+                status="failed",
+                error=f"{type(e).__name__}: {e}",
+                finished_at=utc_now(),
+            )
+            self._emit(client_sid, "ingest_error", job_dict)
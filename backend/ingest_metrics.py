@@ -0,0 +1,192 @@
+"""
+Per-phase timing, counters and memory sampling for NetCDF ingestion.
+
+process_netcdf records where an ingest spends its time in an IngestMetrics:
+named phases (decode, metadata, measurements, calibrations, history, embed,
+chroma, commit, ...) are timed with `with metrics.phase(name):`, row and
+profile totals are kept as counters, and a background thread samples the
+resident set size so the report carries the peak memory of the ingest (of the
+whole process, so concurrent ingests in one process share their peaks).
+
+Nested phases are exclusive: time spent in an inner phase is not also charged
+to the outer one, so the phases of the ingesting thread add up to wall time.
+embed and chroma run on the embedding thread and overlap with the others;
+embed_wait is the time the ingesting thread spent blocked on that thread.
+
+Finished reports are kept in memory (RECENT_INGESTS) for the /api/metrics endpoint.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# How often the memory sampler reads the resident set size
+MEMORY_SAMPLE_SECONDS = 0.1
+
+# Reports of the most recent ingests in this process, newest last
+RECENT_INGESTS = deque(maxlen=50)
+_recent_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (peak RSS where the current one is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it is not available"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class MemorySampler:
+    """Track the peak resident set size on a background thread while running"""
+
+    def __init__(self, interval=MEMORY_SAMPLE_SECONDS):
+        self.interval = interval
+        self.start_mb = None
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+        return rss
+
+    def start(self):
+        self.start_mb = self.sample()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+class IngestMetrics:
+    """Named phase timers and counters for one ingest"""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.phases = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.memory = MemorySampler()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = None
+        self._seconds = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.memory.start()
+        return self
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.phases[name] += seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    @contextmanager
+    def phase(self, name):
+        """Time the block as phase name, pausing the enclosing phase of this thread"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        now = time.perf_counter()
+        if stack:
+            outer_name, outer_start = stack[-1]
+            self.add_time(outer_name, now - outer_start)
+        stack.append((name, now))
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, start = stack.pop()
+            self.add_time(name, now - start)
+            if stack:
+                stack[-1] = (stack[-1][0], now)
+
+    def stop(self):
+        if self._started is not None and self._seconds is None:
+            self._seconds = time.perf_counter() - self._started
+            self.memory.stop()
+
+    def report(self):
+        """Stop the timers and return the phase seconds, counters and memory as a dict"""
+        self.stop()
+        with self._lock:
+            phases = {name: round(seconds, 3) for name, seconds in self.phases.items()}
+            counters = dict(self.counters)
+        memory = self.memory
+        return {
+            "file": self.label,
+            "seconds": round(self._seconds, 3) if self._seconds is not None else None,
+            "phases": phases,
+            "counters": counters,
+            "start_rss_mb": round(memory.start_mb, 1) if memory.start_mb is not None else None,
+            "peak_rss_mb": round(memory.peak_mb, 1) if memory.peak_mb is not None else None,
+        }
+
+    def print_report(self, report=None):
+        report = report or self.report()
+        phases = ", ".join(
+            f"{name} {seconds:.2f}s" for name, seconds in sorted(report["phases"].items(), key=lambda item: -item[1])
+        )
+        print(f"⏱️ Ingest phases ({report['seconds']:.2f}s total): {phases}")
+        if report["peak_rss_mb"] is not None:
+            print(f"💾 Peak memory {report['peak_rss_mb']:.0f} MB (started at {report['start_rss_mb']:.0f} MB)")
+
+
+def record_ingest(report):
+    """Keep a finished ingest report for /api/metrics"""
+    with _recent_lock:
+        RECENT_INGESTS.append(report)
+
+
+def metrics_summary():
+    """Recent ingest reports plus phase and counter totals across them"""
+    with _recent_lock:
+        recent = list(RECENT_INGESTS)
+    phase_totals = defaultdict(float)
+    counter_totals = defaultdict(int)
+    for report in recent:
+        for name, seconds in report.get("phases", {}).items():
+            phase_totals[name] += seconds
+        for name, value in report.get("counters", {}).items():
+            counter_totals[name] += value
+    peaks = [report["peak_rss_mb"] for report in recent if report.get("peak_rss_mb") is not None]
+    rss = current_rss_mb()
+    return {
+        "ingests": len(recent),
+        "phase_totals": {name: round(seconds, 3) for name, seconds in phase_totals.items()},
+        "counter_totals": dict(counter_totals),
+        "peak_rss_mb": max(peaks) if peaks else None,
+        "current_rss_mb": round(rss, 1) if rss is not None else None,
+        "recent": recent,
+    }
@@ -4,10 +4,35 @@ Simple database initialization script that creates tables without PostGIS depend
 """
 
 import os
+import sys
 from config import engine
 from models import Base
 from sqlalchemy import text  # Add this import
 
+# Idempotent SQL files, applied in name order after the tables are created
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+def apply_migrations(engine=engine):
+    """Apply every SQL file in migrations/ (Postgres only)"""
+    if engine.dialect.name != "postgresql":
+        print(f"Skipping migrations on {engine.dialect.name}")
+        return
+    for name in sorted(os.listdir(MIGRATIONS_DIRECTORY)):
+        if not name.endswith(".sql"):
+            continue
+        with open(os.path.join(MIGRATIONS_DIRECTORY, name)) as f:
+            sql = f.read()
+        # Straight through the DBAPI cursor, so the files' % signs are not taken for parameters
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql)
+            cursor.close()
+            connection.commit()
+        finally:
+            connection.close()
+        print(f"  - applied {name}")
+
 def create_tables():
     """Create all database tables"""
     print("Creating database tables...")
@@ -20,6 +45,9 @@ def create_tables():
         
         print("Creating new tables...")
         Base.metadata.create_all(bind=engine)
+
+        print("Applying migrations...")
+        apply_migrations()
         
         print("✅ Database tables created successfully!")
         
@@ -50,7 +78,13 @@ if __name__ == "__main__":
     
     # Test connection first
     if test_connection():
-        create_tables()
+        if "--migrate" in sys.argv[1:]:
+            # Bring an existing database up to date without dropping anything:
+            # create_all only adds the tables that are missing
+            Base.metadata.create_all(bind=engine)
+            apply_migrations()
+        else:
+            create_tables()
         print("\n🎉 Database setup complete!")
     else:
         print("\n💥 Database setup failed!")
\ No newline at end of file
@@ -11,8 +11,22 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 import os
+import sys
 load_dotenv()
 
+# analytics_mirror, climatology and ocean_regions live in the backend directory, one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import analytics_mirror
+except ImportError:
+    analytics_mirror = None
+import best_values
+import climatology
+import ocean_regions
+
+# Parquet mirror that heavy aggregates over measurements are routed to ("" = always Postgres)
+ANALYTICS_MIRROR_DIRECTORY = os.getenv("ANALYTICS_MIRROR_DIRECTORY", "")
+
 SUPABASE_DB_USER = os.getenv("user")
 SUPABASE_DB_PASSWORD = os.getenv("password")
 SUPABASE_DB_HOST = os.getenv("host")
@@ -74,19 +88,49 @@ mcp = FastMCP("Supabase Database Server")
 
 
 
+# Columns generated SQL should use by default, noted under their table by get_database_schema
+DEFAULT_COLUMNS = {
+    "measurements": (
+        "pres_best, temp_best, psal_best (QC-resolved: adjusted values for data mode A/D profiles, "
+        "NULL unless the QC flags are good, indexed for range filters) and good_mask "
+        f"(bits {best_values.GOOD_PRES} = pres, {best_values.GOOD_TEMP} = temp, {best_values.GOOD_PSAL} = psal good). "
+        "Use them instead of CASE expressions over the raw, adjusted and _qc columns"
+    ),
+}
+
 # functions help to fetch tables, columns, primary keys, relationships, and small samples.
 def _fetch_tables(cursor):
+    # Partitions (measurements_y2020, ...) are left out; queries go through their parent table
     cursor.execute(
         """
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-          AND table_type = 'BASE TABLE'
-        ORDER BY table_name
+        SELECT t.table_name
+        FROM information_schema.tables t
+        JOIN pg_catalog.pg_class c ON c.relname = t.table_name
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace AND n.nspname = t.table_schema
+        WHERE t.table_schema = 'public'
+          AND t.table_type = 'BASE TABLE'
+          AND NOT c.relispartition
+        ORDER BY t.table_name
         """
     )
     return [row[0] for row in cursor.fetchall()]
 
+def _fetch_partition_keys_for_tables(cursor, tables):
+    if not tables:
+        return {}
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_partkeydef(c.oid)
+        FROM pg_catalog.pg_partitioned_table pt
+        JOIN pg_catalog.pg_class c ON c.oid = pt.partrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relname = ANY(%s)
+        """,
+        (tables,)
+    )
+    return dict(cursor.fetchall())
+
 def _fetch_columns_for_tables(cursor, tables):
     if not tables:
         return {}
@@ -180,6 +224,8 @@ def _fetch_foreign_keys_for_tables(cursor, tables):
 async def get_database_schema() -> str:
     """
     Get complete database schema: tables, columns, primary keys, relationships, and small samples.
+    Columns to use by default (such as the QC-resolved *_best measurement
+    values) are noted under their table.
     
     Input: No input required - just call the function
     
@@ -196,6 +242,7 @@ async def get_database_schema() -> str:
             cols_map = _fetch_columns_for_tables(cursor, tables)
             pk_map = _fetch_primary_keys_for_tables(cursor, tables)
             fks_map = _fetch_foreign_keys_for_tables(cursor, tables)
+            partition_map = _fetch_partition_keys_for_tables(cursor, tables)
 
             schema_info = "Database Schema (public):\n\n"
             schema_info += "Tables: " + ", ".join(tables) + "\n\n"
@@ -209,7 +256,14 @@ async def get_database_schema() -> str:
                 schema_info += ",\n".join(columns)
                 if pks:
                     schema_info += f",\n  PRIMARY KEY ({', '.join(pks)})"
-                schema_info += "\n);\n\n"
+                schema_info += "\n)"
+                if table in partition_map:
+                    schema_info += f" PARTITION BY {partition_map[table]}"
+                schema_info += ";\n\n"
+                if table in partition_map:
+                    schema_info += f"-- Filter {table} on its partition key so only the matching partitions are read\n\n"
+                if table in DEFAULT_COLUMNS:
+                    schema_info += f"-- Default columns of {table}: {DEFAULT_COLUMNS[table]}\n\n"
                 
                 # Relationships for this table
                 fks = fks_map.get(table, [])
@@ -251,11 +305,61 @@ async def get_database_schema() -> str:
         return f"Error getting table relationships: {str(e)}"
 
 
+def _format_rows(sql_query, headers, rows):
+    """Plain-text table of a result set, one tab-separated line per row"""
+    lines = []
+    lines.append(f"SQL Query: {sql_query}")
+    lines.append("")
+    lines.append("\t".join(str(h) for h in headers))
+    for row in rows:
+        record = []
+        for val in row:
+            if hasattr(val, "isoformat"):
+                val = val.isoformat()
+            record.append(str(val))
+        lines.append("\t".join(record))
+    return "\n".join(lines)
+
+def _postgres_headers(raw):
+    """Column names Postgres gives the query; LIMIT 0 plans it without running the aggregate"""
+    cursor = postgres_conn.cursor()
+    try:
+        cursor.execute(f"SELECT * FROM ({raw.rstrip().rstrip(';')}) AS mirrored_query LIMIT 0")
+        headers = [desc[0] for desc in cursor.description]
+        postgres_conn.commit()
+        return headers
+    except Exception:
+        postgres_conn.rollback()
+        return None
+    finally:
+        cursor.close()
+
+def _query_mirror(raw):
+    """(headers, rows) from the analytics mirror, or None when the query should run on Postgres"""
+    if analytics_mirror is None or not analytics_mirror.has_mirror(ANALYTICS_MIRROR_DIRECTORY):
+        return None
+    if not analytics_mirror.should_route(raw):
+        return None
+    # Invalid SQL goes to Postgres for its error message
+    headers = _postgres_headers(raw)
+    if headers is None:
+        return None
+    try:
+        _, rows = analytics_mirror.run_query(raw, ANALYTICS_MIRROR_DIRECTORY)
+    except Exception:
+        # Postgres-only syntax, or duckdb is not installed
+        return None
+    if rows and len(rows[0]) != len(headers):
+        return None
+    return headers, rows
+
 @mcp.tool
 async def execute_sql(sql_query: str) -> str:
     """
     Execute a SQL query against the database. Returns the result.
     Only SELECT queries are allowed; any DDL/DML will be rejected.
+    Aggregates over measurements are answered from the columnar analytics
+    mirror when one is configured; everything else runs on Postgres.
     """
     try:
         if postgres_conn is None:
@@ -275,6 +379,11 @@ async def execute_sql(sql_query: str) -> str:
         if not (upper.startswith("SELECT") or upper.startswith("WITH")):
             return "Error: Only SELECT queries (including WITH ... SELECT) are allowed."
 
+        mirrored = _query_mirror(raw)
+        if mirrored is not None:
+            headers, rows = mirrored
+            return _format_rows(sql_query, headers, rows)
+
         cursor = postgres_conn.cursor(cursor_factory=RealDictCursor)
         try:
             cursor.execute(raw)
@@ -283,20 +392,8 @@ async def execute_sql(sql_query: str) -> str:
                 rows = cursor.fetchall()
                 # Build plain-text table output
                 headers = [desc.name if hasattr(desc, 'name') else desc[0] for desc in cursor.description]
-                lines = []
-                lines.append(f"SQL Query: {sql_query}")
-                lines.append("")
-                lines.append("\t".join(str(h) for h in headers))
-                for row in rows:
-                    record = []
-                    for h in headers:
-                        val = dict(row).get(h)
-                        if hasattr(val, "isoformat"):
-                            val = val.isoformat()
-                        record.append(str(val))
-                    lines.append("\t".join(record))
                 postgres_conn.commit()
-                return "\n".join(lines)
+                return _format_rows(sql_query, headers, [[dict(row).get(h) for h in headers] for row in rows])
             else:
                 postgres_conn.commit()
                 return f"SQL Query: {sql_query}\n\nQuery executed successfully (no rows returned)"
@@ -310,11 +407,270 @@ async def execute_sql(sql_query: str) -> str:
 
 
 
+@mcp.tool
+async def get_profile_summaries(
+    platform_number: str = "",
+    cycle_number: int | None = None,
+    start_date: str = "",
+    end_date: str = "",
+    lat_min: float | None = None,
+    lat_max: float | None = None,
+    lon_min: float | None = None,
+    lon_max: float | None = None,
+    limit: int = 100,
+) -> str:
+    """
+    Per-profile statistics precomputed during ingest (table profile_summary),
+    with each profile's date and position. Use this instead of aggregating
+    measurements by cycle: it has level counts, means, min/max and surface and
+    bottom values of temp, psal and their adjusted variants, and the pressure range,
+    plus derived variables: sigma_theta_surface (potential density anomaly,
+    kg/m^3), mixed_layer_depth and thermocline_depth (dbar) and
+    heat_content_0_700 (J/m^2, 0-700 dbar). Derived values are NULL where a
+    profile's good data does not cover them.
+
+    All filters are optional: platform_number, cycle_number, start_date and
+    end_date (YYYY-MM-DD, end exclusive), and a lat/lon box. Returns at most
+    limit profiles, newest first.
+    """
+    try:
+        if postgres_conn is None:
+            return "Database not connected. Please connect first."
+
+        conditions = []
+        params = []
+        for clause, value in [
+            ("p.platform_number = %s", platform_number or None),
+            ("p.cycle_number = %s", cycle_number),
+            ("p.juld >= %s", start_date or None),
+            ("p.juld < %s", end_date or None),
+            ("p.latitude >= %s", lat_min),
+            ("p.latitude <= %s", lat_max),
+            ("p.longitude >= %s", lon_min),
+            ("p.longitude <= %s", lon_max),
+        ]:
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(max(1, min(int(limit), 1000)))
+
+        cursor = postgres_conn.cursor()
+        try:
+            query = cursor.mogrify(
+                f"""
+                SELECT p.juld, p.latitude, p.longitude, p.data_mode, s.*
+                FROM profile_summary s
+                JOIN profile_metadata p
+                  ON p.platform_number = s.platform_number AND p.cycle_number = s.cycle_number
+                {where}
+                ORDER BY p.juld DESC NULLS LAST
+                LIMIT %s
+                """,
+                params,
+            ).decode()
+            cursor.execute(query)
+            headers = [desc[0] for desc in cursor.description]
+            rows = [[value for header, value in zip(headers, row) if header != "id"] for row in cursor.fetchall()]
+            postgres_conn.commit()
+            return _format_rows(query.strip(), [header for header in headers if header != "id"], rows)
+        except Exception as e:
+            postgres_conn.rollback()
+            return f"Error getting profile summaries: {str(e)}"
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"Error getting profile summaries: {str(e)}"
+
+def _region_condition(region):
+    """Indexed profile_metadata condition of a basin or named sea, clipped to the sea's box"""
+    cells = ocean_regions.region_cells(region)
+    condition = cells["sql"]
+    box = cells.get("box")
+    if box:
+        if box["lon_min"] <= box["lon_max"]:
+            longitude = f"p.longitude BETWEEN {box['lon_min']} AND {box['lon_max']}"
+        else:
+            longitude = f"(p.longitude >= {box['lon_min']} OR p.longitude <= {box['lon_max']})"
+        condition += f" AND p.latitude BETWEEN {box['lat_min']} AND {box['lat_max']} AND {longitude}"
+    return condition
+
+@mcp.tool
+async def get_standard_level_values(
+    pressure: float,
+    variable: str = "temp",
+    region: str = "",
+    start_date: str = "",
+    end_date: str = "",
+    limit: int = 500,
+) -> str:
+    """
+    Values of every profile at one standard pressure level (dbar), interpolated
+    at ingest (table profile_standard_levels, one row per profile and level in
+    the view profile_standard_levels_unpacked). Use this to compare profiles at
+    the same depth instead of matching raw pres values, e.g. for maps of
+    temperature at 500 dbar.
+
+    Inputs: pressure (must be one of the standard levels), variable "temp",
+    "temp_adjusted", "psal" or "psal_adjusted", optional region (as for
+    get_region_cells), start_date and end_date (YYYY-MM-DD, end exclusive).
+    Returns at most limit profiles with date, position and value, newest first.
+    """
+    try:
+        if postgres_conn is None:
+            return "Database not connected. Please connect first."
+        if variable not in ("temp", "temp_adjusted", "psal", "psal_adjusted"):
+            return "Error getting standard level values: variable must be temp, temp_adjusted, psal or psal_adjusted"
+
+        conditions = ["s.pres = %s", f"s.{variable} IS NOT NULL"]
+        params = [pressure]
+        if region:
+            conditions.append(_region_condition(region))
+        if start_date:
+            conditions.append("p.juld >= %s")
+            params.append(start_date)
+        if end_date:
+            conditions.append("p.juld < %s")
+            params.append(end_date)
+        params.append(max(1, min(int(limit), 5000)))
+
+        cursor = postgres_conn.cursor()
+        try:
+            query = cursor.mogrify(
+                f"""
+                SELECT p.platform_number, p.cycle_number, p.juld, p.latitude, p.longitude, p.data_mode,
+                       s.pres, s.{variable}
+                FROM profile_standard_levels_unpacked s
+                JOIN profile_metadata p
+                  ON p.platform_number = s.platform_number AND p.cycle_number = s.cycle_number
+                WHERE {' AND '.join(conditions)}
+                ORDER BY p.juld DESC NULLS LAST
+                LIMIT %s
+                """,
+                params,
+            ).decode()
+            cursor.execute(query)
+            headers = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.execute("SELECT pres FROM profile_standard_levels LIMIT 1")
+                levels = cursor.fetchone()
+                postgres_conn.commit()
+                if levels and pressure not in levels[0]:
+                    return f"No values at {pressure} dbar; the standard levels are {levels[0]}"
+            postgres_conn.commit()
+            return _format_rows(query.strip(), headers, rows)
+        except Exception as e:
+            postgres_conn.rollback()
+            return f"Error getting standard level values: {str(e)}"
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"Error getting standard level values: {str(e)}"
+
+@mcp.tool
+async def get_region_timeseries(
+    region: str,
+    variable: str = "temp",
+    pres_min: float = 0,
+    pres_max: float = 10,
+    start_date: str = "",
+    end_date: str = "",
+    by_calendar_month: bool = False,
+) -> str:
+    """
+    Monthly mean, standard deviation and count of temp or psal in an ocean basin
+    or named sea, read from the precomputed climatology cube (table
+    climatology_cube) instead of aggregating measurements. Answers "trend of
+    temperature in the Arabian Sea by month" in milliseconds.
+
+    Inputs: region (as for get_region_cells), variable "temp" or "psal", a
+    pressure range in dbar (whole standard depth bins from the one containing
+    pres_min up to pres_max are used), optional start_date/end_date
+    (YYYY-MM-DD, end exclusive), and by_calendar_month=True to average each calendar
+    month over all years instead of returning one row per month.
+
+    Only good data (QC 1, 2, 5, 8; adjusted values for A/D mode profiles) is
+    counted. For named seas the cube covers the region's grid cells, which
+    reach slightly beyond its box.
+    """
+    try:
+        if postgres_conn is None:
+            return "Database not connected. Please connect first."
+        if variable not in ("temp", "psal"):
+            return "Error getting region time series: variable must be 'temp' or 'psal'"
+        cells = ocean_regions.region_cells(region, precision=climatology.CLIMATOLOGY_PRECISION)
+
+        bins = [edge for edge in climatology.DEPTH_BINS if edge <= pres_min]
+        conditions = [cells["sql"], "depth_bin >= %s", "depth_bin < %s"]
+        params = [bins[-1] if bins else 0, pres_max]
+        if start_date:
+            conditions.append("month >= %s")
+            params.append(start_date)
+        if end_date:
+            conditions.append("month < %s")
+            params.append(end_date)
+        period = "extract(month FROM month)::integer AS calendar_month" if by_calendar_month else "month"
+        reference = climatology.CUBE_REFERENCES[variable]
+
+        cursor = postgres_conn.cursor()
+        try:
+            query = cursor.mogrify(
+                f"""
+                SELECT {period},
+                       sum({variable}_count) AS n,
+                       {reference} + sum({variable}_anomaly_sum) / nullif(sum({variable}_count), 0) AS mean_{variable},
+                       sqrt(greatest(
+                           (sum({variable}_anomaly_sumsq) - sum({variable}_anomaly_sum) ^ 2 / nullif(sum({variable}_count), 0))
+                           / nullif(sum({variable}_count) - 1, 0), 0)) AS std_{variable},
+                       min(depth_bin) AS depth_bin_min,
+                       max(depth_bin) AS depth_bin_max
+                FROM climatology_cube
+                WHERE {' AND '.join(conditions)}
+                GROUP BY 1
+                HAVING sum({variable}_count) > 0
+                ORDER BY 1
+                """,
+                params,
+            ).decode()
+            cursor.execute(query)
+            headers = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+            postgres_conn.commit()
+            return _format_rows(query.strip(), headers, rows)
+        except Exception as e:
+            postgres_conn.rollback()
+            return f"Error getting region time series: {str(e)}"
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"Error getting region time series: {str(e)}"
+
+@mcp.tool
+async def get_region_cells(region: str) -> str:
+    """
+    Resolve an ocean basin or a named sea to an indexed SQL condition on profile_metadata.
+
+    Input: region name, e.g. "Pacific Ocean", "Indian Ocean", "Southern Ocean",
+    "Arabian Sea", "Bay of Bengal", "Mediterranean Sea", "North Pacific".
+
+    Basins are tagged on every profile (profile_metadata.ocean_basin). Seas resolve
+    to a set of geohash grid cells (prefixes of profile_metadata.geohash); add the
+    returned box as well to drop the profiles just outside it. Returns JSON with
+    the cells, the precision, the box for seas and a ready-to-use "sql" condition.
+    Regions crossing the antimeridian (e.g. the Pacific) are handled correctly.
+    """
+    try:
+        return json.dumps(ocean_regions.region_cells(region))
+    except ValueError as e:
+        return f"Error resolving region: {str(e)}"
+
 @mcp.tool
 async def get_ocean_region_boundaries() -> str:
     """
     Returns approximate latitude/longitude boundaries for major ocean regions.
-    Useful for constraining queries to specific ocean basins.
+    The Pacific box crosses the antimeridian (lon_min > lon_max). For queries,
+    prefer get_region_cells, whose conditions use indexed columns.
     """
     ocean_boundaries = {
         "Indian Ocean": {"lat_min": -30, "lat_max": 30, "lon_min": 20, "lon_max": 120},
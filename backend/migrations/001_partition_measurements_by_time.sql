@@ -0,0 +1,80 @@
+-- Indexes for "variable at depth X in region Y during month Z" queries, and
+-- measurements partitioned by year of the profile time (measurements.juld).
+--
+-- profile_metadata is left unpartitioned on purpose: its (platform_number,
+-- cycle_number) key is referenced by every child table, and a unique key on a
+-- partitioned table has to include the partition column.
+--
+-- The primary key of measurements becomes (id, juld) for the same reason; id
+-- alone stays unique (one sequence). juld is part of the key, so measurements
+-- of profiles without a date get the ARGO reference date 1950-01-01 (JULD 0,
+-- models.UNDATED_JULD) instead of NULL; they land in measurements_default.
+--
+-- Idempotent: applied by init_db.py after create_all, and to an existing
+-- database with `python init_db.py --migrate`.
+
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS juld timestamp without time zone;
+
+CREATE INDEX IF NOT EXISTS ix_profile_metadata_latitude_longitude ON profile_metadata (latitude, longitude);
+DROP INDEX IF EXISTS ix_profile_metadata_latitude;
+
+DO $$
+DECLARE
+    partition_year integer;
+    column_list text;
+    select_list text;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'measurements'::regclass) THEN
+        RETURN;
+    END IF;
+
+    -- The id sequence must survive dropping the old table
+    ALTER SEQUENCE measurements_id_seq OWNED BY NONE;
+
+    CREATE TABLE measurements_partitioned (LIKE measurements INCLUDING DEFAULTS) PARTITION BY RANGE (juld);
+    FOR partition_year IN 1997..extract(year FROM now())::integer + 1 LOOP
+        EXECUTE format(
+            'CREATE TABLE measurements_y%s PARTITION OF measurements_partitioned FOR VALUES FROM (%L) TO (%L)',
+            partition_year, make_date(partition_year, 1, 1), make_date(partition_year + 1, 1, 1)
+        );
+    END LOOP;
+    -- Profiles without a date, and years not covered above
+    CREATE TABLE measurements_default PARTITION OF measurements_partitioned DEFAULT;
+
+    -- Copy the rows, taking juld from the profile where it is not filled in yet
+    SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position),
+           string_agg(CASE WHEN column_name = 'juld' THEN 'coalesce(m.juld, p.juld, ''1950-01-01'')'
+                           ELSE 'm.' || quote_ident(column_name) END, ', ' ORDER BY ordinal_position)
+      INTO column_list, select_list
+      FROM information_schema.columns
+     WHERE table_schema = current_schema() AND table_name = 'measurements';
+    EXECUTE format(
+        'INSERT INTO measurements_partitioned (%s) SELECT %s FROM measurements m '
+        'LEFT JOIN profile_metadata p ON p.platform_number = m.platform_number AND p.cycle_number = m.cycle_number',
+        column_list, select_list
+    );
+
+    DROP TABLE measurements;
+    ALTER TABLE measurements_partitioned RENAME TO measurements;
+    ALTER SEQUENCE measurements_id_seq OWNED BY measurements.id;
+    ALTER TABLE measurements ADD CONSTRAINT measurements_platform_number_cycle_number_fkey
+        FOREIGN KEY (platform_number, cycle_number) REFERENCES profile_metadata (platform_number, cycle_number);
+END $$;
+
+-- Databases partitioned before measurements had a primary key
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'measurements'::regclass AND contype = 'p') THEN
+        UPDATE measurements SET juld = '1950-01-01' WHERE juld IS NULL;
+        ALTER TABLE measurements ADD PRIMARY KEY (id, juld);
+    END IF;
+END $$;
+
+-- Created on the parent, so every partition gets them
+CREATE INDEX IF NOT EXISTS ix_measurements_platform_cycle_pres ON measurements (platform_number, cycle_number, pres);
+CREATE INDEX IF NOT EXISTS ix_measurements_pres ON measurements (pres);
+CREATE INDEX IF NOT EXISTS ix_measurements_juld_brin ON measurements USING brin (juld);
+DROP INDEX IF EXISTS ix_measurements_platform_number;
+DROP INDEX IF EXISTS ix_measurements_cycle_number;
+
+ANALYZE measurements;
@@ -0,0 +1,12 @@
+-- Grid cell (geohash) and ocean basin of every profile, indexed for regional queries.
+--
+-- Idempotent. Profiles ingested before these columns existed are tagged
+-- afterwards with `python ocean_regions.py --backfill`.
+
+ALTER TABLE profile_metadata ADD COLUMN IF NOT EXISTS geohash varchar(12);
+ALTER TABLE profile_metadata ADD COLUMN IF NOT EXISTS ocean_basin varchar(16);
+
+CREATE INDEX IF NOT EXISTS ix_profile_metadata_ocean_basin ON profile_metadata (ocean_basin);
+CREATE INDEX IF NOT EXISTS ix_profile_metadata_geohash_2 ON profile_metadata (substr(geohash, 1, 2));
+CREATE INDEX IF NOT EXISTS ix_profile_metadata_geohash_3 ON profile_metadata (substr(geohash, 1, 3));
+CREATE INDEX IF NOT EXISTS ix_profile_metadata_geohash_4 ON profile_metadata (substr(geohash, 1, 4));
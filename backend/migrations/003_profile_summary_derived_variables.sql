@@ -0,0 +1,9 @@
+-- Derived oceanographic variables of every profile (see derived_variables.py).
+--
+-- Idempotent. Profiles ingested before these columns existed are filled in
+-- afterwards with `python derived_variables.py --backfill`.
+
+ALTER TABLE profile_summary ADD COLUMN IF NOT EXISTS sigma_theta_surface double precision;
+ALTER TABLE profile_summary ADD COLUMN IF NOT EXISTS mixed_layer_depth double precision;
+ALTER TABLE profile_summary ADD COLUMN IF NOT EXISTS thermocline_depth double precision;
+ALTER TABLE profile_summary ADD COLUMN IF NOT EXISTS heat_content_0_700 double precision;
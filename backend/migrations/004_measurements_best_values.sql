@@ -0,0 +1,15 @@
+-- QC-resolved best values of every measurement, indexed for range filters
+-- (see best_values.py).
+--
+-- Idempotent. Created on the parent, so every partition gets them. Rows
+-- ingested before these columns existed are filled in afterwards with
+-- `python best_values.py --backfill`.
+
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS pres_best double precision;
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS temp_best double precision;
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS psal_best double precision;
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS good_mask smallint;
+
+CREATE INDEX IF NOT EXISTS ix_measurements_pres_best ON measurements (pres_best);
+CREATE INDEX IF NOT EXISTS ix_measurements_temp_best ON measurements (temp_best);
+CREATE INDEX IF NOT EXISTS ix_measurements_psal_best ON measurements (psal_best);
@@ -0,0 +1,7 @@
+-- SHA-256 of an uploaded file, computed while the upload streamed in and
+-- handed to the ingest manifest (see upload_stream.py).
+--
+-- Idempotent. Jobs queued before this column existed have no hash; their
+-- ingest hashes the file itself.
+
+ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS file_hash varchar(64);
@@ -0,0 +1,20 @@
+-- Data mode (R, A or D) of every profile, which decides reingest replacement and
+-- whether the adjusted values are used (see best_values.py, climatology.py).
+--
+-- Idempotent. Profiles ingested before this column existed take the data mode of
+-- their float (float_metadata.data_mode, read from the float's first profile in
+-- its file). That is right for most floats, but a float whose early cycles are
+-- delayed-mode and later ones real-time gets one mode for all of them; reingest
+-- its files (`python ingest_cli.py ... --reingest`) for exact per-profile modes.
+-- Run the backfills afterwards, so they use the filled-in modes:
+-- `python best_values.py --backfill`, `python derived_variables.py --backfill`
+-- and `python climatology.py --rebuild`.
+
+ALTER TABLE profile_metadata ADD COLUMN IF NOT EXISTS data_mode varchar(1);
+
+UPDATE profile_metadata p
+   SET data_mode = f.data_mode
+  FROM float_metadata f
+ WHERE p.data_mode IS NULL
+   AND f.platform_number = p.platform_number
+   AND f.data_mode IS NOT NULL;
@@ -0,0 +1,30 @@
+-- Climatology cube sums of anomalies from fixed references (climatology.CUBE_REFERENCES:
+-- 10 deg C for temp, 35 PSU for psal), so the variance no longer subtracts two
+-- large, nearly equal numbers.
+--
+-- Idempotent. Cubes summed from plain values are converted in place, using
+-- sum((x - K)^2) = sum(x^2) - 2 K sum(x) + n K^2. The converted sums keep the
+-- rounding error of the old ones; run `python climatology.py --rebuild`
+-- afterwards for full precision.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = 'climatology_cube' AND column_name = 'temp_sum'
+    ) THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE climatology_cube RENAME COLUMN temp_sum TO temp_anomaly_sum;
+    ALTER TABLE climatology_cube RENAME COLUMN temp_sumsq TO temp_anomaly_sumsq;
+    ALTER TABLE climatology_cube RENAME COLUMN psal_sum TO psal_anomaly_sum;
+    ALTER TABLE climatology_cube RENAME COLUMN psal_sumsq TO psal_anomaly_sumsq;
+
+    -- The right-hand sides read the old (plain) sums
+    UPDATE climatology_cube SET
+        temp_anomaly_sumsq = temp_anomaly_sumsq - 2 * 10.0 * temp_anomaly_sum + temp_count * 10.0 ^ 2,
+        temp_anomaly_sum = temp_anomaly_sum - temp_count * 10.0,
+        psal_anomaly_sumsq = psal_anomaly_sumsq - 2 * 35.0 * psal_anomaly_sum + psal_count * 35.0 ^ 2,
+        psal_anomaly_sum = psal_anomaly_sum - psal_count * 35.0;
+END $$;
@@ -1,9 +1,14 @@
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, Text, ForeignKey, ForeignKeyConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Float, REAL, Date, DateTime, JSON, Boolean, Text, ForeignKey, ForeignKeyConstraint, UniqueConstraint, Index, DDL, event, func
 from sqlalchemy.dialects.postgresql import ARRAY
+from datetime import datetime, timezone
 
 Base = declarative_base()
 
+def utc_now():
+    """Current UTC time as a naive datetime, as stored in the DateTime columns"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class FloatMetadata(Base):
     __tablename__ = "float_metadata"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -33,19 +38,24 @@ class ProfileMetadata(Base):
     juld = Column(DateTime, index=True) 
     juld_qc = Column(String(1))
     juld_location = Column(DateTime)  
-    latitude = Column(Float, index=True)
+    latitude = Column(Float)  # Leading column of ix_profile_metadata_latitude_longitude
     longitude = Column(Float, index=True)
     position_qc = Column(String(1))
     data_type = Column(String(16))
-    station_parameters = Column(ARRAY(String(16))) 
+    station_parameters = Column(ARRAY(String(16)).with_variant(JSON, "sqlite"))  # JSON on SQLite (benchmarks)
     config_mission_number = Column(Integer)
     profile_pres_qc = Column(String(1))
     profile_temp_qc = Column(String(1))
     profile_psal_qc = Column(String(1))
+    data_mode = Column(String(1))  # R (real-time), A (adjusted) or D (delayed mode)
+    geohash = Column(String(12))  # Grid cell of the position; prefixes are the coarser cells (see ocean_regions.py)
+    ocean_basin = Column(String(16), index=True)  # Atlantic Ocean, Pacific Ocean, ... (None without a position)
     
     # Composite unique constraint for profile identification
     __table_args__ = (
         UniqueConstraint('platform_number', 'cycle_number', name='uix_profile_platform_cycle'),
+        # Region queries filter on both coordinates at once
+        Index('ix_profile_metadata_latitude_longitude', 'latitude', 'longitude'),
     )
     
     # Relationships
@@ -53,12 +63,27 @@ class ProfileMetadata(Base):
     measurements = relationship("Measurement", back_populates="profile")
     calibrations = relationship("Calibration", back_populates="profile")
     processing_history = relationship("ProcessingHistory", back_populates="profile")
+    levels = relationship("ProfileLevels", back_populates="profile", uselist=False)
+    summary = relationship("ProfileSummary", back_populates="profile", uselist=False)
+    standard_levels = relationship("ProfileStandardLevels", back_populates="profile", uselist=False)
+
+# Geohash prefixes at the resolutions ocean_regions.region_cells hands out
+Index('ix_profile_metadata_geohash_2', func.substr(ProfileMetadata.geohash, 1, 2))
+Index('ix_profile_metadata_geohash_3', func.substr(ProfileMetadata.geohash, 1, 3))
+Index('ix_profile_metadata_geohash_4', func.substr(ProfileMetadata.geohash, 1, 4))
+
+# measurements.juld of profiles without a date: the ARGO reference date (JULD 0),
+# since juld is part of the partitioned table's primary key and cannot be NULL
+UNDATED_JULD = datetime(1950, 1, 1)
 
 class Measurement(Base):
     __tablename__ = "measurements"
+    # Once migrations/001 partitions the table, its primary key is (id, juld); id alone stays unique
     id = Column(Integer, primary_key=True, autoincrement=True)
-    platform_number = Column(String(8), nullable=False, index=True)
-    cycle_number = Column(Integer, nullable=False, index=True)
+    # platform_number and cycle_number lead ix_measurements_platform_cycle_pres
+    platform_number = Column(String(8), nullable=False)
+    cycle_number = Column(Integer, nullable=False)
+    juld = Column(DateTime, nullable=False)  # Profile time, copied from profile_metadata (the partition key, see migrations/)
     pres = Column(Float, index=True)
     pres_qc = Column(String(1))
     temp = Column(Float)
@@ -71,6 +96,11 @@ class Measurement(Base):
     psal_adjusted = Column(Float)
     psal_adjusted_qc = Column(String(1))
     psal_adjusted_error = Column(Float)
+    # QC-resolved values (see best_values.py): NULL unless good, adjusted ones in data modes A and D
+    pres_best = Column(Float, index=True)
+    temp_best = Column(Float, index=True)
+    psal_best = Column(Float, index=True)
+    good_mask = Column(SmallInteger)  # GOOD_PRES | GOOD_TEMP | GOOD_PSAL bits of the best values present
     
     # Foreign key to profile using the unique constraint
     __table_args__ = (
@@ -78,11 +108,213 @@ class Measurement(Base):
             ['platform_number', 'cycle_number'], 
             ['profile_metadata.platform_number', 'profile_metadata.cycle_number']
         ),
+        # One profile's levels, in depth order
+        Index('ix_measurements_platform_cycle_pres', 'platform_number', 'cycle_number', 'pres'),
+        # Rows arrive roughly in time order, so a BRIN index stays tiny
+        Index('ix_measurements_juld_brin', 'juld', postgresql_using='brin'),
     )
     
     # Relationship
     profile = relationship("ProfileMetadata", back_populates="measurements")
 
+# float4[] on Postgres, JSON on SQLite (benchmarks)
+PackedFloats = ARRAY(REAL).with_variant(JSON, "sqlite")
+
+class ProfileLevels(Base):
+    """Packed storage of a profile's measurements (MEASUREMENT_STORAGE=packed or both).
+
+    One row per profile: each float column holds the profile's valid levels as a
+    float4 array, in the same order as the measurements rows, and each QC column
+    holds one character per level (a space where the flag is blank or missing,
+    NULL in the view). The profile_levels_unpacked view turns them back into
+    one row per level.
+    """
+    __tablename__ = "profile_levels"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    platform_number = Column(String(8), nullable=False)
+    cycle_number = Column(Integer, nullable=False)
+    n_levels = Column(Integer, nullable=False)
+    pres = Column(PackedFloats)
+    pres_qc = Column(Text)
+    temp = Column(PackedFloats)
+    temp_qc = Column(Text)
+    temp_adjusted = Column(PackedFloats)
+    temp_adjusted_qc = Column(Text)
+    temp_adjusted_error = Column(PackedFloats)
+    psal = Column(PackedFloats)
+    psal_qc = Column(Text)
+    psal_adjusted = Column(PackedFloats)
+    psal_adjusted_qc = Column(Text)
+    psal_adjusted_error = Column(PackedFloats)
+
+    __table_args__ = (
+        UniqueConstraint('platform_number', 'cycle_number', name='uix_profile_levels_platform_cycle'),
+        ForeignKeyConstraint(
+            ['platform_number', 'cycle_number'],
+            ['profile_metadata.platform_number', 'profile_metadata.cycle_number']
+        ),
+    )
+
+    profile = relationship("ProfileMetadata", back_populates="levels")
+
+# One row per level with the columns of measurements (plus level, 1-based), unpacked from profile_levels
+PROFILE_LEVELS_UNPACKED_VIEW = """
+CREATE OR REPLACE VIEW profile_levels_unpacked AS
+SELECT l.platform_number,
+       l.cycle_number,
+       u.level::integer AS level,
+       u.pres::double precision AS pres,
+       NULLIF(substr(l.pres_qc, u.level::integer, 1), ' ') AS pres_qc,
+       u.temp::double precision AS temp,
+       NULLIF(substr(l.temp_qc, u.level::integer, 1), ' ') AS temp_qc,
+       u.temp_adjusted::double precision AS temp_adjusted,
+       NULLIF(substr(l.temp_adjusted_qc, u.level::integer, 1), ' ') AS temp_adjusted_qc,
+       u.temp_adjusted_error::double precision AS temp_adjusted_error,
+       u.psal::double precision AS psal,
+       NULLIF(substr(l.psal_qc, u.level::integer, 1), ' ') AS psal_qc,
+       u.psal_adjusted::double precision AS psal_adjusted,
+       NULLIF(substr(l.psal_adjusted_qc, u.level::integer, 1), ' ') AS psal_adjusted_qc,
+       u.psal_adjusted_error::double precision AS psal_adjusted_error
+FROM profile_levels l
+CROSS JOIN LATERAL unnest(
+    l.pres, l.temp, l.temp_adjusted, l.temp_adjusted_error, l.psal, l.psal_adjusted, l.psal_adjusted_error
+) WITH ORDINALITY AS u(pres, temp, temp_adjusted, temp_adjusted_error, psal, psal_adjusted, psal_adjusted_error, level)
+"""
+
+# The view lives and dies with its table (Postgres only; unnest has no SQLite equivalent)
+event.listen(ProfileLevels.__table__, "after_create", DDL(PROFILE_LEVELS_UNPACKED_VIEW).execute_if(dialect="postgresql"))
+event.listen(ProfileLevels.__table__, "before_drop", DDL("DROP VIEW IF EXISTS profile_levels_unpacked").execute_if(dialect="postgresql"))
+
+class ProfileStandardLevels(Base):
+    """A profile's temp and psal interpolated onto standard pressure levels (see standard_levels.py).
+
+    One row per profile: pres holds the standard pressures (STANDARD_PRESSURE_LEVELS
+    at ingest) and every other array the values at those pressures, NULL where a
+    level could not be interpolated. The profile_standard_levels_unpacked view
+    turns them into one row per profile and level.
+    """
+    __tablename__ = "profile_standard_levels"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    platform_number = Column(String(8), nullable=False)
+    cycle_number = Column(Integer, nullable=False)
+    pres = Column(PackedFloats, nullable=False)
+    temp = Column(PackedFloats)
+    temp_adjusted = Column(PackedFloats)
+    psal = Column(PackedFloats)
+    psal_adjusted = Column(PackedFloats)
+
+    __table_args__ = (
+        UniqueConstraint('platform_number', 'cycle_number', name='uix_profile_standard_levels_platform_cycle'),
+        ForeignKeyConstraint(
+            ['platform_number', 'cycle_number'],
+            ['profile_metadata.platform_number', 'profile_metadata.cycle_number']
+        ),
+    )
+
+    profile = relationship("ProfileMetadata", back_populates="standard_levels")
+
+PROFILE_STANDARD_LEVELS_UNPACKED_VIEW = """
+CREATE OR REPLACE VIEW profile_standard_levels_unpacked AS
+SELECT s.platform_number,
+       s.cycle_number,
+       u.pres::double precision AS pres,
+       u.temp::double precision AS temp,
+       u.temp_adjusted::double precision AS temp_adjusted,
+       u.psal::double precision AS psal,
+       u.psal_adjusted::double precision AS psal_adjusted
+FROM profile_standard_levels s
+CROSS JOIN LATERAL unnest(s.pres, s.temp, s.temp_adjusted, s.psal, s.psal_adjusted)
+    AS u(pres, temp, temp_adjusted, psal, psal_adjusted)
+"""
+
+event.listen(ProfileStandardLevels.__table__, "after_create", DDL(PROFILE_STANDARD_LEVELS_UNPACKED_VIEW).execute_if(dialect="postgresql"))
+event.listen(ProfileStandardLevels.__table__, "before_drop", DDL("DROP VIEW IF EXISTS profile_standard_levels_unpacked").execute_if(dialect="postgresql"))
+
+class ProfileSummary(Base):
+    """Per-profile statistics of the measurements, computed during ingest.
+
+    Counts, means and ranges cover a profile's valid levels (those with a
+    pressure). surface and bottom are the values at the shallowest and deepest
+    level where the variable is present. The density, mixed layer, thermocline
+    and heat content columns are derived from the good values (see
+    derived_variables.py).
+    """
+    __tablename__ = "profile_summary"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    platform_number = Column(String(8), nullable=False)
+    cycle_number = Column(Integer, nullable=False)
+    n_levels = Column(Integer, nullable=False)
+    pres_mean = Column(Float)
+    pres_min = Column(Float)
+    pres_max = Column(Float)
+    temp_count = Column(Integer, nullable=False)
+    temp_mean = Column(Float)
+    temp_min = Column(Float)
+    temp_max = Column(Float)
+    temp_surface = Column(Float)
+    temp_bottom = Column(Float)
+    temp_adjusted_count = Column(Integer, nullable=False)
+    temp_adjusted_mean = Column(Float)
+    temp_adjusted_min = Column(Float)
+    temp_adjusted_max = Column(Float)
+    temp_adjusted_surface = Column(Float)
+    temp_adjusted_bottom = Column(Float)
+    psal_count = Column(Integer, nullable=False)
+    psal_mean = Column(Float)
+    psal_min = Column(Float)
+    psal_max = Column(Float)
+    psal_surface = Column(Float)
+    psal_bottom = Column(Float)
+    psal_adjusted_count = Column(Integer, nullable=False)
+    psal_adjusted_mean = Column(Float)
+    psal_adjusted_min = Column(Float)
+    psal_adjusted_max = Column(Float)
+    psal_adjusted_surface = Column(Float)
+    psal_adjusted_bottom = Column(Float)
+    sigma_theta_surface = Column(Float)  # kg/m^3
+    mixed_layer_depth = Column(Float)  # dbar
+    thermocline_depth = Column(Float)  # dbar
+    heat_content_0_700 = Column(Float)  # J/m^2
+
+    __table_args__ = (
+        UniqueConstraint('platform_number', 'cycle_number', name='uix_profile_summary_platform_cycle'),
+        ForeignKeyConstraint(
+            ['platform_number', 'cycle_number'],
+            ['profile_metadata.platform_number', 'profile_metadata.cycle_number']
+        ),
+    )
+
+    profile = relationship("ProfileMetadata", back_populates="summary")
+
+class ClimatologyCube(Base):
+    """Count, sum and sum of squares of good temp/psal levels per month, grid cell and depth bin.
+
+    Sums are of anomalies from climatology.CUBE_REFERENCES (10 deg C, 35 PSU).
+    Maintained by every ingest (see climatology.py): rows are merged by adding
+    the counts and sums, and a replaced profile's contribution is subtracted
+    again, so means and variances over any set of rows follow from the sums.
+    Values are the adjusted ones for A and D mode profiles, with QC flags 1, 2,
+    5 or 8, rounded to float4.
+    """
+    __tablename__ = "climatology_cube"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    month = Column(Date, nullable=False)  # First day of the month of the profile time
+    geohash = Column(String(12), nullable=False)  # Grid cell: the profile geohash cut to CLIMATOLOGY_PRECISION characters
+    ocean_basin = Column(String(16), nullable=False, index=True)
+    depth_bin = Column(Integer, nullable=False)  # Upper edge (shallowest pressure, dbar) of the standard depth bin
+    profile_count = Column(Integer, nullable=False)
+    temp_count = Column(BigInteger, nullable=False)
+    temp_anomaly_sum = Column(Float, nullable=False)
+    temp_anomaly_sumsq = Column(Float, nullable=False)
+    psal_count = Column(BigInteger, nullable=False)
+    psal_anomaly_sum = Column(Float, nullable=False)
+    psal_anomaly_sumsq = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('geohash', 'ocean_basin', 'month', 'depth_bin', name='uix_climatology_cube_cell_month_bin'),
+        Index('ix_climatology_cube_month_depth_bin', 'month', 'depth_bin'),
+    )
+
 class Calibration(Base):
     __tablename__ = "calibrations"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -132,4 +364,37 @@ class ProcessingHistory(Base):
     )
     
     # Relationship
-    profile = relationship("ProfileMetadata", back_populates="processing_history")
\ No newline at end of file
+    profile = relationship("ProfileMetadata", back_populates="processing_history")
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(String(36), primary_key=True)
+    filename = Column(String(256), nullable=False)
+    file_path = Column(Text, nullable=False)
+    file_hash = Column(String(64))  # SHA-256 computed while the upload streamed in
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued, running, completed, failed
+    client_sid = Column(String(64))  # Socket.IO session that receives progress events
+    reingest = Column(Boolean, nullable=False, default=False)
+    profiles_done = Column(Integer, default=0)
+    profiles_total = Column(Integer)
+    rows_per_sec = Column(Float)
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class IngestManifest(Base):
+    __tablename__ = "ingest_manifest"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    file_hash = Column(String(64), nullable=False, unique=True, index=True)  # SHA-256 of the file contents
+    file_name = Column(String(256))
+    file_size = Column(BigInteger)
+    status = Column(String(16), nullable=False, default="in_progress")  # in_progress, completed, failed
+    profiles_total = Column(Integer)
+    next_profile = Column(Integer, nullable=False, default=0)  # Checkpoint: first profile not yet committed
+    profiles_ingested = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    completed_at = Column(DateTime)
\ No newline at end of file
@@ -2,14 +2,26 @@ import xarray as xr
 import pandas as pd
 import numpy as np
 from sqlalchemy.orm import sessionmaker, joinedload
-from sqlalchemy import func
-from config import engine
-from models import Base, FloatMetadata, ProfileMetadata, Measurement, Calibration, ProcessingHistory
+from sqlalchemy import case, func, delete, tuple_
+from config import engine, NETCDF_INGEST_MODE, NETCDF_INGEST_WRITER, EMBEDDING_BATCH_SIZE, NETCDF_CHUNK_PROFILES, ANALYTICS_MIRROR_DIRECTORY, MEASUREMENT_STORAGE, STANDARD_PRESSURE_LEVELS
+from bulk_loader import get_row_writer, dialect_insert, upsert_rows
+from embedding_pipeline import EmbeddingPipeline
+from ingest_metrics import IngestMetrics, record_ingest
+from analytics_mirror import AnalyticsMirror
+from ocean_regions import profile_cells
+from climatology import add_to_cube, cube_rows, drop_empty_cells, stored_cube_rows
+from standard_levels import good_masks, standard_level_arrays, standard_levels_at, standard_levels_from_rows
+from best_values import BEST_COLUMNS, add_best_values, adjusted_profiles, best_columns, best_level_arrays
+from derived_variables import derived_at, derived_from_rows, derived_variables
+from models import Base, FloatMetadata, ProfileMetadata, Measurement, ProfileLevels, ProfileStandardLevels, ProfileSummary, Calibration, ProcessingHistory, IngestManifest, UNDATED_JULD, utc_now
 from tqdm import tqdm
 import datetime
+import hashlib
 import chromadb
 from chromadb.config import Settings
 import os
+import threading
+import time
 from sentence_transformers import SentenceTransformer
 
 SessionLocal = sessionmaker(bind=engine)
@@ -22,29 +34,35 @@ os.makedirs(CHROMA_PERSIST_DIRECTORY, exist_ok=True)
 chroma_client = None
 collection = None
 
+# Ingest jobs run on several threads; the lazy loaders must only initialize once
+_lazy_init_lock = threading.Lock()
+
 def get_chroma_client():
     """Lazy load ChromaDB client"""
     global chroma_client
-    if chroma_client is None:
-        print("Initializing ChromaDB client...")
-        chroma_client = chromadb.PersistentClient(
-            path=CHROMA_PERSIST_DIRECTORY,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
+    with _lazy_init_lock:
+        if chroma_client is None:
+            print("Initializing ChromaDB client...")
+            chroma_client = chromadb.PersistentClient(
+                path=CHROMA_PERSIST_DIRECTORY,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=True
+                )
             )
-        )
-        print("ChromaDB client initialized!")
+            print("ChromaDB client initialized!")
     return chroma_client
 
 def get_collection():
     """Get or create ChromaDB collection"""
     global collection
     if collection is None:
-        print("Getting/creating ChromaDB collection...")
         client = get_chroma_client()
-        collection = client.get_or_create_collection(name="argo_profiles")
-        print("Collection ready!")
+        with _lazy_init_lock:
+            if collection is None:
+                print("Getting/creating ChromaDB collection...")
+                collection = client.get_or_create_collection(name="argo_profiles")
+                print("Collection ready!")
     return collection
 
 # MODERN: Lazy loading of sentence-transformers to avoid blocking server startup
@@ -53,35 +71,17 @@ embedding_model = None
 def get_embedding_model():
     """Lazy load the embedding model only when needed"""
     global embedding_model
-    if embedding_model is None:
-        print("Loading sentence-transformers model...")
-        embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        print("Model loaded successfully!")
+    with _lazy_init_lock:
+        if embedding_model is None:
+            print("Loading sentence-transformers model...")
+            embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            print("Model loaded successfully!")
     return embedding_model
 
 def convert_julian_day(julian_day, reference_date="1950-01-01"):
     """Convert Julian day to datetime"""
-    # Debug: print the raw value
-    print(f"Raw Julian day value: {julian_day}, type: {type(julian_day)}")
-    
-    # Check for common fill values
-    if pd.isna(julian_day) or julian_day in [999999.0, 99999.0, 999999, 99999, -999999.0, -99999.0]:
-        print(f"Filtered out Julian day (fill value): {julian_day}")
-        return None
-    
-    try:
-        base_date = pd.Timestamp(reference_date)
-        result = base_date + pd.Timedelta(days=float(julian_day))
-        print(f"Converted Julian day {julian_day} to {result}")
-        
-        # Verify the conversion makes sense
-        if result.year < 1990 or result.year > 2030:
-            print(f"WARNING: Converted date {result} seems unusual for Julian day {julian_day}")
-        
-        return result
-    except Exception as e:
-        print(f"Error converting Julian day {julian_day}: {e}")
-        return None
+    result = convert_julian_days([julian_day], reference_date)[0]
+    return None if np.isnat(result) else pd.Timestamp(result)
     
 def safe_decode(value):
     """Safely decode bytes to string or return original value"""
@@ -108,6 +108,9 @@ def safe_datetime(value):
     if pd.isna(value) or value in [99999.0, 999999.0]:
         return None
     try:
+        if isinstance(value, bytes):
+            # ARGO char dates (SCIENTIFIC_CALIB_DATE, HISTORY_DATE) come back as bytes
+            value = value.decode('utf-8')
         if isinstance(value, (pd.Timestamp, datetime.datetime)):
             # Check if it's NaT specifically
             if pd.isna(value):
@@ -116,7 +119,9 @@ def safe_datetime(value):
         elif isinstance(value, str):
             if value.strip() == '' or value.strip().upper() == 'NAT':
                 return None
-            result = pd.to_datetime(value, errors='coerce')
+            result = pd.to_datetime(value.strip(), format=ARGO_DATE_FORMAT, errors='coerce')
+            if pd.isna(result):
+                result = pd.to_datetime(value, errors='coerce')
             return None if pd.isna(result) else result
         else:
             result = pd.to_datetime(str(value), errors='coerce')
@@ -124,7 +129,364 @@ def safe_datetime(value):
     except (ValueError, TypeError):
         return None
 
-def create_profile_summary(profile, measurements, float_meta):
+# Fill values used by ARGO files that xarray does not always mask for us
+FILL_VALUES = [99999.0, 999999.0]
+
+# ARGO date strings, e.g. REFERENCE_DATE_TIME and SCIENTIFIC_CALIB_DATE
+ARGO_DATE_FORMAT = '%Y%m%d%H%M%S'
+
+# Measurement columns and the per-level NetCDF variables they are read from
+MEASUREMENT_FLOAT_VARIABLES = {
+    'pres': 'PRES',
+    'temp': 'TEMP',
+    'temp_adjusted': 'TEMP_ADJUSTED',
+    'temp_adjusted_error': 'TEMP_ADJUSTED_ERROR',
+    'psal': 'PSAL',
+    'psal_adjusted': 'PSAL_ADJUSTED',
+    'psal_adjusted_error': 'PSAL_ADJUSTED_ERROR',
+}
+MEASUREMENT_QC_VARIABLES = {
+    'pres_qc': 'PRES_QC',
+    'temp_qc': 'TEMP_QC',
+    'temp_adjusted_qc': 'TEMP_ADJUSTED_QC',
+    'psal_qc': 'PSAL_QC',
+    'psal_adjusted_qc': 'PSAL_ADJUSTED_QC',
+}
+
+# Calibration text columns and the N_PROF x N_CALIB x N_PARAM variables they are read from
+CALIBRATION_TEXT_VARIABLES = {
+    'scientific_calib_equation': 'SCIENTIFIC_CALIB_EQUATION',
+    'scientific_calib_coefficient': 'SCIENTIFIC_CALIB_COEFFICIENT',
+    'scientific_calib_comment': 'SCIENTIFIC_CALIB_COMMENT',
+}
+
+# Processing history columns and the N_HISTORY x N_PROF variables they are read from
+HISTORY_TEXT_VARIABLES = {
+    'history_institution': 'HISTORY_INSTITUTION',
+    'history_step': 'HISTORY_STEP',
+    'history_software': 'HISTORY_SOFTWARE',
+    'history_software_release': 'HISTORY_SOFTWARE_RELEASE',
+    'history_reference': 'HISTORY_REFERENCE',
+    'history_action': 'HISTORY_ACTION',
+    'history_parameter': 'HISTORY_PARAMETER',
+    'history_qctest': 'HISTORY_QCTEST',
+}
+HISTORY_FLOAT_VARIABLES = {
+    'history_start_pres': 'HISTORY_START_PRES',
+    'history_stop_pres': 'HISTORY_STOP_PRES',
+    'history_previous_value': 'HISTORY_PREVIOUS_VALUE',
+}
+
+# Fill values seen in JULD / JULD_LOCATION day counts
+JULD_FILL_VALUES = [999999.0, 99999.0, -999999.0, -99999.0]
+
+def mask_fill_values(values):
+    """Return a float64 copy of an array with fill values replaced by NaN (bulk safe_float)"""
+    result = np.array(values, dtype=np.float64)
+    result[np.isin(result, FILL_VALUES)] = np.nan
+    return result
+
+def decode_char_array(values):
+    """Decode and strip a whole char/bytes array at once (bulk safe_decode).
+
+    Returns an object array of str, with None wherever safe_decode would return None.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'S':
+        missing = np.zeros(arr.shape, dtype=bool)
+        text = np.char.decode(arr, 'utf-8')
+    elif arr.dtype.kind == 'U':
+        missing = np.zeros(arr.shape, dtype=bool)
+        text = arr
+    else:
+        missing = pd.isna(arr)
+        filled = np.where(missing, b'', arr)
+        try:
+            text = np.char.decode(filled.astype(bytes), 'utf-8')
+        except (TypeError, UnicodeEncodeError, UnicodeDecodeError):
+            text = filled.astype(str)
+    result = np.char.strip(text).astype(object)
+    result[missing] = None
+    return result
+
+def convert_julian_days(values, reference_date="1950-01-01"):
+    """Convert a whole JULD / JULD_LOCATION array to datetime64[ns] at once.
+
+    xarray normally decodes JULD to datetime64 already, which is passed through.
+    Raw day counts are offset from reference_date (REFERENCE_DATE_TIME).
+    Fill values and NaN become NaT. Times are rounded to the nearest microsecond,
+    the precision stored in the database, so the scalar and bulk paths (and the
+    datetime.datetime objects made from them) carry exactly the same value.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'M':
+        times = pd.DatetimeIndex(arr.astype('datetime64[ns]').ravel())
+    else:
+        days = np.array(arr, dtype=np.float64)
+        days[np.isin(days, JULD_FILL_VALUES)] = np.nan
+        times = pd.Timestamp(reference_date) + pd.to_timedelta(days.ravel(), unit='D')
+    return times.round('us').to_numpy().reshape(arr.shape)
+
+def datetime_objects(values):
+    """Turn a datetime64 array into an object array of datetime.datetime, None for NaT"""
+    # datetime64[us] -> object gives datetime.datetime, and None for NaT
+    return np.asarray(values).astype('datetime64[us]').astype(object)
+
+def parse_argo_dates(values):
+    """Parse a whole array of YYYYMMDDHHMISS char dates at once (bulk safe_datetime).
+
+    Returns an object array of datetime.datetime, with None for blank or invalid dates.
+    """
+    text = decode_char_array(values)
+    parsed = pd.to_datetime(pd.Series(text.ravel()), format=ARGO_DATE_FORMAT, errors='coerce')
+    return datetime_objects(parsed.to_numpy()).reshape(text.shape)
+
+def load_level_arrays(ds):
+    """Load the per-level variables once as whole N_PROF x N_LEVELS arrays.
+
+    Float variables come back as float64 with NaN for missing values, QC variables
+    as object arrays of decoded strings. Variables missing from the file map to None.
+    """
+    arrays = {}
+    for column, name in MEASUREMENT_FLOAT_VARIABLES.items():
+        arrays[column] = mask_fill_values(ds[name].values) if hasattr(ds, name) else None
+    for column, name in MEASUREMENT_QC_VARIABLES.items():
+        arrays[column] = decode_char_array(ds[name].values) if hasattr(ds, name) else None
+    return arrays
+
+def measurement_batch(level_arrays, profile_indices, platforms, cycle_numbers, julds):
+    """Build a columnar batch of the valid measurement rows for the given profiles.
+
+    A level is valid when it has a pressure value, exactly as in the per-cell path.
+    Rows come out in profile order, then level order. Missing floats are NaN and
+    missing strings are None. Every row carries its profile's juld (UNDATED_JULD
+    when the profile has none), and the BEST_COLUMNS are cut from level_arrays
+    as well when they are there.
+    """
+    profile_indices = np.asarray(profile_indices, dtype=np.intp)
+    valid = ~np.isnan(level_arrays['pres'][profile_indices])
+    rows, levels = np.nonzero(valid)
+    rows = profile_indices[rows]
+
+    batch = {
+        'platform_number': np.asarray(platforms, dtype=object)[rows],
+        'cycle_number': np.asarray(cycle_numbers, dtype=object)[rows],
+        'juld': np.where(pd.isna(julds), UNDATED_JULD, np.asarray(julds, dtype=object))[rows],
+    }
+    for column in list(MEASUREMENT_FLOAT_VARIABLES) + list(MEASUREMENT_QC_VARIABLES) + BEST_COLUMNS:
+        values = level_arrays.get(column)
+        if values is None:
+            batch[column] = np.full(len(rows), None, dtype=object)
+        else:
+            batch[column] = values[rows, levels]
+    return batch
+
+def batch_records(batch):
+    """Turn a columnar batch into row dicts, mapping NaN to None"""
+    columns = []
+    for values in batch.values():
+        if values.dtype.kind == 'f':
+            column = values.astype(object)
+            column[np.isnan(values)] = None
+            values = column
+        columns.append(values.tolist())
+    keys = list(batch)
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+# Columns of a measurement batch, in measurement_batch order
+MEASUREMENT_BATCH_COLUMNS = (
+    ['platform_number', 'cycle_number', 'juld'] + list(MEASUREMENT_FLOAT_VARIABLES) + list(MEASUREMENT_QC_VARIABLES)
+    + BEST_COLUMNS
+)
+
+def records_batch(rows, columns):
+    """Turn row dicts into a columnar batch (the inverse of batch_records), None to NaN for floats"""
+    batch = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        if column in MEASUREMENT_FLOAT_VARIABLES and any(value is not None for value in values):
+            batch[column] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            batch[column] = np.array(values, dtype=object)
+    return batch
+
+def _packed_floats(values):
+    """float4 list of one profile's levels, None where NaN"""
+    packed = values.astype(np.float32).tolist()
+    for index in np.flatnonzero(np.isnan(values)):
+        packed[index] = None
+    return packed
+
+def _packed_flags(values):
+    """One character per level; blank and missing flags are stored as a space"""
+    return ''.join((flag or ' ')[0] for flag in values)
+
+def packed_level_rows(batch):
+    """Pack a columnar measurement batch into one ProfileLevels row per profile.
+
+    The batch's rows are grouped by profile (as measurement_batch produces them),
+    so each profile is a contiguous run that becomes one row of arrays. As with
+    measurements rows, a profile without valid levels gets no row.
+    """
+    platforms = batch['platform_number']
+    cycles = batch['cycle_number']
+    n_rows = len(platforms)
+    if n_rows == 0:
+        return []
+    starts_profile = np.ones(n_rows, dtype=bool)
+    starts_profile[1:] = (platforms[1:] != platforms[:-1]) | (cycles[1:] != cycles[:-1])
+    starts = np.flatnonzero(starts_profile)
+    stops = np.append(starts[1:], n_rows)
+
+    rows = []
+    for start, stop in zip(starts, stops):
+        row = dict(
+            platform_number=platforms[start],
+            cycle_number=cycles[start],
+            n_levels=int(stop - start),
+        )
+        for column in MEASUREMENT_FLOAT_VARIABLES:
+            values = batch[column][start:stop]
+            row[column] = _packed_floats(values) if values.dtype.kind == 'f' else None
+        for column in MEASUREMENT_QC_VARIABLES:
+            values = batch[column][start:stop]
+            # A QC variable missing from the file is None on every level
+            row[column] = None if all(flag is None for flag in values) else _packed_flags(values)
+        rows.append(row)
+    return rows
+
+def calibration_batch(ds, profile_indices, platforms, cycle_numbers):
+    """Build a columnar batch of calibration rows for the given profiles.
+
+    Every N_CALIB x N_PARAM slot with a non-blank PARAMETER becomes a row, in
+    profile, calibration, parameter order as in the per-element loop. Only the
+    slots that are kept are decoded.
+    """
+    profile_indices = np.asarray(profile_indices, dtype=np.intp)
+    parameters = decode_char_array(ds.PARAMETER.values[profile_indices])
+    present = (parameters != None) & (parameters != '')
+    rows = np.nonzero(present)[0]
+    rows = profile_indices[rows]
+
+    batch = {
+        'platform_number': np.asarray(platforms, dtype=object)[rows],
+        'cycle_number': np.asarray(cycle_numbers, dtype=object)[rows],
+        'parameter': parameters[present],
+    }
+    for column, name in CALIBRATION_TEXT_VARIABLES.items():
+        if hasattr(ds, name):
+            batch[column] = decode_char_array(ds[name].values[profile_indices][present])
+        else:
+            batch[column] = np.full(len(rows), None, dtype=object)
+    if hasattr(ds, 'SCIENTIFIC_CALIB_DATE'):
+        batch['scientific_calib_date'] = parse_argo_dates(ds.SCIENTIFIC_CALIB_DATE.values[profile_indices][present])
+    else:
+        batch['scientific_calib_date'] = np.full(len(rows), None, dtype=object)
+    return batch
+
+def history_batch(ds, profile_indices, platforms, cycle_numbers):
+    """Build a columnar batch of processing history rows for the given profiles.
+
+    Each HISTORY_* variable is decoded once for all N_HISTORY x N_PROF slots.
+    Slots where every field is blank are dropped. Rows come out in history slot,
+    then profile order, like the per-pair loop.
+    """
+    profile_indices = np.asarray(profile_indices, dtype=np.intp)
+    shape = (ds.sizes['N_HISTORY'], len(profile_indices))
+    columns = {}
+    for column, name in HISTORY_TEXT_VARIABLES.items():
+        columns[column] = decode_char_array(ds[name].values[:, profile_indices]) if hasattr(ds, name) else None
+    if hasattr(ds, 'HISTORY_DATE'):
+        columns['history_date'] = parse_argo_dates(ds.HISTORY_DATE.values[:, profile_indices])
+    else:
+        columns['history_date'] = None
+    for column, name in HISTORY_FLOAT_VARIABLES.items():
+        columns[column] = mask_fill_values(ds[name].values[:, profile_indices]) if hasattr(ds, name) else None
+
+    present = np.zeros(shape, dtype=bool)
+    for column, values in columns.items():
+        if values is None:
+            continue
+        if values.dtype.kind == 'f':
+            present |= ~np.isnan(values)
+        else:
+            present |= (values != None) & (values != '')
+    slots, rows = np.nonzero(present)
+    rows = profile_indices[rows]
+
+    batch = {
+        'platform_number': np.asarray(platforms, dtype=object)[rows],
+        'cycle_number': np.asarray(cycle_numbers, dtype=object)[rows],
+    }
+    for column, values in columns.items():
+        batch[column] = values[present] if values is not None else np.full(len(rows), None, dtype=object)
+    return batch
+
+# ProfileSummary variables with count, mean, min, max, surface and bottom columns
+# (pres has mean, min and max; its count is n_levels)
+SUMMARY_VARIABLES = ['temp', 'temp_adjusted', 'psal', 'psal_adjusted']
+
+def _count_mean_min_max(values, present):
+    count = present.sum(axis=1)
+    has_values = count > 0
+    total = np.where(present, values, 0.0).sum(axis=1)
+    mean = np.divide(total, count, out=np.full(count.shape, np.nan), where=has_values)
+    low = np.where(present, values, np.inf).min(axis=1)
+    high = np.where(present, values, -np.inf).max(axis=1)
+    return count, mean, np.where(has_values, low, np.nan), np.where(has_values, high, np.nan)
+
+def profile_summary_stats(level_arrays):
+    """ProfileSummary statistics of all profiles at once, from N_PROF x N_LEVELS float arrays.
+
+    Returns {column: array of N_PROF values}, NaN where a statistic has no data.
+    """
+    pres = level_arrays['pres']
+    if pres.shape[1] == 0:
+        # No levels at all: one empty level keeps the reductions below well defined
+        pres = np.full((pres.shape[0], 1), np.nan)
+    valid = ~np.isnan(pres)
+    rows = np.arange(pres.shape[0])
+    n_levels, pres_mean, pres_min, pres_max = _count_mean_min_max(pres, valid)
+    stats = {'n_levels': n_levels, 'pres_mean': pres_mean, 'pres_min': pres_min, 'pres_max': pres_max}
+    for name in SUMMARY_VARIABLES:
+        values = level_arrays[name]
+        if values is None or values.shape != pres.shape:
+            values = np.full(pres.shape, np.nan)
+        present = valid & ~np.isnan(values)
+        count, mean, low, high = _count_mean_min_max(values, present)
+        # Shallowest and deepest level where the variable is present
+        surface = values[rows, np.where(present, pres, np.inf).argmin(axis=1)]
+        bottom = values[rows, np.where(present, pres, -np.inf).argmax(axis=1)]
+        stats.update({
+            f'{name}_count': count,
+            f'{name}_mean': mean,
+            f'{name}_min': low,
+            f'{name}_max': high,
+            f'{name}_surface': np.where(count > 0, surface, np.nan),
+            f'{name}_bottom': np.where(count > 0, bottom, np.nan),
+        })
+    return stats
+
+def _profile_stats_at(stats, index):
+    """Pick one profile's statistics out of profile_summary_stats, as plain Python values (None for NaN)"""
+    values = {}
+    for name, column in stats.items():
+        if column.dtype.kind == 'f':
+            value = float(column[index])
+            values[name] = value if np.isfinite(value) else None
+        else:
+            values[name] = int(column[index])
+    return values
+
+def profile_stats_from_rows(measurements):
+    """profile_summary_stats of one profile given as measurement row dicts"""
+    level_arrays = {
+        name: np.array([[np.nan if m.get(name) is None else m[name] for m in measurements]], dtype=np.float64)
+        for name in ['pres'] + SUMMARY_VARIABLES
+    }
+    return _profile_stats_at(profile_summary_stats(level_arrays), 0)
+
+def create_profile_summary(profile, measurements, float_meta, stats=None):
     """Create a comprehensive text summary for a profile for embedding"""
     # Get basic profile information
     platform_number = profile.platform_number
@@ -139,21 +501,16 @@ def create_profile_summary(profile, measurements, float_meta):
     project_name = float_meta.project_name if float_meta else None
     data_centre = float_meta.data_centre if float_meta else None
     
-    # Calculate statistics from measurements
-    if measurements and len(measurements) > 0:
-        temp_vals = [m.temp for m in measurements if m.temp is not None]
-        psal_vals = [m.psal for m in measurements if m.psal is not None]
-        pres_vals = [m.pres for m in measurements if m.pres is not None]
-        
-        temp_avg = sum(temp_vals) / len(temp_vals) if temp_vals else None
-        psal_avg = sum(psal_vals) / len(psal_vals) if psal_vals else None
-        pres_min = min(pres_vals) if pres_vals else None
-        pres_max = max(pres_vals) if pres_vals else None
-        temp_count = len(temp_vals)
-        psal_count = len(psal_vals)
-    else:
-        temp_avg = psal_avg = pres_min = pres_max = None
-        temp_count = psal_count = 0
+    # Statistics of the measurements, unless they were precomputed in bulk
+    if stats is None:
+        stats = profile_stats_from_rows(measurements or [])
+    measurement_count = stats['n_levels']
+    temp_avg = stats['temp_mean']
+    psal_avg = stats['psal_mean']
+    pres_min = stats['pres_min']
+    pres_max = stats['pres_max']
+    temp_count = stats['temp_count']
+    psal_count = stats['psal_count']
     
     # Safely format coordinates - handle None values
     lat_str = f"{latitude:.2f}" if latitude is not None else "unknown"
@@ -171,7 +528,7 @@ def create_profile_summary(profile, measurements, float_meta):
     Profile collected on {date.strftime('%Y-%m-%d') if date else 'unknown date'} at location {lat_str}°N, {lon_str}°E.
     Platform type: {platform_type if platform_type else 'unknown'}, direction: {direction if direction else 'unknown'}.
     Data processed by {data_centre if data_centre else 'unknown'} data center.
-    Profile contains {len(measurements) if measurements else 0} measurements with:
+    Profile contains {measurement_count} measurements with:
     - {temp_count} temperature measurements{', average: ' + f'{temp_avg:.2f}°C' if temp_avg else ''}
     - {psal_count} salinity measurements{', average: ' + f'{psal_avg:.2f} PSU' if psal_avg else ''}
     Pressure range: {pressure_range}.
@@ -184,6 +541,7 @@ def create_profile_summary(profile, measurements, float_meta):
         "latitude": str(latitude) if latitude is not None else "unknown",
         "longitude": str(longitude) if longitude is not None else "unknown",
         "direction": direction if direction else "unknown",
+        "data_mode": profile.data_mode if profile.data_mode else "unknown",
         "platform_type": platform_type if platform_type else "unknown",
         "project_name": project_name if project_name else "unknown",
         "data_centre": data_centre if data_centre else "unknown",
@@ -194,281 +552,727 @@ def create_profile_summary(profile, measurements, float_meta):
         "average_salinity": f"{psal_avg:.2f} PSU" if psal_avg is not None else "unknown"
     }
 
-def process_netcdf(file_path):
-    ds = xr.open_dataset(file_path)
-    session = SessionLocal()
-    
-    # Batch processing for ChromaDB
-    chroma_batch_size = 100
-    chroma_ids = []
-    chroma_embeddings = []
-    chroma_metadatas = []
-    chroma_documents = []
-    
+def _optional_ints(values):
+    """Decode an integer variable (CYCLE_NUMBER, CONFIG_MISSION_NUMBER) to Python ints, None where missing"""
+    numbers = mask_fill_values(values)
+    return np.array([int(n) if not np.isnan(n) else None for n in numbers], dtype=object)
+
+def _optional_floats(values):
+    """Decode a float variable to Python floats, None where missing (bulk safe_float)"""
+    numbers = mask_fill_values(values)
+    result = numbers.astype(object)
+    result[np.isnan(numbers)] = None
+    return result
+
+# Per-profile char variables copied to ProfileMetadata as decoded strings
+PROFILE_TEXT_VARIABLES = {
+    'direction': 'DIRECTION',
+    'juld_qc': 'JULD_QC',
+    'position_qc': 'POSITION_QC',
+    'profile_pres_qc': 'PROFILE_PRES_QC',
+    'profile_temp_qc': 'PROFILE_TEMP_QC',
+    'profile_psal_qc': 'PROFILE_PSAL_QC',
+    'data_mode': 'DATA_MODE',
+}
+
+# Quality order of ARGO data modes: real-time < real-time adjusted < delayed mode
+DATA_MODE_RANK = {'R': 0, 'A': 1, 'D': 2}
+
+def data_mode_rank(data_mode):
+    """Rank of a data mode for reingest decisions; unknown or missing modes rank lowest"""
+    return DATA_MODE_RANK.get(data_mode, -1)
+
+def data_mode_rank_sql(column):
+    """data_mode_rank as a SQL expression over a data mode column"""
+    return case(DATA_MODE_RANK, value=column, else_=-1)
+
+def delete_profile_children(session, profile_keys):
+    """Delete the measurement (row, packed and standard level), summary, calibration and history rows of the given (platform, cycle) profiles"""
+    for model in (Measurement, ProfileLevels, ProfileStandardLevels, ProfileSummary, Calibration, ProcessingHistory):
+        session.execute(
+            delete(model).where(tuple_(model.platform_number, model.cycle_number).in_(profile_keys))
+        )
+
+def profile_metadata_columns(ds, ref_date):
+    """Decode every ProfileMetadata column for all profiles of a slice at once.
+
+    Returns {column: array of N_PROF Python values}, with None wherever the
+    per-profile path would store NULL.
+    """
+    n_prof = ds.sizes['N_PROF']
+    missing = np.full(n_prof, None, dtype=object)
+    columns = {
+        'platform_number': decode_char_array(ds.PLATFORM_NUMBER.values),
+        'cycle_number': _optional_ints(ds.CYCLE_NUMBER.values),
+        'juld': datetime_objects(convert_julian_days(ds.JULD.values, ref_date)),
+        'juld_location': datetime_objects(convert_julian_days(ds.JULD_LOCATION.values, ref_date)),
+        'latitude': _optional_floats(ds.LATITUDE.values),
+        'longitude': _optional_floats(ds.LONGITUDE.values),
+    }
+    for column, name in PROFILE_TEXT_VARIABLES.items():
+        columns[column] = decode_char_array(ds[name].values) if hasattr(ds, name) else missing
+    data_type = safe_decode(ds.DATA_TYPE.values.item()) if hasattr(ds, 'DATA_TYPE') else None
+    columns['data_type'] = np.full(n_prof, data_type, dtype=object)
+    columns['config_mission_number'] = (
+        _optional_ints(ds.CONFIG_MISSION_NUMBER.values) if hasattr(ds, 'CONFIG_MISSION_NUMBER') else missing
+    )
+
+    columns.update(profile_cells(mask_fill_values(ds.LATITUDE.values), mask_fill_values(ds.LONGITUDE.values)))
+
+    station_parameters = decode_char_array(ds.STATION_PARAMETERS.values)
+    columns['station_parameters'] = np.empty(n_prof, dtype=object)
+    for i, params in enumerate(station_parameters):
+        columns['station_parameters'][i] = [param for param in params if param]
+    return columns
+
+# FloatMetadata columns and the per-profile variables they are read from
+FLOAT_TEXT_VARIABLES = {
+    'wmo_inst_type': 'WMO_INST_TYPE',
+    'platform_type': 'PLATFORM_TYPE',
+    'float_serial_no': 'FLOAT_SERIAL_NO',
+    'firmware_version': 'FIRMWARE_VERSION',
+    'project_name': 'PROJECT_NAME',
+    'pi_name': 'PI_NAME',
+    'data_centre': 'DATA_CENTRE',
+    'dc_reference': 'DC_REFERENCE',
+    'data_state_indicator': 'DATA_STATE_INDICATOR',
+    'data_mode': 'DATA_MODE',
+    'positioning_system': 'POSITIONING_SYSTEM',
+    'vertical_sampling_scheme': 'VERTICAL_SAMPLING_SCHEME',
+}
+
+def extract_float_metadata(ds):
+    """Float metadata rows for every platform in the dataset, read from the platform's first profile.
+
+    PLATFORM_NUMBER is decoded once and np.unique gives each platform's first
+    profile index; the float-level variables are then read for those profiles only.
+    """
+    platforms = decode_char_array(ds.PLATFORM_NUMBER.values)
+    indices = np.nonzero((platforms != None) & (platforms != ''))[0]
+    unique_platforms, first = np.unique(platforms[indices].astype(str), return_index=True)
+    first_indices = indices[first]
+
+    columns = {'platform_number': unique_platforms.astype(object)}
+    for column, name in FLOAT_TEXT_VARIABLES.items():
+        if hasattr(ds, name):
+            columns[column] = decode_char_array(ds[name].isel(N_PROF=first_indices).values)
+        else:
+            columns[column] = np.full(len(first_indices), None, dtype=object)
+    return batch_records(columns)
+
+def register_float_metadata(session, float_rows, reingest=False):
+    """Insert the floats that are not in the database yet and return {platform_number: FloatMetadata}.
+
+    Uses INSERT ... ON CONFLICT, so concurrent ingesters never fail on the
+    float_metadata.platform_number unique constraint. Known floats are left as they
+    are, unless reingest is set and the row's data mode ranks higher than the
+    stored one (R < A < D), in which case the float row is replaced as well. The
+    caller commits.
+    """
+    if not float_rows:
+        return {}
+    statement = dialect_insert(session, FloatMetadata).values(float_rows)
+    if reingest:
+        statement = statement.on_conflict_do_update(
+            index_elements=['platform_number'],
+            set_={column: statement.excluded[column] for column in float_rows[0] if column != 'platform_number'},
+            where=data_mode_rank_sql(statement.excluded.data_mode) > data_mode_rank_sql(FloatMetadata.data_mode),
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=['platform_number'])
+    session.execute(statement)
+    # One query for all the file's floats, instead of one per platform
+    platforms = [row['platform_number'] for row in float_rows]
+    return {
+        float_meta.platform_number: float_meta
+        for float_meta in session.query(FloatMetadata).filter(FloatMetadata.platform_number.in_(platforms))
+    }
+
+def file_sha256(file_path, block_size=1024 * 1024):
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def open_manifest(session, file_path, profiles_total, file_hash=None):
+    """Return the manifest entry for this file's contents, creating it if needed.
+
+    Files are identified by content hash, so a renamed copy of an ingested file
+    is still recognised; file_hash is computed here unless the caller already
+    has it. ON CONFLICT DO NOTHING lets concurrent ingesters of the same file
+    share one entry. The caller commits.
+    """
+    file_hash = file_hash or file_sha256(file_path)
+    now = utc_now()
+    session.execute(
+        dialect_insert(session, IngestManifest).values(
+            file_hash=file_hash,
+            file_name=os.path.basename(file_path),
+            file_size=os.path.getsize(file_path),
+            status='in_progress',
+            profiles_total=profiles_total,
+            next_profile=0,
+            profiles_ingested=0,
+            started_at=now,
+            updated_at=now,
+        ).on_conflict_do_nothing(index_elements=['file_hash'])
+    )
+    return session.query(IngestManifest).filter(IngestManifest.file_hash == file_hash).one()
+
+def _mark_manifest_failed(manifest_id, error, engine=None):
+    """Record a failed ingest in its own session, since the ingest session was rolled back"""
+    session = sessionmaker(bind=engine)() if engine is not None else SessionLocal()
     try:
-        # Get reference date for Julian day conversion
-        ref_date_str = ds.REFERENCE_DATE_TIME.values.item()
-        if isinstance(ref_date_str, bytes):
-            ref_date_str = ref_date_str.decode('utf-8').strip()
-        ref_date = pd.to_datetime(ref_date_str, format='%Y%m%d%H%M%S', errors='coerce')
-        if pd.isna(ref_date):
-            ref_date = pd.Timestamp("1950-01-01")  # Default reference date
-        
-        # Process float metadata
-        print("Processing float metadata...")
-        platform_numbers = ds.PLATFORM_NUMBER.values
-        unique_platforms = np.unique([safe_decode(p) for p in platform_numbers])
-        
-        float_metadata_map = {}
-        for platform in unique_platforms:
-            if not platform:
-                continue
-                
-            # Check if this float already exists in the database
-            existing_float = session.query(FloatMetadata).filter_by(platform_number=platform).first()
-            if existing_float:
-                float_metadata_map[platform] = existing_float
-                continue
-                
-            # Find the first profile index for this platform
-            platform_idx = None
-            for i, p in enumerate(platform_numbers):
-                if safe_decode(p) == platform:
-                    platform_idx = i
-                    break
-                    
-            if platform_idx is not None:
-                float_meta = FloatMetadata(
-                    platform_number=platform,
-                    wmo_inst_type=safe_decode(ds.WMO_INST_TYPE.values[platform_idx]) if hasattr(ds, 'WMO_INST_TYPE') else None,
-                    platform_type=safe_decode(ds.PLATFORM_TYPE.values[platform_idx]) if hasattr(ds, 'PLATFORM_TYPE') else None,
-                    float_serial_no=safe_decode(ds.FLOAT_SERIAL_NO.values[platform_idx]) if hasattr(ds, 'FLOAT_SERIAL_NO') else None,
-                    firmware_version=safe_decode(ds.FIRMWARE_VERSION.values[platform_idx]) if hasattr(ds, 'FIRMWARE_VERSION') else None,
-                    project_name=safe_decode(ds.PROJECT_NAME.values[platform_idx]) if hasattr(ds, 'PROJECT_NAME') else None,
-                    pi_name=safe_decode(ds.PI_NAME.values[platform_idx]) if hasattr(ds, 'PI_NAME') else None,
-                    data_centre=safe_decode(ds.DATA_CENTRE.values[platform_idx]) if hasattr(ds, 'DATA_CENTRE') else None,
-                    dc_reference=safe_decode(ds.DC_REFERENCE.values[platform_idx]) if hasattr(ds, 'DC_REFERENCE') else None,
-                    data_state_indicator=safe_decode(ds.DATA_STATE_INDICATOR.values[platform_idx]) if hasattr(ds, 'DATA_STATE_INDICATOR') else None,
-                    data_mode=safe_decode(ds.DATA_MODE.values[platform_idx]) if hasattr(ds, 'DATA_MODE') else None,
-                    positioning_system=safe_decode(ds.POSITIONING_SYSTEM.values[platform_idx]) if hasattr(ds, 'POSITIONING_SYSTEM') else None,
-                    vertical_sampling_scheme=safe_decode(ds.VERTICAL_SAMPLING_SCHEME.values[platform_idx]) if hasattr(ds, 'VERTICAL_SAMPLING_SCHEME') else None,
+        manifest = session.get(IngestManifest, manifest_id)
+        if manifest is not None and manifest.status != 'completed':
+            manifest.status = 'failed'
+            manifest.error = f"{type(error).__name__}: {error}"
+            manifest.updated_at = utc_now()
+            session.commit()
+    except Exception as e:
+        print(f"⚠️ Warning: Could not update ingest manifest: {e}")
+    finally:
+        session.close()
+
+def _ingest_profiles(session, ds, ref_date, float_metadata_map, existing_profiles, mode, row_writer, embedder,
+                     reingest=False, metrics=None, mirror=None, storage='rows'):
+    """Ingest the profiles of one in-memory dataset slice.
+
+    Adds profile metadata, writes measurement (as rows, packed profile_levels
+    rows or both, per storage), profile_standard_levels, profile_summary,
+    calibration and history rows, merges the new levels into climatology_cube
+    and queues the profile summaries for embedding. existing_profiles maps
+    every known (platform, cycle) to its data mode and is updated with every
+    profile added. With reingest, a known profile is replaced when the incoming
+    data mode ranks higher, and its old levels are taken out of the cube. Time
+    and row counts go to metrics (an IngestMetrics), and the new profile and
+    measurement rows are queued on mirror (an AnalyticsMirror) if one is given.
+    Returns the number of profiles ingested.
+    """
+    metrics = metrics or IngestMetrics()
+    n_prof = ds.dims['N_PROF']
+    profiles_ingested = 0
+
+    if mode == 'vectorized':
+        # Decode every per-level variable once; rows are cut from these after the loop
+        with metrics.phase('decode'):
+            level_arrays = load_level_arrays(ds)
+            summary_stats = profile_summary_stats(level_arrays)
+            good = good_masks(level_arrays)
+            with metrics.phase('standard_levels'):
+                standard_arrays = standard_level_arrays(level_arrays, STANDARD_PRESSURE_LEVELS, good)
+            profile_columns = profile_metadata_columns(ds, ref_date)
+            profile_platforms = profile_columns['platform_number']
+            profile_cycles = profile_columns['cycle_number']
+            adjusted = adjusted_profiles(profile_columns['data_mode'])
+            with metrics.phase('best_values'):
+                best = best_level_arrays(level_arrays, adjusted, good)
+                # Cut into the measurement rows along with the stored variables
+                level_arrays.update(best_columns(best))
+            with metrics.phase('derived'):
+                derived = derived_variables(best, adjusted, standard_arrays, STANDARD_PRESSURE_LEVELS)
+
+    kept_profiles = []
+    profile_rows = []
+    replaced_keys = []
+    measurement_rows = []
+    summary_rows = []
+    standard_level_rows = []
+    calibration_rows = []
+
+    with metrics.phase('metadata'):
+        for i in range(n_prof):
+            if mode == 'vectorized':
+                profile_values = {column: values[i] for column, values in profile_columns.items()}
+            else:
+                # Get station parameters
+                station_params = []
+                for j in range(ds.dims['N_PARAM']):
+                    param = safe_decode(ds.STATION_PARAMETERS.values[i, j])
+                    if param and param != '':
+                        station_params.append(param)
+
+                profile_values = dict(
+                    platform_number=safe_decode(ds.PLATFORM_NUMBER.values[i]),
+                    cycle_number=int(ds.CYCLE_NUMBER.values[i]) if safe_float(ds.CYCLE_NUMBER.values[i]) is not None else None,
+                    direction=safe_decode(ds.DIRECTION.values[i]) if hasattr(ds, 'DIRECTION') else None,
+                    juld=convert_julian_day(ds.JULD.values[i], ref_date),
+                    juld_qc=safe_decode(ds.JULD_QC.values[i]) if hasattr(ds, 'JULD_QC') else None,
+                    juld_location=convert_julian_day(ds.JULD_LOCATION.values[i], ref_date),
+                    latitude=safe_float(ds.LATITUDE.values[i]),
+                    longitude=safe_float(ds.LONGITUDE.values[i]),
+                    position_qc=safe_decode(ds.POSITION_QC.values[i]) if hasattr(ds, 'POSITION_QC') else None,
+                    data_type=safe_decode(ds.DATA_TYPE.values.item()) if hasattr(ds, 'DATA_TYPE') else None,
+                    station_parameters=station_params,
+                    config_mission_number=int(ds.CONFIG_MISSION_NUMBER.values[i]) if hasattr(ds, 'CONFIG_MISSION_NUMBER') and safe_float(ds.CONFIG_MISSION_NUMBER.values[i]) is not None else None,
+                    profile_pres_qc=safe_decode(ds.PROFILE_PRES_QC.values[i]) if hasattr(ds, 'PROFILE_PRES_QC') else None,
+                    profile_temp_qc=safe_decode(ds.PROFILE_TEMP_QC.values[i]) if hasattr(ds, 'PROFILE_TEMP_QC') else None,
+                    profile_psal_qc=safe_decode(ds.PROFILE_PSAL_QC.values[i]) if hasattr(ds, 'PROFILE_PSAL_QC') else None,
+                    data_mode=safe_decode(ds.DATA_MODE.values[i]) if hasattr(ds, 'DATA_MODE') else None,
+                )
+                cells = profile_cells(
+                    [np.nan if profile_values['latitude'] is None else profile_values['latitude']],
+                    [np.nan if profile_values['longitude'] is None else profile_values['longitude']],
                 )
-                session.add(float_meta)
-                float_metadata_map[platform] = float_meta
+                profile_values.update(geohash=cells['geohash'][0], ocean_basin=cells['ocean_basin'][0])
+            platform = profile_values['platform_number']
+            cycle_number = profile_values['cycle_number']
         
-        session.commit()
+            # Check if profile already exists (in the database or earlier in this file)
+            profile_key = (platform, cycle_number)
+            if profile_key in existing_profiles:
+                existing_mode = existing_profiles[profile_key]
+                if not reingest or data_mode_rank(profile_values['data_mode']) <= data_mode_rank(existing_mode):
+                    print(f"Profile {platform}-{cycle_number} already exists, skipping...")
+                    metrics.count('profiles_skipped')
+                    continue
+                print(f"Profile {platform}-{cycle_number}: replacing data mode {existing_mode} with {profile_values['data_mode']}")
+                replaced_keys.append(profile_key)
+                metrics.count('profiles_replaced')
+            existing_profiles[profile_key] = profile_values['data_mode']
+            kept_profiles.append(i)
+            profiles_ingested += 1
         
-        # Process profile metadata and measurements
-        print("Processing profiles and measurements...")
-        n_prof = ds.dims['N_PROF']
+            profile_meta = ProfileMetadata(**profile_values)
+        
+            # With reingest, written below with one INSERT ... ON CONFLICT for the whole slice
+            profile_rows.append(profile_values)
+            if not reingest:
+                session.add(profile_meta)
         
-        for i in tqdm(range(n_prof), desc="Processing profiles"):
-            platform = safe_decode(ds.PLATFORM_NUMBER.values[i])
-            cycle_number = int(ds.CYCLE_NUMBER.values[i]) if safe_float(ds.CYCLE_NUMBER.values[i]) is not None else None
-            
-            # Process profile metadata
-            print(f"Processing profile {i}: JULD={ds.JULD.values[i]}, JULD_LOCATION={ds.JULD_LOCATION.values[i]}")
-            juld = convert_julian_day(ds.JULD.values[i], ref_date)
-            juld_location = convert_julian_day(ds.JULD_LOCATION.values[i], ref_date)
-            
-            # Get station parameters
-            station_params = []
-            for j in range(ds.dims['N_PARAM']):
-                param = safe_decode(ds.STATION_PARAMETERS.values[i, j])
-                if param and param != '':
-                    station_params.append(param)
-            
-            # Check if profile already exists
-            existing_profile = session.query(ProfileMetadata).filter_by(
-                platform_number=platform,
-                cycle_number=cycle_number
-            ).first()
-            
-            if existing_profile:
-                print(f"Profile {platform}-{cycle_number} already exists, skipping...")
-                continue
-            
-            profile_meta = ProfileMetadata(
-                platform_number=platform,
-                cycle_number=cycle_number,
-                direction=safe_decode(ds.DIRECTION.values[i]) if hasattr(ds, 'DIRECTION') else None,
-                juld=juld,
-                juld_qc=safe_decode(ds.JULD_QC.values[i]) if hasattr(ds, 'JULD_QC') else None,
-                juld_location=juld_location,
-                latitude=safe_float(ds.LATITUDE.values[i]),
-                longitude=safe_float(ds.LONGITUDE.values[i]),
-                position_qc=safe_decode(ds.POSITION_QC.values[i]) if hasattr(ds, 'POSITION_QC') else None,
-                data_type=safe_decode(ds.DATA_TYPE.values.item()) if hasattr(ds, 'DATA_TYPE') else None,
-                station_parameters=station_params,
-                config_mission_number=int(ds.CONFIG_MISSION_NUMBER.values[i]) if hasattr(ds, 'CONFIG_MISSION_NUMBER') and safe_float(ds.CONFIG_MISSION_NUMBER.values[i]) is not None else None,
-                profile_pres_qc=safe_decode(ds.PROFILE_PRES_QC.values[i]) if hasattr(ds, 'PROFILE_PRES_QC') else None,
-                profile_temp_qc=safe_decode(ds.PROFILE_TEMP_QC.values[i]) if hasattr(ds, 'PROFILE_TEMP_QC') else None,
-                profile_psal_qc=safe_decode(ds.PROFILE_PSAL_QC.values[i]) if hasattr(ds, 'PROFILE_PSAL_QC') else None,
-            )
-            
-            session.add(profile_meta)
-            session.flush()
-            
             # Process measurements for this profile
             n_levels = ds.dims['N_LEVELS']
             profile_measurements = []
-            for level in range(n_levels):
-                # Check if we have valid pressure data
-                pres_val = safe_float(ds.PRES.values[i, level])
-                if pres_val is None:
-                    continue
-                    
-                measurement = Measurement(
-                    platform_number=platform,
-                    cycle_number=cycle_number,
-                    pres=pres_val,
-                    pres_qc=safe_decode(ds.PRES_QC.values[i, level]) if hasattr(ds, 'PRES_QC') else None,
-                    temp=safe_float(ds.TEMP.values[i, level]) if hasattr(ds, 'TEMP') else None,
-                    temp_qc=safe_decode(ds.TEMP_QC.values[i, level]) if hasattr(ds, 'TEMP_QC') else None,
-                    temp_adjusted=safe_float(ds.TEMP_ADJUSTED.values[i, level]) if hasattr(ds, 'TEMP_ADJUSTED') else None,
-                    temp_adjusted_qc=safe_decode(ds.TEMP_ADJUSTED_QC.values[i, level]) if hasattr(ds, 'TEMP_ADJUSTED_QC') else None,
-                    temp_adjusted_error=safe_float(ds.TEMP_ADJUSTED_ERROR.values[i, level]) if hasattr(ds, 'TEMP_ADJUSTED_ERROR') else None,
-                    psal=safe_float(ds.PSAL.values[i, level]) if hasattr(ds, 'PSAL') else None,
-                    psal_qc=safe_decode(ds.PSAL_QC.values[i, level]) if hasattr(ds, 'PSAL_QC') else None,
-                    psal_adjusted=safe_float(ds.PSAL_ADJUSTED.values[i, level]) if hasattr(ds, 'PSAL_ADJUSTED') else None,
-                    psal_adjusted_qc=safe_decode(ds.PSAL_ADJUSTED_QC.values[i, level]) if hasattr(ds, 'PSAL_ADJUSTED_QC') else None,
-                    psal_adjusted_error=safe_float(ds.PSAL_ADJUSTED_ERROR.values[i, level]) if hasattr(ds, 'PSAL_ADJUSTED_ERROR') else None,
-                )
-                session.add(measurement)
-                profile_measurements.append(measurement)
-            
+            if mode == 'vectorized':
+                profile_stats = _profile_stats_at(summary_stats, i)
+            else:
+                with metrics.phase('measurements'):
+                    for level in range(n_levels):
+                        # Check if we have valid pressure data
+                        pres_val = safe_float(ds.PRES.values[i, level])
+                        if pres_val is None:
+                            continue
+                
+                        measurement = dict(
+                            platform_number=platform,
+                            cycle_number=cycle_number,
+                            juld=profile_values['juld'] if profile_values['juld'] is not None else UNDATED_JULD,
+                            pres=pres_val,
+                            pres_qc=safe_decode(ds.PRES_QC.values[i, level]) if hasattr(ds, 'PRES_QC') else None,
+                            temp=safe_float(ds.TEMP.values[i, level]) if hasattr(ds, 'TEMP') else None,
+                            temp_qc=safe_decode(ds.TEMP_QC.values[i, level]) if hasattr(ds, 'TEMP_QC') else None,
+                            temp_adjusted=safe_float(ds.TEMP_ADJUSTED.values[i, level]) if hasattr(ds, 'TEMP_ADJUSTED') else None,
+                            temp_adjusted_qc=safe_decode(ds.TEMP_ADJUSTED_QC.values[i, level]) if hasattr(ds, 'TEMP_ADJUSTED_QC') else None,
+                            temp_adjusted_error=safe_float(ds.TEMP_ADJUSTED_ERROR.values[i, level]) if hasattr(ds, 'TEMP_ADJUSTED_ERROR') else None,
+                            psal=safe_float(ds.PSAL.values[i, level]) if hasattr(ds, 'PSAL') else None,
+                            psal_qc=safe_decode(ds.PSAL_QC.values[i, level]) if hasattr(ds, 'PSAL_QC') else None,
+                            psal_adjusted=safe_float(ds.PSAL_ADJUSTED.values[i, level]) if hasattr(ds, 'PSAL_ADJUSTED') else None,
+                            psal_adjusted_qc=safe_decode(ds.PSAL_ADJUSTED_QC.values[i, level]) if hasattr(ds, 'PSAL_ADJUSTED_QC') else None,
+                            psal_adjusted_error=safe_float(ds.PSAL_ADJUSTED_ERROR.values[i, level]) if hasattr(ds, 'PSAL_ADJUSTED_ERROR') else None,
+                        )
+                        measurement_rows.append(measurement)
+                        profile_measurements.append(measurement)
+                with metrics.phase('best_values'):
+                    add_best_values(profile_measurements, profile_values['data_mode'])
+                with metrics.phase('summary'):
+                    profile_stats = profile_stats_from_rows(profile_measurements)
+            with metrics.phase('standard_levels'):
+                if mode == 'vectorized':
+                    standard_values = standard_levels_at(standard_arrays, i, STANDARD_PRESSURE_LEVELS)
+                else:
+                    standard_values = standard_levels_from_rows(profile_measurements, STANDARD_PRESSURE_LEVELS)
+            standard_level_rows.append(dict(platform_number=platform, cycle_number=cycle_number, **standard_values))
+            with metrics.phase('derived'):
+                if mode == 'vectorized':
+                    derived_values = derived_at(derived, i)
+                else:
+                    derived_values = derived_from_rows(
+                        profile_measurements, profile_values['data_mode'], standard_values, STANDARD_PRESSURE_LEVELS
+                    )
+            summary_rows.append(dict(platform_number=platform, cycle_number=cycle_number, **profile_stats, **derived_values))
+        
             # Get float metadata for this profile
             float_meta = float_metadata_map.get(platform)
-            
+        
             # Create ChromaDB entry for this profile
             summary_text, metadata = create_profile_summary(
                 profile_meta, 
                 profile_measurements, 
-                float_meta
+                float_meta,
+                stats=profile_stats
             )
-            
-            # MODERN: Use sentence-transformers with lazy loading
-            embedding_vector = get_embedding_model().encode(summary_text).tolist()
-            
-            # Add to batch
+        
+            # Encoded in batches on the embedding thread
             profile_id = f"{platform}_cycle_{cycle_number}"
-            chroma_ids.append(profile_id)
-            chroma_embeddings.append(embedding_vector)
-            chroma_metadatas.append(metadata)
-            chroma_documents.append(summary_text)
-            
-            # Process batch if reached size
-            if len(chroma_ids) >= chroma_batch_size:
-                try:
-                    collection = get_collection()
-                    collection.add(
-                        ids=chroma_ids,
-                        embeddings=chroma_embeddings,
-                        metadatas=chroma_metadatas,
-                        documents=chroma_documents
-                    )
-                    print(f"✓ Added batch of {len(chroma_ids)} profiles to ChromaDB")
-                    # Reset batch
-                    chroma_ids, chroma_embeddings, chroma_metadatas, chroma_documents = [], [], [], []
-                except Exception as e:
-                    print(f"⚠️ Warning: Failed to add batch to ChromaDB: {e}")
-                    # Reset batch to continue processing
-                    chroma_ids, chroma_embeddings, chroma_metadatas, chroma_documents = [], [], [], []
-            
+            # Blocks while the embedding thread is behind
+            with metrics.phase('embed_wait'):
+                embedder.submit(profile_id, summary_text, metadata)
+        
             # FIXED: Process calibration data with proper datetime handling
-            if hasattr(ds, 'PARAMETER') and hasattr(ds, 'SCIENTIFIC_CALIB_EQUATION'):
-                n_calib = ds.dims['N_CALIB']
-                n_param = ds.dims['N_PARAM']
-                
-                for calib_idx in range(n_calib):
-                    for param_idx in range(n_param):
-                        param = safe_decode(ds.PARAMETER.values[i, calib_idx, param_idx])
-                        if param and param != '':
-                            # FIXED: Properly handle calibration date with strict None checking
-                            calib_date = None
-                            if hasattr(ds, 'SCIENTIFIC_CALIB_DATE'):
-                                try:
-                                    calib_date_val = ds.SCIENTIFIC_CALIB_DATE.values[i, calib_idx, param_idx]
-                                    calib_date = safe_datetime(calib_date_val)
-                                    # Double-check that we don't have NaT
-                                    if calib_date is not None and pd.isna(calib_date):
+            # (the vectorized mode builds all calibration rows after the loop)
+            with metrics.phase('calibrations'):
+                if mode == 'legacy' and hasattr(ds, 'PARAMETER') and hasattr(ds, 'SCIENTIFIC_CALIB_EQUATION'):
+                    n_calib = ds.dims['N_CALIB']
+                    n_param = ds.dims['N_PARAM']
+            
+                    for calib_idx in range(n_calib):
+                        for param_idx in range(n_param):
+                            param = safe_decode(ds.PARAMETER.values[i, calib_idx, param_idx])
+                            if param and param != '':
+                                # FIXED: Properly handle calibration date with strict None checking
+                                calib_date = None
+                                if hasattr(ds, 'SCIENTIFIC_CALIB_DATE'):
+                                    try:
+                                        calib_date_val = ds.SCIENTIFIC_CALIB_DATE.values[i, calib_idx, param_idx]
+                                        calib_date = safe_datetime(calib_date_val)
+                                        # Double-check that we don't have NaT
+                                        if calib_date is not None and pd.isna(calib_date):
+                                            calib_date = None
+                                    except Exception as e:
+                                        print(f"Warning: Error processing calibration date: {e}")
                                         calib_date = None
-                                except Exception as e:
-                                    print(f"Warning: Error processing calibration date: {e}")
-                                    calib_date = None
-                            
-                            calib = Calibration(
-                                platform_number=platform,
-                                cycle_number=cycle_number,
-                                parameter=param,
-                                scientific_calib_equation=safe_decode(ds.SCIENTIFIC_CALIB_EQUATION.values[i, calib_idx, param_idx]) if hasattr(ds, 'SCIENTIFIC_CALIB_EQUATION') else None,
-                                scientific_calib_coefficient=safe_decode(ds.SCIENTIFIC_CALIB_COEFFICIENT.values[i, calib_idx, param_idx]) if hasattr(ds, 'SCIENTIFIC_CALIB_COEFFICIENT') else None,
-                                scientific_calib_comment=safe_decode(ds.SCIENTIFIC_CALIB_COMMENT.values[i, calib_idx, param_idx]) if hasattr(ds, 'SCIENTIFIC_CALIB_COMMENT') else None,
-                                scientific_calib_date=calib_date,
-                            )
-                            session.add(calib)
+                        
+                                calibration_rows.append(dict(
+                                    platform_number=platform,
+                                    cycle_number=cycle_number,
+                                    parameter=param,
+                                    scientific_calib_equation=safe_decode(ds.SCIENTIFIC_CALIB_EQUATION.values[i, calib_idx, param_idx]) if hasattr(ds, 'SCIENTIFIC_CALIB_EQUATION') else None,
+                                    scientific_calib_coefficient=safe_decode(ds.SCIENTIFIC_CALIB_COEFFICIENT.values[i, calib_idx, param_idx]) if hasattr(ds, 'SCIENTIFIC_CALIB_COEFFICIENT') else None,
+                                    scientific_calib_comment=safe_decode(ds.SCIENTIFIC_CALIB_COMMENT.values[i, calib_idx, param_idx]) if hasattr(ds, 'SCIENTIFIC_CALIB_COMMENT') else None,
+                                    scientific_calib_date=calib_date,
+                                ))
+    
+    # Cut the measurements of all new profiles from one columnar batch
+    batch = None
+    if mode == 'vectorized' and kept_profiles:
+        with metrics.phase('measurements'):
+            batch = measurement_batch(level_arrays, kept_profiles, profile_platforms, profile_cycles, profile_columns['juld'])
+            if storage != 'packed':
+                measurement_rows = batch_records(batch)
+        if hasattr(ds, 'PARAMETER') and hasattr(ds, 'SCIENTIFIC_CALIB_EQUATION'):
+            with metrics.phase('calibrations'):
+                calibration_rows = batch_records(calibration_batch(ds, kept_profiles, profile_platforms, profile_cycles))
+
+    replaced_cube_rows = []
+    with metrics.phase('metadata'):
+        if reingest:
+            if replaced_keys:
+                # Read while the replaced profiles' rows are still there; subtracted from the cube below
+                with metrics.phase('climatology'):
+                    replaced_cube_rows = stored_cube_rows(session, replaced_keys, sign=-1)
+            upsert_rows(session, ProfileMetadata, profile_rows, index_elements=['platform_number', 'cycle_number'])
+            if replaced_keys:
+                delete_profile_children(session, replaced_keys)
+        # Flush the profile rows here so the ORM flush is not charged to the measurements
+        session.flush()
+
+    with metrics.phase('measurements'):
+        if storage != 'packed':
+            row_writer.write(session, Measurement, measurement_rows)
+        if storage != 'rows' and kept_profiles:
+            if batch is None:
+                batch = records_batch(measurement_rows, MEASUREMENT_BATCH_COLUMNS)
+            packed_rows = packed_level_rows(batch)
+            row_writer.write(session, ProfileLevels, packed_rows)
+            metrics.count('packed_profiles', len(packed_rows))
+    with metrics.phase('summary'):
+        row_writer.write(session, ProfileSummary, summary_rows)
+    with metrics.phase('standard_levels'):
+        row_writer.write(session, ProfileStandardLevels, standard_level_rows)
+    with metrics.phase('calibrations'):
+        row_writer.write(session, Calibration, calibration_rows)
+    with metrics.phase('climatology'):
+        level_batch = batch if batch is not None else records_batch(measurement_rows, MEASUREMENT_BATCH_COLUMNS)
+        new_cube_rows = cube_rows(level_batch, profile_rows)
+        add_to_cube(session, replaced_cube_rows)
+        add_to_cube(session, new_cube_rows)
+        if replaced_cube_rows:
+            drop_empty_cells(session)
+    metrics.count('measurement_rows', len(batch['pres']) if batch is not None else len(measurement_rows))
+    metrics.count('calibration_rows', len(calibration_rows))
+    if mirror is not None:
+        # The columnar batch saves re-reading the row dicts in vectorized mode
+        mirror.add(profile_rows, batch if batch is not None else measurement_rows)
+
+    # FIXED: Process history data with proper datetime handling
+    # History is only written for the profiles ingested above, and blank slots are skipped
+    if hasattr(ds, 'HISTORY_INSTITUTION') and ds.dims['N_HISTORY'] > 0 and kept_profiles:
+        n_history = ds.dims['N_HISTORY']
+        print(f"Processing {n_history} history records...")
+
+        with metrics.phase('history'):
+            if mode == 'vectorized':
+                history_rows = batch_records(history_batch(ds, kept_profiles, profile_platforms, profile_cycles))
+            else:
+                history_rows = []
+                for hist_idx in range(n_history):
+                    for prof_idx in kept_profiles:
+                        platform_hist = safe_decode(ds.PLATFORM_NUMBER.values[prof_idx])
+                        cycle_hist = int(ds.CYCLE_NUMBER.values[prof_idx]) if safe_float(ds.CYCLE_NUMBER.values[prof_idx]) is not None else None
+                
+                        # FIXED: Safely handle datetime conversion for history date
+                        history_date = None
+                        if hasattr(ds, 'HISTORY_DATE'):
+                            try:
+                                history_date_val = ds.HISTORY_DATE.values[hist_idx, prof_idx]
+                                history_date = safe_datetime(history_date_val)
+                                # Double-check that we don't have NaT
+                                if history_date is not None and pd.isna(history_date):
+                                    history_date = None
+                            except Exception as e:
+                                print(f"Warning: Error processing history date: {e}")
+                                history_date = None
+                
+                        history_row = dict(
+                            platform_number=platform_hist,
+                            cycle_number=cycle_hist,
+                            history_institution=safe_decode(ds.HISTORY_INSTITUTION.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_INSTITUTION') else None,
+                            history_step=safe_decode(ds.HISTORY_STEP.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_STEP') else None,
+                            history_software=safe_decode(ds.HISTORY_SOFTWARE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_SOFTWARE') else None,
+                            history_software_release=safe_decode(ds.HISTORY_SOFTWARE_RELEASE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_SOFTWARE_RELEASE') else None,
+                            history_reference=safe_decode(ds.HISTORY_REFERENCE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_REFERENCE') else None,
+                            history_date=history_date,
+                            history_action=safe_decode(ds.HISTORY_ACTION.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_ACTION') else None,
+                            history_parameter=safe_decode(ds.HISTORY_PARAMETER.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_PARAMETER') else None,
+                            history_start_pres=safe_float(ds.HISTORY_START_PRES.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_START_PRES') else None,
+                            history_stop_pres=safe_float(ds.HISTORY_STOP_PRES.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_STOP_PRES') else None,
+                            history_previous_value=safe_float(ds.HISTORY_PREVIOUS_VALUE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_PREVIOUS_VALUE') else None,
+                            history_qctest=safe_decode(ds.HISTORY_QCTEST.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_QCTEST') else None,
+                        )
+                        fields = [value for key, value in history_row.items() if key not in ('platform_number', 'cycle_number')]
+                        if any(value is not None and value != '' for value in fields):
+                            history_rows.append(history_row)
+
+            row_writer.write(session, ProcessingHistory, history_rows)
+        metrics.count('history_rows', len(history_rows))
+
+    return profiles_ingested
+
+def process_netcdf(file_path, mode=None, writer=None, embedding_batch_size=None, engine=None, chroma_collection=None,
+                   chunk_size=None, progress_callback=None, reingest=False, mirror_directory=None, storage=None,
+                   file_hash=None):
+    """Ingest an ARGO profile NetCDF file into Postgres and ChromaDB.
+
+    mode selects how measurements are extracted: "vectorized" (default, from
+    NETCDF_INGEST_MODE) loads whole arrays and masks them in bulk, "legacy" walks
+    every profile and level in Python. Both produce the same rows.
+
+    writer selects how measurement, calibration and history rows are written:
+    "orm" (session.add per row) or "bulk" (COPY / batched INSERT), defaulting
+    to NETCDF_INGEST_WRITER.
+
+    storage selects where measurements go (default MEASUREMENT_STORAGE): "rows"
+    writes one measurements row per level, "packed" one profile_levels row of
+    float4 arrays per profile, "both" writes both.
+
+    Profile summaries are encoded in batches of embedding_batch_size (default
+    EMBEDDING_BATCH_SIZE) on a background thread while rows are written, and added
+    to chroma_collection (default: the local persistent collection).
+
+    The file is read in slices of chunk_size profiles (default NETCDF_CHUNK_PROFILES,
+    0 for the whole file at once). Each slice is loaded, written and committed before
+    the next one is read, so peak memory is bounded by the slice, not the file.
+
+    Every file is recorded in ingest_manifest by content hash. A file that was
+    already ingested completely is skipped straight away. Each slice commit also
+    moves the manifest checkpoint, so an interrupted ingest resumes at the first
+    uncommitted profile instead of re-reading and re-embedding the whole file.
+    Callers that hashed the file while writing or reading it pass the SHA-256 as
+    file_hash, so it is not read again just to be hashed.
+
+    With reingest, profiles that already exist are replaced when the file's data
+    mode ranks higher (R < A < D): the profile row is upserted with INSERT ...
+    ON CONFLICT on uix_profile_platform_cycle, its measurement, calibration and
+    history rows are replaced, and its ChromaDB entry is upserted. A completed
+    manifest entry does not stop a reingest.
+
+    After each slice commit, its profiles and measurements are also written to
+    the Parquet analytics mirror in mirror_directory (default
+    ANALYTICS_MIRROR_DIRECTORY; none when empty). A failed mirror write only
+    logs a warning: the mirror can be rebuilt from the database.
+
+    progress_callback, if given, is called after every committed slice as
+    progress_callback(profiles_done, profiles_total, rows_per_sec).
+
+    engine overrides the module-level engine, e.g. for worker processes.
+    Returns profile counts, the writer's rows/sec report, the embedding throughput
+    and under "metrics" the IngestMetrics report: seconds per phase (decode,
+    metadata, measurements, calibrations, history, embed, chroma, commit, ...),
+    row counters and peak memory. The report is also kept for /api/metrics.
+    """
+    mode = mode or NETCDF_INGEST_MODE
+    if mode not in ('vectorized', 'legacy'):
+        raise ValueError(f"Unknown ingestion mode: {mode}")
+    storage = storage or MEASUREMENT_STORAGE
+    if storage not in ('rows', 'packed', 'both'):
+        raise ValueError(f"Unknown measurement storage: {storage}")
+    row_writer = get_row_writer(writer or NETCDF_INGEST_WRITER)
+    metrics = IngestMetrics(label=os.path.basename(file_path)).start()
+
+    # cache=False: variables are read per slice instead of being kept in memory whole
+    try:
+        with metrics.phase('decode'):
+            ds = xr.open_dataset(file_path, cache=False)
+    except Exception:
+        metrics.stop()
+        raise
+    session = sessionmaker(bind=engine)() if engine is not None else SessionLocal()
+    
+    # Batch processing for ChromaDB
+    chroma_batch_size = 100
+    embedder = EmbeddingPipeline(
+        get_embedding_model,
+        (lambda: chroma_collection) if chroma_collection is not None else get_collection,
+        batch_size=embedding_batch_size or EMBEDDING_BATCH_SIZE,
+        chroma_batch_size=chroma_batch_size,
+        upsert=reingest,
+        metrics=metrics,
+    ).start()
+    mirror_directory = mirror_directory if mirror_directory is not None else ANALYTICS_MIRROR_DIRECTORY
+    mirror = AnalyticsMirror(mirror_directory) if mirror_directory else None
+    manifest_id = None
+    
+    try:
+        started = time.perf_counter()
+        n_prof = ds.dims['N_PROF']
+
+        with metrics.phase('manifest'):
+            manifest = open_manifest(session, file_path, n_prof, file_hash=file_hash)
+            manifest_id = manifest.id
+            session.commit()
+            if manifest.status == 'completed' and reingest:
+                manifest.status = 'in_progress'
+                manifest.next_profile = 0
+                manifest.profiles_ingested = 0
+                session.commit()
+        if manifest.status == 'completed':
+            print(f"⏭️ {os.path.basename(file_path)} was already ingested (manifest {manifest.file_hash[:12]}), skipping")
+            embedder.close()
+            report = metrics.report()
+            report["status"] = "skipped"
+            record_ingest(report)
+            return {
+                "profiles_total": n_prof,
+                "profiles_ingested": 0,
+                "skipped": True,
+                "rows": {},
+                "embeddings": {},
+                "metrics": report,
+            }
+        resume_from = manifest.next_profile or 0
+        if resume_from:
+            print(f"🔁 Resuming {os.path.basename(file_path)} at profile {resume_from}/{n_prof}")
+
+        # Get reference date for Julian day conversion
+        ref_date_str = ds.REFERENCE_DATE_TIME.values.item()
+        if isinstance(ref_date_str, bytes):
+            ref_date_str = ref_date_str.decode('utf-8').strip()
+        ref_date = pd.to_datetime(ref_date_str, format=ARGO_DATE_FORMAT, errors='coerce')
+        if pd.isna(ref_date):
+            ref_date = pd.Timestamp("1950-01-01")  # Default reference date
         
-        # Process any remaining items in the batch
-        if chroma_ids:
-            try:
-                collection = get_collection()
-                collection.add(
-                    ids=chroma_ids,
-                    embeddings=chroma_embeddings,
-                    metadatas=chroma_metadatas,
-                    documents=chroma_documents
-                )
-                print(f"✓ Added final batch of {len(chroma_ids)} profiles to ChromaDB")
-            except Exception as e:
-                print(f"⚠️ Warning: Failed to add final batch to ChromaDB: {e}")
+        # Process float metadata
+        print("Processing float metadata...")
+        with metrics.phase('metadata'):
+            float_rows = extract_float_metadata(ds)
+            unique_platforms = [row['platform_number'] for row in float_rows]
+            float_metadata_map = register_float_metadata(session, float_rows, reingest=reingest)
         
-        # FIXED: Process history data with proper datetime handling
-        if hasattr(ds, 'HISTORY_INSTITUTION') and ds.dims['N_HISTORY'] > 0:
-            n_history = ds.dims['N_HISTORY']
-            print(f"Processing {n_history} history records...")
-            
-            for hist_idx in range(n_history):
-                for prof_idx in range(n_prof):
-                    platform_hist = safe_decode(ds.PLATFORM_NUMBER.values[prof_idx])
-                    cycle_hist = int(ds.CYCLE_NUMBER.values[prof_idx]) if safe_float(ds.CYCLE_NUMBER.values[prof_idx]) is not None else None
-                    
-                    # FIXED: Safely handle datetime conversion for history date
-                    history_date = None
-                    if hasattr(ds, 'HISTORY_DATE'):
+        with metrics.phase('commit'):
+            session.commit()
+        
+        # Fetch every existing (platform, cycle) key and its data mode for this file's
+        # floats in one query; duplicates are then filtered in memory
+        with metrics.phase('metadata'):
+            existing_profiles = {
+                (platform, cycle_number): data_mode
+                for platform, cycle_number, data_mode in session.query(
+                    ProfileMetadata.platform_number, ProfileMetadata.cycle_number, ProfileMetadata.data_mode
+                ).filter(ProfileMetadata.platform_number.in_(unique_platforms))
+            }
+
+        # Process profile metadata and measurements, one N_PROF slice at a time
+        print("Processing profiles and measurements...")
+        chunk_size = chunk_size if chunk_size is not None else NETCDF_CHUNK_PROFILES
+        chunk_size = chunk_size if chunk_size > 0 else max(n_prof, 1)
+        profiles_ingested = 0
+
+        with tqdm(total=n_prof, initial=resume_from, desc="Processing profiles") as progress:
+            for start in range(resume_from, n_prof, chunk_size):
+                stop = min(start + chunk_size, n_prof)
+                # Only this slice is read from disk, and it is released before the next one
+                with metrics.phase('decode'):
+                    chunk = ds.isel(N_PROF=slice(start, stop)).load()
+                try:
+                    profiles_ingested_slice = _ingest_profiles(
+                        session, chunk, ref_date, float_metadata_map, existing_profiles,
+                        mode, row_writer, embedder, reingest=reingest, metrics=metrics, mirror=mirror,
+                        storage=storage
+                    )
+                    profiles_ingested += profiles_ingested_slice
+                finally:
+                    chunk.close()
+                    del chunk
+
+                # The checkpoint only moves once the slice's summaries are in ChromaDB,
+                # and it is committed together with the slice's rows
+                with metrics.phase('embed_wait'):
+                    embedder.flush()
+                manifest.next_profile = stop
+                manifest.profiles_ingested = manifest.profiles_ingested + profiles_ingested_slice
+                manifest.updated_at = utc_now()
+                with metrics.phase('commit'):
+                    session.commit()
+                if mirror is not None:
+                    with metrics.phase('mirror'):
                         try:
-                            history_date_val = ds.HISTORY_DATE.values[hist_idx, prof_idx]
-                            history_date = safe_datetime(history_date_val)
-                            # Double-check that we don't have NaT
-                            if history_date is not None and pd.isna(history_date):
-                                history_date = None
+                            metrics.count('mirror_rows', mirror.flush())
                         except Exception as e:
-                            print(f"Warning: Error processing history date: {e}")
-                            history_date = None
-                    
-                    history = ProcessingHistory(
-                        platform_number=platform_hist,
-                        cycle_number=cycle_hist,
-                        history_institution=safe_decode(ds.HISTORY_INSTITUTION.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_INSTITUTION') else None,
-                        history_step=safe_decode(ds.HISTORY_STEP.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_STEP') else None,
-                        history_software=safe_decode(ds.HISTORY_SOFTWARE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_SOFTWARE') else None,
-                        history_software_release=safe_decode(ds.HISTORY_SOFTWARE_RELEASE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_SOFTWARE_RELEASE') else None,
-                        history_reference=safe_decode(ds.HISTORY_REFERENCE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_REFERENCE') else None,
-                        history_date=history_date,
-                        history_action=safe_decode(ds.HISTORY_ACTION.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_ACTION') else None,
-                        history_parameter=safe_decode(ds.HISTORY_PARAMETER.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_PARAMETER') else None,
-                        history_start_pres=safe_float(ds.HISTORY_START_PRES.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_START_PRES') else None,
-                        history_stop_pres=safe_float(ds.HISTORY_STOP_PRES.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_STOP_PRES') else None,
-                        history_previous_value=safe_float(ds.HISTORY_PREVIOUS_VALUE.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_PREVIOUS_VALUE') else None,
-                        history_qctest=safe_decode(ds.HISTORY_QCTEST.values[hist_idx, prof_idx]) if hasattr(ds, 'HISTORY_QCTEST') else None,
-                    )
-                    session.add(history)
+                            print(f"⚠️ Warning: Failed to write analytics mirror (rebuild with analytics_mirror.py --rebuild): {e}")
+                            metrics.count('mirror_failed_slices')
+                metrics.count('slices')
+                progress.update(stop - start)
+
+                if progress_callback is not None:
+                    elapsed = time.perf_counter() - started
+                    rows_per_sec = row_writer.rows_written / elapsed if elapsed > 0 else None
+                    progress_callback(stop, n_prof, rows_per_sec)
+
+        # Wait for the remaining summaries, so an encoding failure fails the ingest
+        with metrics.phase('embed_wait'):
+            embedding_report = embedder.close()
+
+        manifest.status = 'completed'
+        manifest.error = None
+        manifest.completed_at = manifest.updated_at = utc_now()
+        with metrics.phase('commit'):
+            session.commit()
         
-        session.commit()
         print("✅ NetCDF processing complete!")
         print(f"📊 ChromaDB data stored locally in: {CHROMA_PERSIST_DIRECTORY}")
+        metrics.count('profiles_ingested', profiles_ingested)
+        report = metrics.report()
+        report["status"] = "completed"
+        record_ingest(report)
+        metrics.print_report(report)
+        return {
+            "profiles_total": n_prof,
+            "profiles_ingested": profiles_ingested,
+            "rows": row_writer.report(),
+            "embeddings": embedding_report,
+            "metrics": report,
+        }
         
     except Exception as e:
+        embedder.abort()
+        report = metrics.report()
+        report["status"] = "failed"
+        record_ingest(report)
         session.rollback()
+        if manifest_id is not None:
+            _mark_manifest_failed(manifest_id, e, engine=engine)
         print(f"❌ Error processing NetCDF file: {e}")
         raise e
         
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Grid cells and ocean basins for profile positions.
+
+Every profile_metadata row gets a geohash of its position (GEOHASH_PRECISION
+characters) and an ocean_basin tag. A geohash prefix is the cell at a coarser
+resolution, and the prefixes of GEOHASH_INDEX_PRECISIONS characters are
+indexed, so a region becomes an indexed lookup:
+
+    WHERE substr(geohash, 1, 3) = ANY(ARRAY['tmq', 'tmr', ...])
+
+region_cells() turns a basin or a named sea into such a cell set. Basins are
+coarse polygons whose shared edges run over land, so they partition the sea
+between 60S and 65N; the Southern and Arctic Oceans are the bands beyond.
+Everything here works on whole arrays of positions.
+
+Rows ingested before these columns existed are filled in with:
+
+    python ocean_regions.py --backfill
+"""
+
+import argparse
+
+import numpy as np
+
+GEOHASH_PRECISION = 6
+GEOHASH_INDEX_PRECISIONS = (2, 3, 4)
+GEOHASH_ALPHABET = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+
+# Largest cell set region_cells() returns before falling back to a coarser precision
+MAX_REGION_CELLS = 256
+
+# Shared basin boundaries as (lon, lat) vertices, all over land or along a meridian.
+# Atlantic / Pacific: Drake Passage at Cape Horn, then up through the Americas
+AMERICAS = [
+    (-67.3, -60), (-67.3, -56), (-72, -50), (-71, -40), (-70, -30), (-70, -18), (-76, -10), (-79, -3),
+    (-76.5, 3), (-77.2, 7.5), (-79.7, 9.1), (-84, 10), (-85.5, 12.5), (-89.5, 15), (-94.8, 17),
+    (-100, 20), (-103, 25), (-105, 32), (-105, 35), (-100, 50), (-100, 65),
+]
+# Atlantic / Indian: Cape Agulhas meridian, then up through Africa, Suez and Turkey
+AFRICA_ASIA = [
+    (20, -60), (20, -34.8), (25, -20), (30, 0), (32.4, 30.5), (36, 33), (44, 38), (44, 45),
+]
+# Indian / Pacific: Tasmania meridian, then Australia, the Sunda Islands, Singapore and Kra
+AUSTRALIA_ASIA = [
+    (146.9, -60), (146.9, -43.6), (140, -25), (127, -14), (127.3, -8.4), (120, -8.7), (114, -8),
+    (106, -6.5), (104, -5), (103.5, 0.5), (104, 1.3), (103, 4), (99, 10.5), (100, 20), (100, 45),
+]
+# Atlantic / Pacific across northern Asia, up to the Arctic
+NORTH_ASIA = [(100, 45), (100, 65)]
+
+
+def _east(vertices):
+    """Vertices shifted into the 0..360 longitude frame"""
+    return [(lon % 360, lat) for lon, lat in vertices]
+
+
+# Polygons may use longitudes up to 360; points are tested at lon and lon + 360
+BASIN_POLYGONS = {
+    "Atlantic Ocean": AFRICA_ASIA + NORTH_ASIA + AMERICAS[::-1],
+    "Indian Ocean": AFRICA_ASIA[::-1] + AUSTRALIA_ASIA,
+    "Pacific Ocean": _east(AMERICAS) + NORTH_ASIA[1:] + AUSTRALIA_ASIA[::-1],
+}
+SOUTHERN_OCEAN_MAX_LAT = -60.0
+ARCTIC_OCEAN_MIN_LAT = 65.0
+OCEAN_BASINS = ["Atlantic Ocean", "Pacific Ocean", "Indian Ocean", "Southern Ocean", "Arctic Ocean"]
+
+# Named seas as (lat_min, lat_max, lon_min, lon_max); lon_min > lon_max crosses the antimeridian
+REGIONS = {
+    "Arabian Sea": (0, 25, 50, 78),
+    "Bay of Bengal": (5, 23, 80, 95),
+    "Andaman Sea": (5, 17, 92, 99),
+    "Equatorial Indian Ocean": (-10, 10, 40, 100),
+    "Mediterranean Sea": (30, 46, -6, 36),
+    "Caribbean Sea": (9, 22, -88, -60),
+    "Gulf of Mexico": (18, 31, -98, -80),
+    "North Atlantic": (0, 65, -80, 0),
+    "South Atlantic": (-60, 0, -70, 20),
+    "North Pacific": (0, 65, 120, -100),
+    "South Pacific": (-60, 0, 150, -70),
+    "Tasman Sea": (-45, -30, 150, 175),
+    "South China Sea": (0, 23, 105, 121),
+}
+
+
+def geohash_encode(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    """Geohashes of arrays of positions; None where the position is missing"""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    missing = np.isnan(latitudes) | np.isnan(longitudes)
+    n_bits = 5 * precision
+    lon_bits = (n_bits + 1) // 2
+    lat_bits = n_bits // 2
+
+    def cell_index(values, low, high, bits):
+        scaled = np.floor((np.nan_to_num(values) - low) / (high - low) * (1 << bits))
+        return np.clip(scaled, 0, (1 << bits) - 1).astype(np.int64)
+
+    lon_index = cell_index(((longitudes + 180.0) % 360.0) - 180.0, -180.0, 180.0, lon_bits)
+    lat_index = cell_index(latitudes, -90.0, 90.0, lat_bits)
+    # Interleave the bits, longitude first
+    code = np.zeros(latitudes.shape, dtype=np.int64)
+    for bit in range(n_bits):
+        if bit % 2 == 0:
+            value = (lon_index >> (lon_bits - 1 - bit // 2)) & 1
+        else:
+            value = (lat_index >> (lat_bits - 1 - bit // 2)) & 1
+        code = (code << 1) | value
+    characters = np.stack(
+        [GEOHASH_ALPHABET[(code >> (5 * (precision - 1 - k))) & 31] for k in range(precision)], axis=-1
+    )
+    hashes = np.ascontiguousarray(characters).view(f"<U{precision}")[..., 0].astype(object)
+    hashes[missing] = None
+    return hashes
+
+
+def geohash_cell_centers(precision):
+    """Every geohash cell of a precision, with its center latitudes and longitudes"""
+    n_bits = 5 * precision
+    lon_bits = (n_bits + 1) // 2
+    lat_bits = n_bits // 2
+    lon_index, lat_index = np.meshgrid(np.arange(1 << lon_bits), np.arange(1 << lat_bits))
+    longitudes = -180.0 + (lon_index.ravel() + 0.5) * 360.0 / (1 << lon_bits)
+    latitudes = -90.0 + (lat_index.ravel() + 0.5) * 180.0 / (1 << lat_bits)
+    return geohash_encode(latitudes, longitudes, precision), latitudes, longitudes
+
+
+def points_in_polygon(latitudes, longitudes, polygon):
+    """Crossing-number test of arrays of points against one (lon, lat) polygon"""
+    vertices = np.asarray(polygon, dtype=np.float64)
+    x1, y1 = vertices[:, 0], vertices[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    x = np.asarray(longitudes, dtype=np.float64)[:, None]
+    y = np.asarray(latitudes, dtype=np.float64)[:, None]
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < crossing_x)
+    return crossings.sum(axis=1) % 2 == 1
+
+
+def ocean_basins(latitudes, longitudes):
+    """Ocean basin names of arrays of positions (land counts as the basin around it); None where missing"""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = ((np.asarray(longitudes, dtype=np.float64) + 180.0) % 360.0) - 180.0
+    basins = np.full(latitudes.shape, None, dtype=object)
+    known = ~(np.isnan(latitudes) | np.isnan(longitudes))
+    southern = known & (latitudes < SOUTHERN_OCEAN_MAX_LAT)
+    arctic = known & (latitudes > ARCTIC_OCEAN_MIN_LAT)
+    basins[southern] = "Southern Ocean"
+    basins[arctic] = "Arctic Ocean"
+    untagged = known & ~southern & ~arctic
+    for name, polygon in BASIN_POLYGONS.items():
+        todo = np.flatnonzero(untagged)
+        if len(todo) == 0:
+            break
+        inside = points_in_polygon(latitudes[todo], longitudes[todo], polygon)
+        inside |= points_in_polygon(latitudes[todo], longitudes[todo] + 360.0, polygon)
+        basins[todo[inside]] = name
+        untagged[todo[inside]] = False
+    return basins
+
+
+def profile_cells(latitudes, longitudes):
+    """{'geohash': ..., 'ocean_basin': ...} arrays for ProfileMetadata rows"""
+    return {
+        "geohash": geohash_encode(latitudes, longitudes),
+        "ocean_basin": ocean_basins(latitudes, longitudes),
+    }
+
+
+def _box_cells(box, precision):
+    """Geohash cells of one precision that overlap a (lat_min, lat_max, lon_min, lon_max) box"""
+    lat_min, lat_max, lon_min, lon_max = box
+    n_bits = 5 * precision
+    lon_cells = 1 << ((n_bits + 1) // 2)
+    lat_cells = 1 << (n_bits // 2)
+
+    def index_range(low, high, start, span, n_cells):
+        first = int(np.clip(np.floor((low - start) / span * n_cells), 0, n_cells - 1))
+        last = int(np.clip(np.ceil((high - start) / span * n_cells) - 1, 0, n_cells - 1))
+        return np.arange(first, last + 1)
+
+    lat_index = index_range(lat_min, lat_max, -90.0, 180.0, lat_cells)
+    if lon_min <= lon_max:
+        lon_index = index_range(lon_min, lon_max, -180.0, 360.0, lon_cells)
+    else:
+        # Across the antimeridian: lon_min..180 and -180..lon_max
+        lon_index = np.concatenate([
+            index_range(lon_min, 180.0, -180.0, 360.0, lon_cells),
+            index_range(-180.0, lon_max, -180.0, 360.0, lon_cells),
+        ])
+    lon_grid, lat_grid = np.meshgrid(lon_index, lat_index)
+    longitudes = -180.0 + (lon_grid.ravel() + 0.5) * 360.0 / lon_cells
+    latitudes = -90.0 + (lat_grid.ravel() + 0.5) * 180.0 / lat_cells
+    return geohash_encode(latitudes, longitudes, precision)
+
+
+def region_cells(region, precision=None):
+    """Resolve a basin or named sea to the geohash cells covering it.
+
+    A basin's cells are those whose center lies in the basin, at the coarsest
+    indexed precision unless one is given. A sea's cells are those overlapping
+    its box, at the finest indexed precision that needs at most MAX_REGION_CELLS
+    cells. Returns a dict with the cells, the precision and a SQL predicate on
+    profile_metadata.
+    """
+    names = {name.lower(): name for name in OCEAN_BASINS + list(REGIONS)}
+    name = names.get(region.strip().lower())
+    if name is None:
+        raise ValueError(f"Unknown region {region!r}; known regions: {', '.join(OCEAN_BASINS + list(REGIONS))}")
+
+    if name in OCEAN_BASINS:
+        precision = precision or min(GEOHASH_INDEX_PRECISIONS)
+        cells, latitudes, longitudes = geohash_cell_centers(precision)
+        selected = cells[ocean_basins(latitudes, longitudes) == name]
+    else:
+        for candidate in ([precision] if precision else sorted(GEOHASH_INDEX_PRECISIONS, reverse=True)):
+            selected = _box_cells(REGIONS[name], candidate)
+            if len(selected) <= MAX_REGION_CELLS:
+                break
+        precision = candidate
+
+    selected = sorted(selected)
+    cell_list = ", ".join(f"'{cell}'" for cell in selected)
+    result = {
+        "region": name,
+        "precision": precision,
+        "cells": selected,
+        "sql": f"substr(geohash, 1, {precision}) = ANY(ARRAY[{cell_list}])",
+    }
+    if name in OCEAN_BASINS:
+        # The stored tag is exact for every profile, and indexed too
+        result["sql"] = f"ocean_basin = '{name}'"
+    else:
+        lat_min, lat_max, lon_min, lon_max = REGIONS[name]
+        result["box"] = {"lat_min": lat_min, "lat_max": lat_max, "lon_min": lon_min, "lon_max": lon_max}
+    return result
+
+
+def backfill(engine, batch_size=10000):
+    """Fill geohash and ocean_basin of profile_metadata rows that have a position but no cell yet"""
+    from sqlalchemy import bindparam, select, update
+    from sqlalchemy.orm import sessionmaker
+
+    from models import ProfileMetadata
+
+    session = sessionmaker(bind=engine)()
+    total = 0
+    last_id = 0
+    try:
+        while True:
+            rows = session.execute(
+                select(ProfileMetadata.id, ProfileMetadata.latitude, ProfileMetadata.longitude)
+                .where(ProfileMetadata.id > last_id, ProfileMetadata.geohash.is_(None))
+                .where(ProfileMetadata.latitude.is_not(None), ProfileMetadata.longitude.is_not(None))
+                .order_by(ProfileMetadata.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            ids, latitudes, longitudes = zip(*rows)
+            cells = profile_cells(np.array(latitudes, dtype=np.float64), np.array(longitudes, dtype=np.float64))
+            session.connection().execute(
+                update(ProfileMetadata.__table__)
+                .where(ProfileMetadata.__table__.c.id == bindparam("row_id"))
+                .values(geohash=bindparam("geohash"), ocean_basin=bindparam("ocean_basin")),
+                [
+                    {"row_id": row_id, "geohash": geohash, "ocean_basin": basin}
+                    for row_id, geohash, basin in zip(ids, cells["geohash"], cells["ocean_basin"])
+                ],
+            )
+            session.commit()
+            total += len(rows)
+            last_id = ids[-1]
+            print(f"  - tagged {total} profiles")
+    finally:
+        session.close()
+    print(f"✅ Grid cells and ocean basins filled in for {total} profiles")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geohash cells and ocean basins of ARGO profiles")
+    parser.add_argument("--backfill", action="store_true", help="tag profile_metadata rows without a geohash")
+    parser.add_argument("--region", help="print the cell set of a basin or named sea")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        from config import engine
+        backfill(engine)
+    if args.region:
+        result = region_cells(args.region)
+        print(f"{result['region']}: {len(result['cells'])} cells at precision {result['precision']}")
+        print(result["sql"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -338,6 +338,15 @@ def run_crewai_pipeline(query: str, verbose: bool = True, session_id: str = None
             description=(
                 "Perform a SIMPLE LOOKUP based on the user's request using MCP DB tools for user query {query}. "
                 "Prefer small aggregates such as COUNT(*), MIN/MAX, AVG by cycle if relevant. "
+                "In measurements, use pres_best, temp_best and psal_best (already QC-filtered, adjusted where "
+                "appropriate) rather than the raw, adjusted and _qc columns. "
+                "Per-profile averages, min/max and surface/bottom values are precomputed in profile_summary "
+                "(get_profile_summaries); use them instead of aggregating measurements by cycle. "
+                "Density (sigma_theta_surface), mixed_layer_depth, thermocline_depth and heat_content_0_700 "
+                "are precomputed per profile in profile_summary as well. "
+                "For ocean basins or named seas, call get_region_cells and use its sql condition on profile_metadata. "
+                "Monthly means of temp or psal in a region come precomputed from get_region_timeseries. "
+                "To compare profiles at the same pressure (e.g. temperature at 1000 dbar), use get_standard_level_values. "
                 "Return only a tiny result table with clear field names. Do not include graphs or maps."
                 "first get the database schema then execute query"
             ),
@@ -415,7 +424,13 @@ def run_crewai_pipeline(query: str, verbose: bool = True, session_id: str = None
             description=(
                 "For the query: '{query}', perform these steps ONCE:\n"
                 "1) Get database schema\n"
-                "2) Execute ONE SQL query to get the data (use AVG for aggregation if needed)\n"
+                "2) Execute ONE SQL query to get the data (use AVG for aggregation if needed; filter and "
+                "aggregate measurements on pres_best/temp_best/psal_best, which are already QC-resolved; per-profile "
+                "statistics, density, mixed layer depth, thermocline depth and 0-700 dbar heat content are "
+                "precomputed in profile_summary, so do not aggregate measurements by cycle; "
+                "for a basin or named sea, filter profile_metadata with the sql condition from get_region_cells). "
+                "For monthly temp/psal trends in a region, call get_region_timeseries instead; for values at one "
+                "pressure across profiles, call get_standard_level_values\n"
                 "3) Return the results in a structured format\n"
                 "STOP after getting the data. Do not repeat steps or loop."
             ),
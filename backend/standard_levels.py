@@ -0,0 +1,123 @@
+"""
+Interpolation of profiles onto standard pressure levels.
+
+Raw levels never line up between profiles, so every profile's temp and psal
+(and their adjusted variants) are also stored interpolated onto the same
+pressures (STANDARD_PRESSURE_LEVELS in config.py), one profile_standard_levels
+row of arrays per profile. Values at a standard level are interpolated
+linearly in pressure between the nearest good levels above and below it:
+
+- only levels whose value and pressure have QC flags 1, 2, 5 or 8 are used
+- nothing is extrapolated above the shallowest or below the deepest good level
+- levels further apart than max_interpolation_gap() are not bridged
+
+Everything works on whole N_PROF x N_LEVELS arrays.
+"""
+
+import numpy as np
+import pandas as pd
+
+from climatology import GOOD_QC_FLAGS
+
+# Interpolated variables and the QC column of each
+STANDARD_LEVEL_VARIABLES = {
+    'temp': 'temp_qc',
+    'temp_adjusted': 'temp_adjusted_qc',
+    'psal': 'psal_qc',
+    'psal_adjusted': 'psal_adjusted_qc',
+}
+
+# Widest pressure gap (dbar) bridged at a level: MIN_GAP_DBAR, or a fraction of the level's pressure at depth
+MIN_GAP_DBAR = 50.0
+GAP_FRACTION = 0.25
+
+
+def max_interpolation_gap(level):
+    return np.maximum(MIN_GAP_DBAR, GAP_FRACTION * np.asarray(level))
+
+
+def good_flags(qc):
+    """Boolean array of where an array of QC flags (None for missing) holds a good flag"""
+    if qc is None:
+        return None
+    qc = np.asarray(qc, dtype=object)
+    return pd.Series(qc.ravel()).isin(GOOD_QC_FLAGS).to_numpy().reshape(qc.shape)
+
+
+def interpolate_to_levels(pres, values, good, levels):
+    """Interpolate N_PROF x N_LEVELS values onto the standard pressures in levels.
+
+    good marks the usable levels. Pressures need not be sorted. Returns an
+    N_PROF x len(levels) float64 array, NaN where a level cannot be interpolated.
+    """
+    n_prof, n_levels = pres.shape
+    result = np.full((n_prof, len(levels)), np.nan)
+    if n_levels == 0:
+        return result
+    good = good & ~np.isnan(pres) & ~np.isnan(values)
+    # Good levels first, shallow to deep, then the unusable ones at +inf
+    order = np.argsort(np.where(good, pres, np.inf), axis=1, kind='stable')
+    sorted_pres = np.take_along_axis(np.where(good, pres, np.inf), order, axis=1)
+    sorted_values = np.take_along_axis(values, order, axis=1)
+    n_good = good.sum(axis=1)
+    rows = np.arange(n_prof)
+
+    for k, level in enumerate(levels):
+        shallower = (sorted_pres <= level).sum(axis=1)
+        upper = np.clip(shallower - 1, 0, n_levels - 1)
+        lower = np.clip(shallower, 0, n_levels - 1)
+        p0, p1 = sorted_pres[rows, upper], sorted_pres[rows, lower]
+        v0, v1 = sorted_values[rows, upper], sorted_values[rows, lower]
+        exact = (shallower > 0) & (p0 == level)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bracketed = (shallower > 0) & (shallower < n_good) & (p1 - p0 <= max_interpolation_gap(level))
+            interpolated = v0 + (level - p0) / (p1 - p0) * (v1 - v0)
+        result[:, k] = np.where(exact, v0, np.where(bracketed, interpolated, np.nan))
+    return result
+
+
+def good_masks(level_arrays):
+    """good_flags of the pressure and every STANDARD_LEVEL_VARIABLES QC array, keyed by QC column"""
+    return {
+        qc_name: good_flags(level_arrays.get(qc_name))
+        for qc_name in ['pres_qc'] + list(STANDARD_LEVEL_VARIABLES.values())
+    }
+
+
+def standard_level_arrays(level_arrays, levels, good=None):
+    """{variable: N_PROF x len(levels) array} of every STANDARD_LEVEL_VARIABLES entry.
+
+    level_arrays is load_level_arrays output: float arrays with NaN for missing
+    values and QC arrays of strings; variables missing from the file are None.
+    good is the good_masks of level_arrays, computed here when not given.
+    """
+    pres = level_arrays['pres']
+    good = good or good_masks(level_arrays)
+    good_pres = good['pres_qc']
+    arrays = {}
+    for name, qc_name in STANDARD_LEVEL_VARIABLES.items():
+        values = level_arrays.get(name)
+        good_values = good[qc_name]
+        if values is None or good_values is None or good_pres is None:
+            arrays[name] = np.full((pres.shape[0], len(levels)), np.nan)
+        else:
+            arrays[name] = interpolate_to_levels(pres, values, good_values & good_pres, levels)
+    return arrays
+
+
+def standard_levels_at(arrays, index, levels):
+    """One profile's profile_standard_levels columns: lists aligned with levels, None where missing"""
+    row = {'pres': [float(level) for level in levels]}
+    for name, values in arrays.items():
+        row[name] = [None if np.isnan(value) else float(value) for value in values[index]]
+    return row
+
+
+def standard_levels_from_rows(measurements, levels):
+    """standard_levels_at of one profile given as measurement row dicts"""
+    level_arrays = {}
+    for name in ['pres'] + list(STANDARD_LEVEL_VARIABLES):
+        level_arrays[name] = np.array([[np.nan if m.get(name) is None else m[name] for m in measurements]], dtype=np.float64)
+    for name in ['pres_qc'] + list(STANDARD_LEVEL_VARIABLES.values()):
+        level_arrays[name] = np.array([[m.get(name) for m in measurements]], dtype=object)
+    return standard_levels_at(standard_level_arrays(level_arrays, levels), 0, levels)
@@ -1,6 +1,9 @@
 # quick_test.py
 import requests
 import os
+import time
+
+BASE_URL = "http://localhost:9000"
 
 def test_upload():
     # Use the correct path to your NetCDF file
@@ -21,9 +24,9 @@ def test_upload():
         with open(file_path, 'rb') as f:
             files = {'file': (os.path.basename(file_path), f, 'application/netcdf')}
             response = requests.post(
-                "http://localhost:8000/upload-netcdf/", 
+                f"{BASE_URL}/upload-netcdf/", 
                 files=files,
-                timeout=300  # 5 minute timeout
+                timeout=60
             )
         
         print(f"📋 Status Code: {response.status_code}")
@@ -31,15 +34,32 @@ def test_upload():
         try:
             result = response.json()
             print(f"✅ Response: {result}")
-            return True
         except:
             print(f"📝 Response Text: {response.text}")
             return False
+        
+        if response.status_code != 202:
+            return False
+        return wait_for_job(result["job_id"])
             
     except Exception as e:
         print(f"❌ Error: {e}")
         return False
 
+def wait_for_job(job_id, poll_seconds=2):
+    """Poll the ingest job until it completes or fails"""
+    while True:
+        job = requests.get(f"{BASE_URL}/api/ingest-jobs/{job_id}", timeout=30).json()
+        total = job.get("profiles_total") or "?"
+        print(f"⏳ {job['status']}: {job['profiles_done']}/{total} profiles, {job.get('rows_per_sec')} rows/sec")
+        if job["status"] == "completed":
+            print(f"✅ Result: {job['result']}")
+            return True
+        if job["status"] == "failed":
+            print(f"❌ Error: {job['error']}")
+            return False
+        time.sleep(poll_seconds)
+
 if __name__ == "__main__":
     print("🚀 Starting NetCDF upload test...")
     print("📁 Current directory:", os.getcwd())
@@ -0,0 +1,161 @@
+"""
+Streaming NetCDF uploads.
+
+By default Werkzeug spools every uploaded file to a temporary file, and
+upload_netcdf then copied that into temp/ with file.save: one extra write and
+read of the whole file per upload. StreamingUploadRequest instead writes each
+file part straight into the upload folder while the request body is parsed,
+and claim_upload() moves it into place with a rename.
+
+Gzip-compressed uploads (.nc.gz) are decompressed while they arrive, so only
+the decompressed NetCDF file is ever written. Both the request body and the
+decompressed file are capped at MAX_UPLOAD_MB.
+
+The SHA-256 of the (decompressed) file is computed as it is written, and
+upload_sha256() hands it to the ingest manifest, so the file is not read again
+just to hash it.
+"""
+
+import hashlib
+import os
+import tempfile
+import zlib
+
+from flask import Request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+from config import MAX_UPLOAD_MB
+
+UPLOAD_FOLDER = 'temp'
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+
+
+def strip_gzip_suffix(filename):
+    return filename[:-3] if filename.lower().endswith('.gz') else filename
+
+
+class HashingWriter:
+    """Writable file that keeps the SHA-256 of everything written to it"""
+
+    def __init__(self, file):
+        self.file = file
+        self.name = file.name
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+
+class GunzipWriter(HashingWriter):
+    """Writable file that gunzips everything written to it into an underlying file.
+
+    Multi-member gzip streams (concatenated .gz files) are decompressed whole.
+    The SHA-256 is that of the decompressed data.
+    """
+
+    def __init__(self, file, max_bytes=None):
+        super().__init__(file)
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._finished = False
+
+    def _write_decompressed(self, data):
+        self.bytes_written += len(data)
+        if self.max_bytes is not None and self.bytes_written > self.max_bytes:
+            raise RequestEntityTooLarge(f"Decompressed upload exceeds {self.max_bytes // (1024 * 1024)} MB")
+        super().write(data)
+
+    def write(self, data):
+        size = len(data)
+        try:
+            while data:
+                self._write_decompressed(self._decompressor.decompress(data))
+                if not self._decompressor.eof:
+                    break
+                # Another gzip member may follow the one that just ended
+                data = self._decompressor.unused_data
+                if data:
+                    self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        except zlib.error as e:
+            raise BadRequest(f"Invalid gzip upload: {e}")
+        return size
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        if not self._decompressor.eof:
+            raise BadRequest("Truncated gzip upload")
+        self._write_decompressed(self._decompressor.flush())
+        self.file.flush()
+
+    def seek(self, offset, whence=0):
+        # Werkzeug rewinds the file once the part is complete
+        self.finish()
+        return super().seek(offset, whence)
+
+
+class StreamingUploadRequest(Request):
+    """Request that streams file parts directly into UPLOAD_FOLDER"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        part = tempfile.NamedTemporaryFile(dir=UPLOAD_FOLDER, prefix='upload_', suffix='.part', delete=False)
+        if not hasattr(self, '_upload_parts'):
+            self._upload_parts = []
+        self._upload_parts.append(part.name)
+        if filename and filename.lower().endswith('.gz'):
+            return GunzipWriter(part, max_bytes=MAX_UPLOAD_BYTES)
+        return HashingWriter(part)
+
+    def close(self):
+        super().close()
+        # Parts that were not claimed by the view (rejected or failed uploads)
+        for path in getattr(self, '_upload_parts', []):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"⚠️ Warning: Could not remove {path}: {e}")
+
+
+def claim_upload(file, destination):
+    """Move an uploaded file to destination without copying it; returns destination"""
+    stream = file.stream
+    path = getattr(stream, 'name', None)
+    if isinstance(path, str) and os.path.exists(path):
+        if isinstance(stream, GunzipWriter):
+            stream.finish()
+        stream.close()
+        os.replace(path, destination)
+    else:
+        # Not streamed to disk by StreamingUploadRequest (e.g. an in-memory test upload)
+        file.save(destination)
+    return destination
+
+
+def upload_sha256(file):
+    """SHA-256 hex digest of a claimed upload, or None when it was not streamed to disk"""
+    stream = file.stream
+    return stream.sha256.hexdigest() if isinstance(stream, HashingWriter) else None
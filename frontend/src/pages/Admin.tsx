@@ -1,7 +1,11 @@
 import { DarkVeilBackground } from "@/components/ui/shadcn-io/dark-veil-background"
 import { Upload, FileText, Database, Navigation, Waves, Thermometer, Clock, Trash2, MapPin, Droplets, Gauge, ArrowLeft } from "lucide-react"
-import { useState } from "react"
+import { useEffect, useState } from "react"
 import { useNavigate } from "react-router-dom"
+import socketService from "@/services/socketService"
+import type { IngestJob } from "@/services/socketService"
+
+const API_URL = 'http://localhost:9000'
 
 const Admin = () => {
   const navigate = useNavigate()
@@ -15,6 +19,58 @@ const Admin = () => {
   
   const [isUploading, setIsUploading] = useState(false)
   const [uploadStatus, setUploadStatus] = useState<{message: string, success: boolean} | null>(null)
+  // Background ingest job of the last upload
+  const [ingestJob, setIngestJob] = useState<IngestJob | null>(null)
+
+  // Job updates pushed over Socket.IO (ingest_progress / ingest_complete / ingest_error)
+  useEffect(() => {
+    return socketService.onIngestUpdate((job) => {
+      setIngestJob((current) => (current && current.job_id === job.job_id ? job : current))
+    })
+  }, [])
+
+  // Poll the job as well, in case the socket is disconnected or an event arrived before the upload response
+  const activeJobId = ingestJob && (ingestJob.status === 'queued' || ingestJob.status === 'running') ? ingestJob.job_id : null
+  useEffect(() => {
+    if (!activeJobId) return
+    const timer = setInterval(async () => {
+      try {
+        const response = await fetch(`${API_URL}/api/ingest-jobs/${activeJobId}`)
+        if (response.ok) {
+          setIngestJob(await response.json())
+        }
+      } catch (error) {
+        console.error('Ingest job poll error:', error)
+      }
+    }, 3000)
+    return () => clearInterval(timer)
+  }, [activeJobId])
+
+  const retryIngestJob = async (jobId: string) => {
+    try {
+      const response = await fetch(`${API_URL}/api/ingest-jobs/${jobId}/retry`, { method: 'POST' })
+      const job = await response.json()
+      if (!response.ok) {
+        throw new Error(job.error || `Retry failed with status: ${response.status}`)
+      }
+      setIngestJob(job)
+    } catch (error) {
+      setUploadStatus({ message: error instanceof Error ? error.message : 'Failed to retry ingest', success: false })
+    }
+  }
+
+  const ingestStatusText = (job: IngestJob) => {
+    switch (job.status) {
+      case "queued": return "Queued for ingestion..."
+      case "running": return job.profiles_total
+        ? `Ingesting: ${job.profiles_done ?? 0} / ${job.profiles_total} profiles${job.rows_per_sec ? ` (${Math.round(job.rows_per_sec).toLocaleString()} rows/s)` : ''}`
+        : "Ingesting..."
+      case "completed": return job.result?.skipped
+        ? "Already ingested, nothing to do"
+        : `Ingested ${job.result?.profiles_ingested ?? job.profiles_done ?? 0} profiles`
+      case "failed": return `Ingest failed: ${job.error || 'unknown error'}`
+    }
+  }
 
   const getFileIcon = (type: string) => {
     switch (type) {
@@ -35,8 +91,13 @@ const Admin = () => {
   try {
     const formData = new FormData()
     formData.append('file', file)
+    // Lets the backend push this job's progress events to this client
+    const sid = socketService.getSocketId()
+    if (sid) {
+      formData.append('sid', sid)
+    }
     
-    const response = await fetch('http://localhost:9000/upload-netcdf/', {
+    const response = await fetch(`${API_URL}/upload-netcdf/`, {
       method: 'POST',
       body: formData,
     })
@@ -53,8 +114,19 @@ const Admin = () => {
       throw new Error(errorMessage)
     }
     
+    // 202: the file is saved and queued; ingestion runs in the background
     const result = await response.json()
-    setUploadStatus({ message: result.message || 'ARGO file uploaded successfully!', success: true })
+    setUploadStatus({ message: result.message || 'ARGO file uploaded, queued for ingestion.', success: true })
+    setIngestJob({
+      job_id: result.job_id,
+      filename: result.filename,
+      status: result.status,
+      profiles_done: 0,
+      profiles_total: null,
+      rows_per_sec: null,
+      result: null,
+      error: null,
+    })
     
     // Add to recent files
     const newFile = {
@@ -184,6 +256,35 @@ const Admin = () => {
                   {uploadStatus.message}
                 </div>
               )}
+
+              {ingestJob && (
+                <div className={`mb-4 p-3 rounded-md text-left text-sm ${
+                  ingestJob.status === 'failed' ? 'bg-red-500/20 text-red-300'
+                    : ingestJob.status === 'completed' ? 'bg-green-500/20 text-green-300'
+                    : 'bg-white/5 text-gray-200'
+                }`}>
+                  <div className="flex items-center justify-between gap-4">
+                    <span className="truncate font-medium">{ingestJob.filename}</span>
+                    {ingestJob.status === 'failed' && (
+                      <button
+                        onClick={() => retryIngestJob(ingestJob.job_id)}
+                        className="rounded bg-white/10 border border-white/20 px-2 py-0.5 text-xs text-white hover:bg-white/20"
+                      >
+                        Retry
+                      </button>
+                    )}
+                  </div>
+                  <p className="mt-1">{ingestStatusText(ingestJob)}</p>
+                  {(ingestJob.status === 'queued' || ingestJob.status === 'running') && (
+                    <div className="mt-2 h-2 w-full rounded bg-white/10 overflow-hidden">
+                      <div
+                        className="h-full bg-blue-400 transition-all"
+                        style={{ width: `${ingestJob.profiles_total ? Math.min(100, 100 * (ingestJob.profiles_done ?? 0) / ingestJob.profiles_total) : 0}%` }}
+                      />
+                    </div>
+                  )}
+                </div>
+              )}
               
               <label htmlFor="file-upload" className="cursor-pointer">
                 <div className="inline-flex items-center px-6 py-3 bg-white text-black font-semibold rounded-lg shadow-md hover:bg-gray-100 transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
@@ -196,7 +297,7 @@ const Admin = () => {
                   type="file" 
                   className="hidden" 
                   onChange={handleFileUpload}
-                  accept=".nc,.netcdf"
+                  accept=".nc,.netcdf,.gz"
                   disabled={isUploading}
                 />
               </label>
@@ -15,6 +15,20 @@ type ThoughtsPayload = { message: string }
 type ResultPayload = { result: any }
 type ErrorPayload = { message: string }
 
+// Background ingest job, as returned by /api/ingest-jobs/<job_id> and the ingest_* events
+export type IngestJob = {
+  job_id: string
+  filename: string
+  status: 'queued' | 'running' | 'completed' | 'failed'
+  profiles_done: number | null
+  profiles_total: number | null
+  rows_per_sec: number | null
+  result: { profiles_ingested?: number; skipped?: boolean } | null
+  error: string | null
+}
+
+export const INGEST_EVENTS = ['ingest_progress', 'ingest_complete', 'ingest_error'] as const
+
 class SocketService {
   private socket: Socket | null
   private isConnected: boolean
@@ -81,6 +95,20 @@ class SocketService {
     }
   }
 
+  // Socket.IO session id, sent with uploads so ingest events reach this client
+  getSocketId(): string | undefined {
+    return this.socket?.id
+  }
+
+  // Call handler with every ingest job update pushed to this client; returns an unsubscribe function
+  onIngestUpdate(handler: (job: IngestJob) => void): () => void {
+    const socket = this.connect()
+    INGEST_EVENTS.forEach((event) => socket.on(event, handler))
+    return () => {
+      INGEST_EVENTS.forEach((event) => socket.off(event, handler))
+    }
+  }
+
   getConnectionStatus(): boolean {
     return this.isConnected
   }